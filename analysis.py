@@ -0,0 +1,190 @@
+"""Corpus queries behind the Streamlit apps, answered from the corpus arrays and indexes."""
+import numpy as np
+import pandas as pd
+
+from cube import load_cube
+from index import load_index
+from source import context_bounds, context_windows, load_source
+
+MEASURES = ("LogRatio", "LogLikelihood", "MI", "TScore")
+
+
+def kwic(corpus, query, party, context_size=15, max_examples=10, field="lemma", rng=None, year=None, election=None, within="sentence"):
+    """Return up to max_examples random KWIC lines for query (a string or a list of strings) in one party's documents.
+
+    The query token is highlighted in Markdown bold. year and election restrict the
+    search to the documents of some elections. The context stays within the hit's
+    sentence, or with within="document" within its manifesto.
+    """
+    positions = load_index(corpus, field).lookup(query, party, year, election)
+    return kwic_lines(corpus, positions, context_size=context_size, max_examples=max_examples, rng=rng, within=within)
+
+
+def kwic_hits(corpus, positions, length=1, context_size=15, max_examples=10, rng=None, within="sentence"):
+    """Return a random sample of hits starting at positions and spanning length tokens.
+
+    Each hit is a dict with its position, the KWIC line with the hit in Markdown
+    bold, and the manifesto URL and PDF page it comes from (None and 0 if unknown).
+    With a source layer the line is cut from the original text, otherwise it joins
+    the tokens.
+    """
+    if len(positions) == 0:
+        return []
+    rng = np.random.default_rng() if rng is None else rng
+    hits = rng.choice(np.asarray(positions, dtype=np.int64), size=min(len(positions), max_examples), replace=False)
+    lo, hi = context_bounds(corpus, hits, length, within)
+    starts = np.maximum(hits - context_size, lo)
+    ends = np.minimum(hits + length + context_size, hi)
+    documents = np.searchsorted(corpus.document_starts, hits, side="right") - 1
+
+    source = load_source(corpus)
+    pages = source.pages(hits) if source is not None else np.zeros(len(hits), dtype=np.int64)
+    results = []
+    for hit, start, end, document, page in zip(hits, starts, ends, documents, pages):
+        match_end = hit + length
+        if source is not None:
+            line = (f"{source.span(start, hit)}{source.gap(hit) if start < hit else ''}**{source.span(hit, match_end)}**"
+                    f"{source.gap(match_end) if match_end < end else ''}{source.span(match_end, end)}")
+        else:
+            tokens = corpus.decode("token", corpus.codes["token"][start:end])
+            line = " ".join(f"**{token}**" if hit <= start + i < match_end else token for i, token in enumerate(tokens))
+        results.append({"position": int(hit), "line": line, "url": corpus.documents[document].get("url"), "page": int(page)})
+    return results
+
+
+def kwic_lines(corpus, positions, length=1, context_size=15, max_examples=10, rng=None, within="sentence"):
+    """Return KWIC lines for a random sample of hits, each linked to its PDF page where known."""
+    lines = []
+    for hit in kwic_hits(corpus, positions, length, context_size, max_examples, rng, within):
+        if hit["url"] and hit["page"]:
+            lines.append(f"{hit['line']} ([S. {hit['page']}]({hit['url']}#page={hit['page']}))")
+        else:
+            lines.append(hit["line"])
+    return lines
+
+
+def party_lemma_totals(corpus, party, year=None, election=None):
+    """Return the lemma frequency vector of one party, sliced from the precomputed count cube."""
+    key = ("lemma_totals", party, year, election)
+    if key not in corpus.cache:
+        counts = load_cube(corpus)
+        mask = np.isin(counts.partition, corpus.partition_ids(party, year, election))
+        corpus.cache[key] = np.bincount(counts.lemma[mask], weights=counts.count[mask], minlength=len(corpus.vocab["lemma"])).astype(np.int64)
+    return corpus.cache[key]
+
+
+def log_ratio(freq, size, freq_reference, size_reference):
+    """Binary log of the ratio of relative frequencies; zero counts are taken as 0.5."""
+    freq = np.where(freq == 0, 0.5, freq)
+    freq_reference = np.where(freq_reference == 0, 0.5, freq_reference)
+    return np.log2((freq / size) / (freq_reference / size_reference))
+
+
+def percent_diff(freq, size, freq_reference, size_reference):
+    """%DIFF of the relative frequencies; zero reference counts are taken as 0.5 as in log_ratio."""
+    freq_reference = np.where(freq_reference == 0, 0.5, freq_reference)
+    return ((freq / size) / (freq_reference / size_reference) - 1) * 100
+
+
+def log_likelihood(freq, size, freq_reference, size_reference):
+    """Log-likelihood (G2) of a frequency in a sample against a reference sample."""
+    freq = np.asarray(freq, dtype=np.float64)
+    freq_reference = np.asarray(freq_reference, dtype=np.float64)
+    total = size + size_reference
+    expected = size * (freq + freq_reference) / total
+    expected_reference = size_reference * (freq + freq_reference) / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ll = np.where(freq > 0, freq * np.log(freq / expected), 0.0)
+        ll += np.where(freq_reference > 0, freq_reference * np.log(freq_reference / expected_reference), 0.0)
+    return 2 * ll
+
+
+def collocations(corpus, query_lemma, party, left=5, right=5, min_freq=1, year=None, election=None):
+    """Return the collocates of query_lemma in one party's documents with their association scores.
+
+    All context windows are gathered at once as position offsets, clipped to the
+    hit's document, and the collocates are counted with bincount over lemma ids.
+    The reference is the rest of the party's text, so ``freq_reference`` is the
+    collocate's party total minus its window count.
+    year and election restrict both to the documents of some elections.
+    """
+    columns = ["lemma", "freq", "size", "freq_total", "freq_reference", "size_reference",
+               "relfreq", "relfreq_reference", *MEASURES]
+    positions = np.asarray(load_index(corpus, "lemma").lookup(query_lemma, party, year, election), dtype=np.int64)
+    if len(positions) == 0:
+        return pd.DataFrame(columns=columns)
+
+    offsets = np.concatenate((np.arange(-left, 0), np.arange(1, right + 1)))
+    # Windows end at the hit's manifesto; overlapping windows of nearby hits count each context token only once
+    windows, _ = context_windows(corpus, positions, offsets)
+    if len(windows) > len(corpus) // 16:
+        # Frequent queries cover much of the corpus, where a bitmap is cheaper than sorting
+        covered = np.zeros(len(corpus), dtype=bool)
+        covered[windows] = True
+        windows = np.flatnonzero(covered)
+    else:
+        windows = np.unique(windows)
+    totals = party_lemma_totals(corpus, party, year, election)
+    counts = np.bincount(corpus.codes["lemma"][windows], minlength=len(totals))
+
+    collocates = np.flatnonzero(counts >= max(min_freq, 1))
+    freq = counts[collocates]
+    size = len(windows)
+    freq_total = totals[collocates]
+    freq_reference = np.maximum(freq_total - freq, 0)
+    size_reference = max(int(totals.sum()) - size, 1)
+    expected = size * (freq + freq_reference) / (size + size_reference)
+
+    df_collo = pd.DataFrame({
+        "lemma": corpus.decode("lemma", collocates),
+        "freq": freq,
+        "size": size,
+        "freq_total": freq_total,
+        "freq_reference": freq_reference,
+        "size_reference": size_reference,
+        "relfreq": freq / size,
+        "relfreq_reference": freq_reference / size_reference,
+        "LogRatio": log_ratio(freq, size, freq_reference, size_reference),
+        "LogLikelihood": log_likelihood(freq, size, freq_reference, size_reference),
+        "MI": np.log2(freq / np.maximum(expected, 1e-12)),
+        "TScore": (freq - expected) / np.sqrt(freq),
+    }, columns=columns)
+    return df_collo.sort_values("freq", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def relative_frequencies(counts, lemma, year=None, election=None, label=None):
+    """Return a lemma's per-party frequencies per million tokens, also centred on the cross-party mean.
+
+    lemma may also be a list of lemmas (e.g. the expansion of a wildcard query), whose
+    frequencies are summed.
+    """
+    return add_relative_frequencies(counts.frequency_table(lemma, year, election, label))
+
+
+def add_relative_frequencies(df_lemma):
+    """Add frequencies per million tokens (relfreq) and their deviation from the cross-party mean to a frequency table."""
+    df_lemma["relfreq"] = df_lemma["freq"] / df_lemma["count"] * 1000000
+    mean = df_lemma["freq"].sum() / df_lemma["count"].sum() * 1000000
+    df_lemma["relfreq_centered"] = df_lemma["relfreq"] - mean
+    return df_lemma
+
+
+def frequency_series(counts, lemma, party=None):
+    """Return a lemma's frequency per million tokens in every election and party, oldest election first.
+
+    All partitions are counted in one bincount over the lemma's slice of the count
+    cube; party restricts the series to one party or a collection of parties.
+    """
+    corpus = counts.corpus
+    partitions = corpus.partition_ids(party=party)
+    freq = counts.partition_counts(lemma)[partitions]
+    size = counts.partition_totals[partitions]
+    df_series = pd.DataFrame({
+        "election": [corpus.partitions[i]["election"] for i in partitions],
+        "year": [corpus.partitions[i]["year"] for i in partitions],
+        "party": [corpus.partitions[i]["party"] for i in partitions],
+        "freq": freq,
+        "count": size,
+        "relfreq": freq / np.maximum(size, 1) * 1000000,
+    })
+    return df_series.sort_values(["year", "election", "party"], kind="stable").reset_index(drop=True)
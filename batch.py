@@ -0,0 +1,207 @@
+"""Headless batch queries for bulk reports, without Streamlit.
+
+Reads lemmas from a file (one per line, ``#`` starts a comment) and writes three
+tables: relative frequencies and their deviation from the cross-party mean for
+every lemma and party, the top collocates of every lemma in every party, and a
+reproducible sample of KWIC lines per lemma and party, with the PDF page of each line.
+
+    python batch.py btw25_corrected.corpus lemmas.txt --output report --format tsv
+    python batch.py btw25_corrected.corpus lemmas.txt --election BTW --year 2025 --format parquet --jobs 8
+
+writes ``report.frequencies.tsv``, ``report.collocations.tsv`` and
+``report.kwic.tsv`` (or ``.parquet``/``.json``). The frequencies of all lemmas
+come from one pass over the count cube. Collocations and KWIC lines are computed
+in worker processes, one task per party and chunk of lemmas; the workers share
+the memory-mapped corpus through the page cache. The same tables are available
+from Python:
+
+    import batch
+    tables = batch.run("btw25_corrected.corpus", ["Klima", "Freiheit"], jobs=4)
+    tables["frequencies"]
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import analysis
+from corpus import Corpus, load_corpus
+from cube import load_cube
+from index import gather_ranges, load_index
+
+FORMATS = ("tsv", "parquet", "json")
+COLLOCATION_COLUMNS = ["lemma", "party", "collocate", "freq", *analysis.MEASURES]
+KWIC_COLUMNS = ["lemma", "party", "example", "page", "url", "line"]
+CHUNKS_PER_JOB = 4  # tasks per worker and party, so uneven lemmas still balance out
+
+_corpus = None
+
+
+def read_lemmas(path):
+    """Return the lemmas of a file, one per line, without blank lines, comments and duplicates."""
+    with open(path, "r", encoding="utf-8") as f:
+        lemmas = [line.split("#", 1)[0].strip() for line in f]
+    return list(dict.fromkeys(lemma for lemma in lemmas if lemma))
+
+
+def frequency_table(counts, lemmas, year=None, election=None):
+    """Return freq, count, relfreq and relfreq_centered of every lemma in every party.
+
+    All lemmas are counted in one bincount over their slices of the count cube.
+    Unlike analysis.relative_frequencies, parties without a hit get 0 instead of
+    a missing value, so the table has one row per lemma and party.
+    """
+    corpus = counts.corpus
+    ids = np.array([corpus.id("lemma", lemma) for lemma in lemmas], dtype=np.int64)
+    lo = np.where(ids >= 0, np.searchsorted(counts.lemma, ids), 0)
+    hi = np.where(ids >= 0, np.searchsorted(counts.lemma, ids + 1), 0)
+    entries = gather_ranges(lo, hi)
+    rows = np.repeat(np.arange(len(lemmas)), hi - lo)
+    partitions = counts.selection(year, election)
+    weights = counts.count[entries].astype(np.float64)
+    if partitions is not None:
+        weights *= np.isin(counts.partition[entries], partitions)
+    n_parties = len(counts.parties)
+    freq = np.bincount(rows * n_parties + counts.party[entries], weights=weights,
+                       minlength=len(lemmas) * n_parties).reshape(len(lemmas), n_parties)
+
+    sizes = counts.party_sizes(partitions)
+    present = np.flatnonzero(sizes > 0)
+    present = present[np.argsort(np.asarray(counts.parties, dtype=object)[present], kind="stable")]
+    freq = freq[:, present]
+    relfreq = freq / sizes[present] * 1000000
+    mean = freq.sum(axis=1, keepdims=True) / sizes[present].sum() * 1000000
+    return pd.DataFrame({
+        "lemma": np.repeat(np.asarray(lemmas, dtype=object), len(present)),
+        "party": np.tile(np.asarray(counts.parties, dtype=object)[present], len(lemmas)),
+        "freq": freq.ravel().astype(np.int64),
+        "count": np.tile(sizes[present], len(lemmas)),
+        "relfreq": relfreq.ravel(),
+        "relfreq_centered": (relfreq - mean).ravel(),
+    })
+
+
+def collocation_rows(corpus, lemmas, party, left=5, right=5, min_freq=3, measure="LogRatio", top=20, year=None, election=None):
+    """Return the top collocates of each lemma in one party, filtered and ranked like in the frequency app."""
+    frames = []
+    for lemma in lemmas:
+        collo = analysis.collocations(corpus, lemma, party, left, right, min_freq, year, election)
+        collo = collo[collo["LogRatio"] > 0].sort_values(measure, ascending=False, kind="stable").head(top)
+        if len(collo):
+            frames.append(collo.rename(columns={"lemma": "collocate"}).assign(lemma=lemma, party=party))
+    return pd.concat(frames)[COLLOCATION_COLUMNS] if frames else pd.DataFrame(columns=COLLOCATION_COLUMNS)
+
+
+def kwic_rows(corpus, lemmas, party, context_size=15, max_examples=10, seed=0, year=None, election=None):
+    """Return a KWIC sample of each lemma in one party; the sample depends only on seed, lemma and party."""
+    rows = []
+    for lemma in lemmas:
+        rng = np.random.default_rng([seed, *lemma.encode("utf-8"), *party.encode("utf-8")])
+        positions = load_index(corpus, "lemma").lookup(lemma, party, year, election)
+        hits = analysis.kwic_hits(corpus, positions, context_size=context_size, max_examples=max_examples, rng=rng)
+        rows.extend((lemma, party, i, hit["page"], hit["url"], hit["line"]) for i, hit in enumerate(hits))
+    return pd.DataFrame(rows, columns=KWIC_COLUMNS)
+
+
+def _open_corpus(path):
+    global _corpus
+    _corpus = Corpus(path)
+
+
+def _party_task(lemmas, party, options):
+    collo = options["collocations"]
+    kwic = options["kwic"]
+    return (
+        collocation_rows(_corpus, lemmas, party, year=options["year"], election=options["election"], **collo),
+        kwic_rows(_corpus, lemmas, party, year=options["year"], election=options["election"], **kwic),
+    )
+
+
+def run(path, lemmas, jobs=None, year=None, election=None, collocations=None, kwic=None):
+    """Return the frequencies, collocations and kwic tables of lemmas in a corpus directory.
+
+    collocations and kwic are keyword arguments for collocation_rows and kwic_rows
+    (e.g. ``{"top": 50}``).
+    """
+    corpus = load_corpus(path)
+    counts = load_cube(corpus)
+    frequencies = frequency_table(counts, lemmas, year, election)
+    known = [lemma for lemma in lemmas if corpus.id("lemma", lemma) >= 0]
+    parties = list(frequencies["party"].unique())
+    options = {"year": year, "election": election, "collocations": collocations or {}, "kwic": kwic or {}}
+
+    jobs = max(1, jobs or os.cpu_count())
+    chunk = max(1, -(-len(known) // (jobs * CHUNKS_PER_JOB)))
+    tasks = [(known[start:start + chunk], party) for party in parties for start in range(0, len(known), chunk)]
+    if jobs == 1:
+        _open_corpus(path)
+        results = [_party_task(chunk_lemmas, party, options) for chunk_lemmas, party in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_open_corpus, initargs=(path,)) as executor:
+            results = list(executor.map(_party_task, *zip(*tasks), [options] * len(tasks))) if tasks else []
+
+    # Keep the order of the lemma file, then of the parties
+    order = {lemma: i for i, lemma in enumerate(lemmas)}
+    tables = {"frequencies": frequencies}
+    for (name, columns), frames in zip((("collocations", COLLOCATION_COLUMNS), ("kwic", KWIC_COLUMNS)), zip(*results) if results else ([], [])):
+        frames = [frame for frame in frames if len(frame)]
+        table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        table = table.sort_values(["lemma", "party"], key=lambda column: column.map(order) if column.name == "lemma" else column, kind="stable")
+        tables[name] = table.reset_index(drop=True)
+    return tables
+
+
+def write_tables(tables, output, fmt="tsv"):
+    """Write each table to <output>.<table>.<fmt> and return the paths."""
+    paths = []
+    for name, table in tables.items():
+        path = f"{output}.{name}.{fmt}"
+        if fmt == "tsv":
+            table.to_csv(path, sep="\t", index=False)
+        elif fmt == "parquet":
+            table.to_parquet(path, index=False)
+        elif fmt == "json":
+            table.to_json(path, orient="records", force_ascii=False, indent=1)
+        else:
+            raise ValueError(f"Unknown output format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute frequencies, collocations and KWIC samples for a list of lemmas.")
+    parser.add_argument("corpus", help="corpus directory")
+    parser.add_argument("lemmas", help="file with one lemma per line")
+    parser.add_argument("--output", default="report", help="output path prefix")
+    parser.add_argument("--format", choices=FORMATS, default="tsv", help="output format")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--election", help="only count manifestos of this election (e.g. BTW)")
+    parser.add_argument("--year", help="only count manifestos of this year")
+    parser.add_argument("--window", type=int, default=5, help="collocation window left and right")
+    parser.add_argument("--min-freq", type=int, default=3, help="minimum collocate frequency")
+    parser.add_argument("--measure", choices=analysis.MEASURES, default="LogRatio", help="collocation ranking")
+    parser.add_argument("--top", type=int, default=20, help="collocates per lemma and party")
+    parser.add_argument("--context", type=int, default=15, help="KWIC context tokens left and right")
+    parser.add_argument("--examples", type=int, default=10, help="KWIC lines per lemma and party")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the KWIC samples")
+    args = parser.parse_args()
+
+    lemmas = read_lemmas(args.lemmas)
+    print(f"Querying {len(lemmas)} lemmas in {args.corpus}...")
+    tables = run(
+        args.corpus, lemmas, args.jobs, args.year, args.election,
+        collocations={"left": args.window, "right": args.window, "min_freq": args.min_freq, "measure": args.measure, "top": args.top},
+        kwic={"context_size": args.context, "max_examples": args.examples, "seed": args.seed},
+    )
+    missing = len(lemmas) - int(tables["frequencies"].groupby("lemma", sort=False)["freq"].sum().gt(0).sum())
+    if missing:
+        print(f"{missing} lemmas do not occur in the selected manifestos.", file=sys.stderr)
+    for path in write_tables(tables, args.output, args.format):
+        print(f"Data saved to {path}.")
+
+
+if __name__ == "__main__":
+    main()
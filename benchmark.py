@@ -0,0 +1,213 @@
+"""Benchmarks for corpus build and query paths on synthetic manifesto corpora.
+
+The generator writes corpora in the token/pos/lemma/party/year schema with a Zipfian
+lemma distribution, a vocabulary growing with corpus size (Heaps' law) and one
+document per party. For every scenario (parties x tokens) the suite times corpus
+writing (with its peak memory, measured in a child process), index and count cube
+builds, loading, and the queries behind the apps: per-lemma frequencies, KWIC,
+collocations, frequency series, heatmap aggregation, keyness tables, and the
+word vector build with its nearest-neighbour queries.
+
+    python benchmark.py --parties 1 7 100 --tokens 100000 1000000 --save-baseline baseline.json
+    python benchmark.py --parties 1 7 100 --tokens 100000 1000000 --baseline baseline.json --max-regression 0.25
+
+Results are written as JSON. With --baseline the run fails (exit code 1) when a
+metric is slower than the baseline by more than --max-regression.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import analysis
+from corpus import Corpus, CorpusWriter
+from cube import HEATMAP_POS, build_cube, build_heatmap, load_cube
+from embeddings import build_embeddings
+from index import FIELDS as INDEX_FIELDS, build_index, load_index
+from keyness import KEYNESS_POS, keyness_arrays
+
+DATA_DIR = "bench_data"
+ZIPF_EXPONENT = 1.07
+BLOCK_TOKENS = 5_000_000
+# STTS tags and their share of lemma types in the synthetic vocabulary
+POS_SHARES = {"NN": 0.35, "ADJA": 0.1, "ADJD": 0.05, "VVFIN": 0.1, "VVINF": 0.05, "ART": 0.1,
+              "APPR": 0.1, "KON": 0.05, "ADV": 0.05, "$.": 0.05}
+QUERY_RANKS = (1, 10, 100, 1000)  # frequency bands of the query lemmas
+MIN_DELTA = 0.002  # seconds; slowdowns below this are timer noise, not regressions
+
+
+def vocabulary_size(n_tokens):
+    """Estimate the number of lemma types of a corpus with Heaps' law."""
+    return max(1000, int(30 * n_tokens ** 0.5))
+
+
+def generate_corpus(path, n_tokens, n_parties, seed=0, block_tokens=BLOCK_TOKENS):
+    """Write a synthetic corpus of n_tokens split evenly over n_parties documents."""
+    rng = np.random.default_rng(seed)
+    n_lemmas = vocabulary_size(n_tokens)
+    cdf = np.cumsum(np.arange(1, n_lemmas + 1, dtype=np.float64) ** -ZIPF_EXPONENT)
+    cdf /= cdf[-1]
+    tags = list(POS_SHARES)
+    lemma_pos = rng.choice(len(tags), size=n_lemmas, p=list(POS_SHARES.values()))
+    vocab = {
+        "token": [f"w{rank:07d}" for rank in range(n_lemmas)],
+        "lemma": [f"w{rank:07d}" for rank in range(n_lemmas)],
+        "pos": tags,
+        "party": [f"P{party:03d}" for party in range(n_parties)],
+        "year": ["2025"],
+    }
+    with CorpusWriter(path) as writer:
+        for party, size in enumerate(np.diff(np.linspace(0, n_tokens, n_parties + 1).astype(np.int64))):
+            for start in range(0, size, block_tokens):
+                n = min(block_tokens, size - start)
+                lemma = np.searchsorted(cdf, rng.random(n))
+                writer.add_encoded(vocab, {
+                    "token": lemma,
+                    "lemma": lemma,
+                    "pos": lemma_pos[lemma],
+                    "party": np.full(n, party),
+                    "year": np.zeros(n, dtype=np.int64),
+                })
+    return Corpus(path)
+
+
+def _write_in_child(path, n_tokens, n_parties, queue):
+    start = time.perf_counter()
+    generate_corpus(path, n_tokens, n_parties)
+    queue.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def measure_write(path, n_tokens, n_parties):
+    """Generate a corpus in a child process and return its wall time and peak RSS in MiB."""
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_write_in_child, args=(path, n_tokens, n_parties, queue))
+    process.start()
+    # The result is a small tuple, so the child can exit before it is read; a killed child (e.g. by the OOM killer) sends nothing
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"Writing {path} failed: the benchmark process exited with code {process.exitcode}")
+    return queue.get(timeout=10)
+
+
+def timed(function, repeat):
+    """Return the median wall time of function over repeat calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_scenario(n_parties, n_tokens, data_dir=DATA_DIR, repeat=5):
+    """Build a synthetic corpus and return the timings (seconds) and peak write memory of one scenario."""
+    path = os.path.join(data_dir, f"p{n_parties}_t{n_tokens}.corpus")
+    metrics = {}
+    metrics["write"], metrics["write_peak_rss_mb"] = measure_write(path, n_tokens, n_parties)
+
+    corpus = Corpus(path)
+    start = time.perf_counter()
+    for field in INDEX_FIELDS:
+        build_index(corpus, field)
+    metrics["index_build"] = time.perf_counter() - start
+    metrics["cube_build"] = timed(lambda: build_cube(corpus), 1)
+
+    def load():
+        fresh = Corpus(path)
+        load_index(fresh, "lemma")
+        load_cube(fresh)
+        return fresh
+    metrics["load"] = timed(load, repeat)
+
+    corpus = load()
+    counts = load_cube(corpus)
+    party = corpus.documents[0]["party"]
+    lemmas = [corpus.vocab["lemma"][rank - 1] for rank in QUERY_RANKS if rank <= len(corpus.vocab["lemma"])]
+    rng = np.random.default_rng(0)
+    for rank, lemma in zip(QUERY_RANKS, lemmas):
+        metrics[f"frequency_r{rank}"] = timed(lambda: analysis.relative_frequencies(counts, lemma), repeat)
+        metrics[f"series_r{rank}"] = timed(lambda: analysis.frequency_series(counts, lemma), repeat)
+        metrics[f"kwic_r{rank}"] = timed(lambda: analysis.kwic(corpus, lemma, party, rng=rng), repeat)
+        metrics[f"collocations_r{rank}"] = timed(lambda: analysis.collocations(corpus, lemma, party, min_freq=3), repeat)
+    arrays = {"lemma": counts.lemma, "party": counts.party, "pos": counts.pos, "count": counts.count}
+    for tab in HEATMAP_POS:
+        metrics[f"heatmap_aggregation_{tab}"] = timed(lambda: build_heatmap(corpus, arrays, tab), repeat)
+        metrics[f"heatmap_slice_{tab}"] = timed(lambda: counts.heatmap(tab, 50), repeat)
+    for tab in KEYNESS_POS:
+        metrics[f"keyness_{tab}"] = timed(lambda: keyness_arrays(counts, tab), repeat)
+    start = time.perf_counter()
+    vectors = build_embeddings(corpus, save=False)
+    metrics["embeddings_build"] = time.perf_counter() - start
+    for rank, lemma in zip(QUERY_RANKS, lemmas):
+        metrics[f"similar_r{rank}"] = timed(lambda: vectors.similar(lemma, party), repeat)
+    return metrics
+
+
+def compare(results, baseline, max_regression, min_delta=MIN_DELTA):
+    """Return (scenario, metric, baseline, current) for every metric worse than the baseline allows."""
+    regressions = []
+    for scenario, metrics in results["scenarios"].items():
+        for metric, value in metrics.items():
+            reference = baseline.get("scenarios", {}).get(scenario, {}).get(metric)
+            slack = 0 if metric.endswith("_mb") else min_delta
+            if reference and value - reference > max(reference * max_regression, slack):
+                regressions.append((scenario, metric, reference, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark corpus build and query paths on synthetic corpora.")
+    parser.add_argument("--parties", type=int, nargs="+", default=[1, 7, 100], help="party counts to test")
+    parser.add_argument("--tokens", type=int, nargs="+", default=[100_000, 1_000_000], help="corpus sizes to test")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per query timing (median is kept)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where synthetic corpora are written")
+    parser.add_argument("--output", default="benchmark_results.json", help="results JSON")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="also store the results as a baseline JSON")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown relative to the baseline")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args()
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "scenarios": {},
+    }
+    for n_tokens in args.tokens:
+        for n_parties in args.parties:
+            scenario = f"p{n_parties}_t{n_tokens}"
+            print(f"Running {scenario}...")
+            results["scenarios"][scenario] = run_scenario(n_parties, n_tokens, args.data_dir, args.repeat)
+            for metric, value in results["scenarios"][scenario].items():
+                unit = "MiB" if metric.endswith("_mb") else "ms"
+                print(f"  {metric:<36} {value if unit == 'MiB' else value * 1000:10.2f} {unit}")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {path}.")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression, args.min_delta)
+        for scenario, metric, reference, value in regressions:
+            print(f"Regression in {scenario} {metric}: {reference:.4g} -> {value:.4g}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""Columnar, dictionary-encoded corpus format shared by import.py and the apps.
+
+A corpus is a directory with one memory-mappable ``<column>.npy`` array of integer
+ids per column, a ``<column>.vocab.json`` list mapping ids back to strings and a
+``meta.json`` describing the columns and the documents (contiguous runs of one
+election, year and party, with the URL of the manifesto if known).
+
+Corpora built by import.py also carry a source layer in ``source/``: the cleaned
+text that was annotated (``text.txt``), the byte range of every token in it, the
+positions where sentences start and the PDF page of every token as runs
+(``page_start``, ``page``). source.py reads it.
+
+Documents sharing election, year and party form a partition. Queries select the
+partitions they need from the metadata and only touch their position ranges.
+
+Other modules derive indexes, count tables and vectors from a corpus and store
+each in a directory of its own next to the columns (see load_artifact()).
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["token", "pos", "lemma", "party", "year"]
+FORMAT_VERSION = 1
+READ_CHUNK_ROWS = 1_000_000
+DEFAULT_ELECTION = "BTW"  # corpora without election metadata hold federal manifestos
+SOURCE_DIR = "source"
+SOURCE_ARRAYS = ("token_start", "token_end", "sentence_start", "page_start", "page")
+ARTIFACT_FILE = "artifact.json"
+
+
+def smallest_dtype(size):
+    """Return the smallest unsigned integer dtype that can hold ids below size."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class CorpusWriter:
+    """Encode token rows against growing vocabularies and write them as a corpus directory.
+
+    Encoded ids are spooled to disk as they arrive and only converted into the final
+    arrays block by block in close(), so memory stays bounded by the vocabularies and
+    does not grow with the number of rows. Use the writer as a context manager to
+    discard the spool if writing fails.
+    """
+
+    def __init__(self, path, election=DEFAULT_ELECTION, url=None):
+        self.path = path
+        self.election = election
+        self.url = url
+        self.vocab = {column: {} for column in COLUMNS}
+        self.elections = {}
+        self.n_rows = 0
+        # [party id, year id, election id, start, end, url] of every run of one party, year and election
+        self.documents = []
+        # Rows and bytes covered by the source layer; it is only written if it covers every row
+        self.source_rows = 0
+        self.source_bytes = 0
+        self.last_page = None
+        self.max_page = 0
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.spool_dir = tempfile.mkdtemp(prefix=".spool-", dir=parent)
+        self.spool = {column: open(os.path.join(self.spool_dir, column), "wb") for column in (*COLUMNS, *SOURCE_ARRAYS, "text")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _encode(self, column, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        return self._remap(column, uniques)[codes] if len(codes) else codes.astype(np.int64)
+
+    def _remap(self, column, values):
+        """Return the ids of values in this writer's vocabulary, adding unseen ones."""
+        vocab = self.vocab[column]
+        return np.fromiter((vocab.setdefault(value, len(vocab)) for value in values), dtype=np.int64, count=len(values))
+
+    def _append(self, codes, election=None, url=None):
+        n = len(codes["token"])
+        if n == 0:
+            return
+        for column in COLUMNS:
+            np.asarray(codes[column], dtype=np.int64).tofile(self.spool[column])
+        election = self.elections.setdefault(self.election if election is None else election, len(self.elections))
+        url = self.url if url is None else url
+        party, year = codes["party"], codes["year"]
+        changes = np.flatnonzero((party[1:] != party[:-1]) | (year[1:] != year[:-1])) + 1
+        for start, end in zip(np.concatenate(([0], changes)), np.concatenate((changes, [n]))):
+            last = self.documents[-1] if self.documents else None
+            if last is not None and last[4] == self.n_rows + start and last[:3] == [party[start], year[start], election] and last[5] == url:
+                last[4] = self.n_rows + int(end)
+            else:
+                self.documents.append([int(party[start]), int(year[start]), election, self.n_rows + int(start), self.n_rows + int(end), url])
+        self.n_rows += n
+
+    def _append_blocks(self, mappings, codes, start, end, block_rows, election=None, url=None):
+        for block in range(start, end, block_rows):
+            stop = min(block + block_rows, end)
+            self._append({column: mappings[column][codes[column][block:stop]] for column in COLUMNS}, election, url)
+
+    def _append_source(self, n_bytes, token_start, token_end, sentence_start, page_start, page):
+        """Spool a source layer slice whose n_bytes of text were just written; offsets are relative to the previous end."""
+        (self.source_bytes + np.asarray(token_start, dtype=np.int64)).tofile(self.spool["token_start"])
+        (self.source_bytes + np.asarray(token_end, dtype=np.int64)).tofile(self.spool["token_end"])
+        (self.source_rows + np.asarray(sentence_start, dtype=np.int64)).tofile(self.spool["sentence_start"])
+        page_start = np.asarray(page_start, dtype=np.int64)
+        page = np.asarray(page, dtype=np.int64)
+        if len(page) and page[0] == self.last_page and page_start[0] == 0:
+            page_start, page = page_start[1:], page[1:]  # continues the current page run
+        (self.source_rows + page_start).tofile(self.spool["page_start"])
+        page.tofile(self.spool["page"])
+        if len(page):
+            self.last_page = int(page[-1])
+            self.max_page = max(self.max_page, int(page.max()))
+        self.source_rows += len(token_start)
+        self.source_bytes += n_bytes
+
+    def add_source(self, text, token_start, token_end, sentence_start=(0,), page=None, page_start=(0,)):
+        """Attach the source text of the rows added last.
+
+        token_start and token_end are the character offsets of these rows in text,
+        sentence_start the indices of the rows starting a sentence and page the PDF
+        page the text comes from, or a list of pages starting at the rows page_start
+        if the text runs across page breaks. A corpus gets a source layer only if every row has one.
+        """
+        if self.source_rows + len(token_start) != self.n_rows:
+            raise ValueError(f"Source text covers rows {self.source_rows} to {self.source_rows + len(token_start)}, but {self.n_rows} rows were added")
+        if len(token_start) == 0:
+            return
+        # Map character offsets to byte offsets in the UTF-8 encoding
+        code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        widths = 1 + (code_points >= 0x80) + (code_points >= 0x800) + (code_points >= 0x10000)
+        byte_offsets = np.concatenate(([0], np.cumsum(widths)))
+        # Every text ends with a newline, so snippets never run into the next one
+        data = text.encode("utf-8") + b"\n"
+        self.spool["text"].write(data)
+        token_start = np.asarray(token_start, dtype=np.int64)
+        self._append_source(
+            len(data), byte_offsets[token_start], byte_offsets[np.asarray(token_end, dtype=np.int64)], sentence_start,
+            page_start, [page or 0] if page is None or np.isscalar(page) else page,
+        )
+
+    def add_columns(self, columns, election=None, url=None):
+        """Append rows given as a mapping from column name to a sequence of strings, optionally of another election and URL."""
+        lengths = {len(columns[column]) for column in COLUMNS}
+        if len(lengths) != 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._append({column: self._encode(column, columns[column]) for column in COLUMNS}, election, url)
+
+    def add_rows(self, rows):
+        """Append rows given as (token, pos, lemma, party, year) tuples."""
+        rows = list(rows)
+        if rows:
+            self.add_columns(dict(zip(COLUMNS, (list(values) for values in zip(*rows)))))
+
+    def add_encoded(self, vocab, codes, block_rows=READ_CHUNK_ROWS, election=None):
+        """Append rows already encoded as ids into the given per-column vocabularies."""
+        mappings = {column: self._remap(column, vocab[column]) for column in COLUMNS}
+        self._append_blocks(mappings, codes, 0, len(codes["token"]), block_rows, election)
+
+    def add_corpus(self, corpus, block_rows=READ_CHUNK_ROWS):
+        """Append all rows of another corpus, remapping its ids and keeping each document's election, URL and source text."""
+        covered = self.source_rows == self.n_rows
+        mappings = {column: self._remap(column, corpus.vocab[column]) for column in COLUMNS}
+        for doc in corpus.documents:
+            self._append_blocks(mappings, corpus.codes, doc["start"], doc["end"], block_rows, doc["election"], doc.get("url"))
+        source_dir = corpus.artifact_path(SOURCE_DIR)
+        if covered and os.path.exists(os.path.join(source_dir, "text.txt")):
+            with open(os.path.join(source_dir, "text.txt"), "rb") as f:
+                shutil.copyfileobj(f, self.spool["text"])
+            self._copy_source(source_dir, os.path.getsize(os.path.join(source_dir, "text.txt")), block_rows)
+
+    def _copy_source(self, source_dir, n_bytes, block_rows):
+        """Spool the source arrays of another corpus block by block from memory maps, shifting them past the previous end."""
+        arrays = {name: np.load(os.path.join(source_dir, f"{name}.npy"), mmap_mode="r") for name in SOURCE_ARRAYS}
+        page_start, page = arrays["page_start"], arrays["page"]
+        continued = int(len(page) > 0 and page[0] == self.last_page and page_start[0] == 0)  # continues the current page run
+        shifts = {"token_start": self.source_bytes, "token_end": self.source_bytes, "sentence_start": self.source_rows, "page_start": self.source_rows, "page": 0}
+        for name, array in arrays.items():
+            for start in range(continued if name.startswith("page") else 0, len(array), block_rows):
+                (shifts[name] + np.asarray(array[start:start + block_rows], dtype=np.int64)).tofile(self.spool[name])
+        if len(page):
+            self.last_page = int(page[-1])
+            self.max_page = max(self.max_page, int(page.max()))
+        self.source_rows += len(arrays["token_start"])
+        self.source_bytes += n_bytes
+
+    def discard(self):
+        """Drop the spooled rows without writing a corpus."""
+        for f in self.spool.values():
+            f.close()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def close(self, block_rows=READ_CHUNK_ROWS):
+        """Write arrays, vocabularies and metadata to the corpus directory, replacing any previous corpus there."""
+        for f in self.spool.values():
+            f.close()
+        if os.path.exists(os.path.join(self.path, "meta.json")):
+            shutil.rmtree(self.path)  # drops indexes derived from the old corpus as well
+        os.makedirs(self.path, exist_ok=True)
+        dtypes = {}
+        for column in COLUMNS:
+            dtype = smallest_dtype(len(self.vocab[column]))
+            dtypes[column] = dtype.name
+            self._write_spooled(column, os.path.join(self.path, f"{column}.npy"), dtype, block_rows)
+            with open(os.path.join(self.path, f"{column}.vocab.json"), "w", encoding="utf-8") as f:
+                json.dump(list(self.vocab[column]), f, ensure_ascii=False)
+        if self.n_rows and self.source_rows == self.n_rows:
+            source_dir = os.path.join(self.path, SOURCE_DIR)
+            os.makedirs(source_dir)
+            os.replace(os.path.join(self.spool_dir, "text"), os.path.join(source_dir, "text.txt"))
+            for name in SOURCE_ARRAYS:
+                size = self.source_bytes + 1 if name.startswith("token") else self.n_rows + 1 if name.endswith("start") else self.max_page + 1
+                self._write_spooled(name, os.path.join(source_dir, f"{name}.npy"), smallest_dtype(size), block_rows)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        parties = list(self.vocab["party"])
+        years = list(self.vocab["year"])
+        elections = list(self.elections)
+        meta = {
+            "format_version": FORMAT_VERSION,
+            # Tells derived artifacts of this corpus apart from those of an earlier one with the same documents
+            "id": uuid.uuid4().hex,
+            "n_tokens": self.n_rows,
+            "columns": dtypes,
+            "documents": [
+                {"party": parties[party], "year": years[year], "election": elections[election], "start": start, "end": end, **({"url": url} if url else {})}
+                for party, year, election, start, end, url in self.documents
+            ],
+        }
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return Corpus(self.path)
+
+    def _write_spooled(self, name, path, dtype, block_rows):
+        """Convert a spooled int64 array into a .npy file of dtype, block by block."""
+        spooled_path = os.path.join(self.spool_dir, name)
+        n = os.path.getsize(spooled_path) // 8
+        # Plain file reads and writes keep the copy out of the resident set, unlike a memmap
+        with open(path, "wb") as target, open(spooled_path, "rb") as spooled:
+            header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (n,)}
+            np.lib.format.write_array_header_1_0(target, header)
+            for start in range(0, n, block_rows):
+                np.fromfile(spooled, dtype=np.int64, count=block_rows).astype(dtype).tofile(target)
+
+
+class Corpus:
+    """Read-only view of a corpus directory backed by memory-mapped id arrays."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format version in {path}: {self.meta.get('format_version')}")
+        self.codes = {}
+        self.vocab = {}
+        for column in COLUMNS:
+            self.codes[column] = np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+            with open(os.path.join(path, f"{column}.vocab.json"), "r", encoding="utf-8") as f:
+                self.vocab[column] = json.load(f)
+        self.documents = self.meta["documents"]
+        for doc in self.documents:
+            doc.setdefault("election", DEFAULT_ELECTION)
+        self.document_starts = np.array([doc["start"] for doc in self.documents], dtype=np.int64)
+        self.document_ends = np.array([doc["end"] for doc in self.documents], dtype=np.int64)
+        # Partitions are numbered in (election, year, party) order, independent of the physical layout
+        keys = sorted({partition_key(doc) for doc in self.documents})
+        self.partitions = [dict(zip(PARTITION_FIELDS, key)) for key in keys]
+        numbers = {key: i for i, key in enumerate(keys)}
+        self.document_partition = np.array([numbers[partition_key(doc)] for doc in self.documents], dtype=np.int64)
+        self._ids = {}
+        self._strings = {}
+        # Derived artifacts record this hash of the metadata to detect that the corpus was rewritten;
+        # the TSV record changes on export without changing the corpus
+        described = {key: value for key, value in self.meta.items() if key != "tsv"}
+        self.fingerprint = hashlib.sha1(json.dumps(described, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        # Derived structures (indexes, count tables) attached by other modules
+        self.cache = {}
+
+    def __len__(self):
+        return self.meta["n_tokens"]
+
+    def artifact_path(self, *parts):
+        """Return a path inside the corpus directory."""
+        return os.path.join(self.path, *parts)
+
+    def id(self, column, value):
+        """Return the id of value in a column's vocabulary, or -1 if it does not occur."""
+        if column not in self._ids:
+            self._ids[column] = {string: i for i, string in enumerate(self.vocab[column])}
+        return self._ids[column].get(value, -1)
+
+    def strings(self, column):
+        """Return a column's vocabulary as an object array for vectorized decoding."""
+        if column not in self._strings:
+            self._strings[column] = np.asarray(self.vocab[column], dtype=object)
+        return self._strings[column]
+
+    def decode(self, column, ids):
+        """Map ids of a column back to strings."""
+        return self.strings(column)[np.asarray(ids)]
+
+    @property
+    def elections(self):
+        """Return the (election, year) pairs of the corpus, oldest first."""
+        return sorted({(partition["election"], partition["year"]) for partition in self.partitions}, key=lambda pair: (pair[1], pair[0]))
+
+    @property
+    def partition_party(self):
+        """Return the party id of every partition."""
+        return np.array([self.id("party", partition["party"]) for partition in self.partitions], dtype=np.int64)
+
+    def partition_ids(self, party=None, year=None, election=None):
+        """Return the ids of the partitions matching all given filters.
+
+        Every filter is a single value or a collection of values; None matches everything.
+        """
+        mask = np.ones(len(self.partitions), dtype=bool)
+        for field, wanted in zip(PARTITION_FIELDS, (election, year, party)):
+            if wanted is not None:
+                wanted = {str(wanted)} if isinstance(wanted, (str, int)) else {str(value) for value in wanted}
+                mask &= np.array([partition[field] in wanted for partition in self.partitions], dtype=bool)
+        return np.flatnonzero(mask)
+
+    def document_ranges(self, party=None, year=None, election=None):
+        """Return start and end position arrays of the documents in the matching partitions."""
+        if party is None and year is None and election is None:
+            return self.document_starts, self.document_ends
+        selected = np.isin(self.document_partition, self.partition_ids(party, year, election))
+        return self.document_starts[selected], self.document_ends[selected]
+
+    def to_dataframe(self, columns=None, categorical=False):
+        """Return the corpus as a token/pos/lemma/party/year DataFrame.
+
+        With categorical=True the columns share the memory-mapped ids as categorical
+        codes instead of materializing one Python string per row.
+        """
+        data = {}
+        for column in columns or COLUMNS:
+            codes = self.codes[column]
+            if categorical:
+                data[column] = pd.Categorical.from_codes(codes.astype(np.int64), categories=self.vocab[column])
+            else:
+                data[column] = self.decode(column, codes)
+        df = pd.DataFrame(data)
+        if "year" in df and not categorical and all(year.isdigit() for year in self.vocab["year"]):
+            df["year"] = df["year"].astype(np.int64)
+        return df
+
+
+PARTITION_FIELDS = ("election", "year", "party")
+
+
+def partition_key(doc):
+    """Return the (election, year, party) key of a document."""
+    return tuple(doc[field] for field in PARTITION_FIELDS)
+
+
+def election_label(election, year):
+    """Return the display name of an election, e.g. "BTW 2025"."""
+    return f"{election} {year}"
+
+
+def tsv_signature(tsv_path):
+    """Return the size and modification time of a TSV file."""
+    stat = os.stat(tsv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def record_tsv(corpus, tsv_path, signature):
+    """Record in meta.json, by file name, the signature of a TSV a corpus was converted from or exported to."""
+    corpus.meta.setdefault("tsv", {})[os.path.basename(tsv_path)] = signature
+    meta_path = os.path.join(corpus.path, "meta.json")
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(corpus.meta, f, ensure_ascii=False, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+def convert_tsv(tsv_path, corpus_path, chunk_rows=READ_CHUNK_ROWS):
+    """Convert a token/pos/lemma/party/year TSV into a corpus directory."""
+    print(f"Converting {tsv_path} to {corpus_path}...")
+    # Taken before reading, so a TSV changed during the conversion is converted again on the next load
+    signature = tsv_signature(tsv_path)
+    reader = pd.read_csv(tsv_path, sep="\t", quoting=3, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    with CorpusWriter(corpus_path) as writer:
+        for chunk in reader:
+            writer.add_columns({column: chunk[column].to_numpy() for column in COLUMNS})
+    corpus = Corpus(corpus_path)
+    record_tsv(corpus, tsv_path, signature)
+    print(f"Wrote {len(corpus)} tokens to {corpus_path}.")
+    return corpus
+
+
+def concat_corpora(paths, corpus_path):
+    """Concatenate corpus directories, in order, into a new corpus directory.
+
+    Callers pass the shards grouped by election and year, so that every election
+    occupies one contiguous position range.
+    """
+    with CorpusWriter(corpus_path) as writer:
+        for path in paths:
+            writer.add_corpus(Corpus(path))
+    return Corpus(corpus_path)
+
+
+def write_tsv(corpus, tsv_path, chunk_rows=READ_CHUNK_ROWS):
+    """Export a corpus back to the token/pos/lemma/party/year TSV layout and record the TSV in its metadata."""
+    with open(tsv_path, "w", encoding="utf-8", newline="") as f:
+        f.write("\t".join(COLUMNS) + "\n")
+        for start in range(0, len(corpus), chunk_rows):
+            block = pd.DataFrame({
+                column: corpus.decode(column, corpus.codes[column][start:start + chunk_rows]) for column in COLUMNS
+            })
+            block.to_csv(f, sep="\t", header=False, index=False, quoting=3)
+    try:
+        record_tsv(corpus, tsv_path, tsv_signature(tsv_path))
+    except OSError:
+        pass  # a read-only corpus can still be exported
+
+
+def load_corpus(path, source_tsv=None):
+    """Load a corpus directory, converting it from source_tsv first if it does not exist yet or the TSV changed.
+
+    A corpus records the size and modification time of the TSVs it was converted
+    from or exported to, by file name. If source_tsv has another size or
+    modification time than recorded, it was edited since and the corpus is
+    converted again; this drops the derived artifacts and, for corpora written
+    by import.py, the source layer. Corpora without a record of the TSV are kept.
+    """
+    if source_tsv is not None:
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return convert_tsv(source_tsv, path)
+        corpus = Corpus(path)
+        recorded = corpus.meta.get("tsv", {}).get(os.path.basename(source_tsv))
+        if recorded is not None and os.path.exists(source_tsv) and recorded != tsv_signature(source_tsv):
+            print(f"{source_tsv} changed since {path} was written.")
+            return convert_tsv(source_tsv, path)
+        return corpus
+    return Corpus(path)
+
+
+def read_artifact(corpus, name, version=1):
+    """Return the stored arrays of a derived artifact, or None if it is missing or was built from another corpus or version."""
+    directory = corpus.artifact_path(name)
+    try:
+        with open(os.path.join(directory, ARTIFACT_FILE), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        if stamp["fingerprint"] != corpus.fingerprint or stamp["version"] != version:
+            return None
+        arrays = {}
+        for key in stamp["arrays"]:
+            arrays[key] = np.load(os.path.join(directory, f"{key}.npy"), mmap_mode="r")
+        for key in stamp["objects"]:
+            with open(os.path.join(directory, f"{key}.json"), "r", encoding="utf-8") as f:
+                arrays[key] = json.load(f)
+        return arrays
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_artifact(corpus, name, arrays, version=1):
+    """Store the arrays (and JSON-serializable objects) of a derived artifact in its directory under the corpus.
+
+    The stamp naming the corpus fingerprint is written last, so an interrupted
+    save leaves an artifact that read_artifact() rejects. Every file is replaced
+    atomically, so processes that memory-mapped the previous version keep it.
+    """
+    directory = corpus.artifact_path(name)
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, ARTIFACT_FILE)):
+        os.remove(os.path.join(directory, ARTIFACT_FILE))
+    stamp = {"fingerprint": corpus.fingerprint, "version": version, "arrays": [], "objects": []}
+    for key, value in arrays.items():
+        if isinstance(value, np.ndarray):
+            path = os.path.join(directory, f"{key}.npy")
+            with open(f"{path}.{os.getpid()}.tmp", "wb") as f:
+                np.save(f, value)
+            stamp["arrays"].append(key)
+        else:
+            path = os.path.join(directory, f"{key}.json")
+            with open(f"{path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            stamp["objects"].append(key)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    with open(os.path.join(directory, ARTIFACT_FILE), "w", encoding="utf-8") as f:
+        json.dump(stamp, f)
+
+
+def load_artifact(corpus, name, build, version=1):
+    """Return the arrays of a derived artifact, building and storing them if no current ones are stored.
+
+    name is the artifact's directory relative to the corpus, build a function
+    returning its arrays. Artifacts stored for another corpus fingerprint or
+    version are rebuilt; if the corpus directory is read-only, they are built
+    on every load.
+    """
+    arrays = read_artifact(corpus, name, version)
+    if arrays is None:
+        arrays = build()
+        try:
+            save_artifact(corpus, name, arrays, version)
+        except OSError:
+            pass
+    return arrays
+
+
+def corpus_path_for(tsv_path):
+    """Return the default corpus directory for a TSV file (btw25.tsv -> btw25.corpus)."""
+    return os.path.splitext(tsv_path)[0] + ".corpus"
+
+
+if __name__ == "__main__":
+    if not ((len(sys.argv) in (3, 4) and sys.argv[1] == "convert") or (len(sys.argv) == 4 and sys.argv[1] == "export")):
+        print("Usage: python corpus.py convert <file.tsv> [<corpus dir>]\n"
+              "       python corpus.py export <corpus dir> <file.tsv>", file=sys.stderr)
+        sys.exit(2)
+    if sys.argv[1] == "convert":
+        tsv = sys.argv[2]
+        convert_tsv(tsv, sys.argv[3] if len(sys.argv) == 4 else corpus_path_for(tsv))
+    else:
+        write_tsv(Corpus(sys.argv[2]), sys.argv[3])
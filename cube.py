@@ -0,0 +1,232 @@
+"""Precomputed lemma x partition x POS count cube shared by both apps.
+
+The cube stores the non-zero counts as four parallel arrays sorted by lemma,
+partition (election, year and party) and POS id, plus the token total of every
+partition and party. Queries restricted to some elections or parties only sum the
+matching partitions. The heatmap tabs of every election are additionally
+precomputed up to HEATMAP_MAX_ROWS lemmas, so a slider change only slices them.
+"""
+import numpy as np
+import pandas as pd
+
+from corpus import election_label, load_artifact, save_artifact, smallest_dtype
+from index import gather_ranges
+
+CUBE_DIR = "cube"
+
+# Heatmap tabs and the STTS tag substring selecting their POS tags
+HEATMAP_POS = {
+    "Substantive": "NN",
+    "Adjektive": "ADJ",
+    "Verben": "VV",
+}
+HEATMAP_EXCLUDED = ["Freie", "Demokrat"]
+HEATMAP_MAX_ROWS = 50
+
+
+class Cube:
+    """Sparse lemma x partition x POS counts with per-partition and per-party token totals."""
+
+    def __init__(self, corpus, arrays):
+        self.corpus = corpus
+        self.lemma = arrays["lemma"]
+        self.partition = arrays["partition"]
+        self.pos = arrays["pos"]
+        self.count = arrays["count"]
+        self.partition_party = corpus.partition_party
+        self.party = self.partition_party[self.partition].astype(smallest_dtype(len(corpus.vocab["party"])))
+        self.partition_totals = arrays["partition_totals"]
+        self.party_totals = np.bincount(self.partition_party, weights=self.partition_totals, minlength=len(self.parties)).astype(np.int64)
+        self.heatmaps = arrays["heatmap"]
+
+    @property
+    def parties(self):
+        return self.corpus.vocab["party"]
+
+    def selection(self, year=None, election=None):
+        """Return the partition ids of some years or elections, or None for the whole corpus."""
+        if year is None and election is None:
+            return None
+        return self.corpus.partition_ids(year=year, election=election)
+
+    def lemma_entries(self, lemma):
+        """Return the cube entries of a lemma (a slice) or of a list of lemmas (an index array)."""
+        if isinstance(lemma, str):
+            lemma_id = self.corpus.id("lemma", lemma)
+            return slice(*np.searchsorted(self.lemma, [lemma_id, lemma_id + 1])) if lemma_id >= 0 else slice(0, 0)
+        ids = np.array([self.corpus.id("lemma", value) for value in lemma], dtype=np.int64)
+        ids = ids[ids >= 0]
+        return gather_ranges(np.searchsorted(self.lemma, ids), np.searchsorted(self.lemma, ids + 1))
+
+    def partition_counts(self, lemma):
+        """Return the frequency of a lemma, or the summed frequency of a list of lemmas, per partition id."""
+        entries = self.lemma_entries(lemma)
+        return np.bincount(self.partition[entries], weights=self.count[entries], minlength=len(self.partition_totals)).astype(np.int64)
+
+    def lemma_counts(self, lemma, partitions=None):
+        """Return the frequency of a lemma (or list of lemmas) per party id, optionally only within some partitions."""
+        counts = self.partition_counts(lemma)
+        if partitions is not None:
+            counts = np.where(np.isin(np.arange(len(counts)), partitions), counts, 0)
+        return np.bincount(self.partition_party, weights=counts, minlength=len(self.parties)).astype(np.int64)
+
+    def party_sizes(self, partitions=None):
+        """Return the token total of every party, optionally only within some partitions."""
+        if partitions is None:
+            return self.party_totals
+        return np.bincount(self.partition_party[partitions], weights=self.partition_totals[partitions], minlength=len(self.parties)).astype(np.int64)
+
+    def lemma_party_matrix(self, pos_ids=None, partitions=None):
+        """Return a dense lemma x party count matrix, optionally restricted to some POS ids and partitions."""
+        mask = np.ones(len(self.count), dtype=bool)
+        if pos_ids is not None:
+            mask &= np.isin(self.pos, pos_ids)
+        if partitions is not None:
+            mask &= np.isin(self.partition, partitions)
+        keys = self.lemma[mask].astype(np.int64) * len(self.parties) + self.party[mask]
+        counts = np.bincount(keys, weights=self.count[mask], minlength=len(self.corpus.vocab["lemma"]) * len(self.parties))
+        return counts.reshape(len(self.corpus.vocab["lemma"]), len(self.parties)).astype(np.int64)
+
+    def frequency_table(self, lemma, year=None, election=None, label=None):
+        """Return lemma, party, freq and count (party size) for every party, sorted by party.
+
+        Parties in which the lemma does not occur get a missing freq. With year or
+        election only the matching partitions are counted. For a list of lemmas the
+        frequencies are summed and label is shown as the lemma.
+        """
+        partitions = self.selection(year, election)
+        counts = self.lemma_counts(lemma, partitions)
+        df = pd.DataFrame({
+            "lemma": np.where(counts > 0, label or (lemma if isinstance(lemma, str) else "|".join(lemma)), None),
+            "party": self.parties,
+            "freq": np.where(counts > 0, counts, np.nan),
+            "count": self.party_sizes(partitions),
+        })
+        return df[df["count"] > 0].sort_values("party").reset_index(drop=True)
+
+    def heatmap(self, tab, number_of_rows, election=None, year=None):
+        """Return the relative and absolute frequency matrices of a heatmap tab's top lemmas.
+
+        Heatmaps are per election; without one the most recent election is shown.
+        """
+        if number_of_rows > HEATMAP_MAX_ROWS:
+            raise ValueError(f"At most {HEATMAP_MAX_ROWS} heatmap rows are precomputed, got {number_of_rows}")
+        if election is None:
+            election, year = self.corpus.elections[-1]
+        heatmap = self.heatmaps[election_label(election, year)][tab]
+        top = sorted(range(min(number_of_rows, len(heatmap["lemmas"]))), key=lambda i: heatmap["lemmas"][i])
+        lemmas = [heatmap["lemmas"][i] for i in top]
+        matrix = pd.DataFrame(np.array(heatmap["rel_freq"])[top], index=lemmas, columns=heatmap["parties"])
+        matrix_table = pd.DataFrame(np.array(heatmap["freq"])[top], index=lemmas, columns=heatmap["parties"])
+        for frame in (matrix, matrix_table):
+            frame.index.name = "lemma"
+            frame.columns.name = "party"
+        return matrix, matrix_table
+
+
+def pos_ids_matching(corpus, pattern):
+    """Return the ids of all POS tags containing pattern (as in df.pos.str.contains)."""
+    return np.array([i for i, tag in enumerate(corpus.vocab["pos"]) if pattern in tag], dtype=np.int64)
+
+
+def count_cube(corpus):
+    """Count lemma x partition x POS combinations, one document at a time."""
+    n_pos = len(corpus.vocab["pos"])
+    lemma_ids = corpus.codes["lemma"]
+    pos_ids = corpus.codes["pos"]
+    keys = []
+    counts = []
+    for doc, partition_id in zip(corpus.documents, corpus.document_partition):
+        doc_keys, doc_counts = np.unique(
+            lemma_ids[doc["start"]:doc["end"]].astype(np.int64) * n_pos + pos_ids[doc["start"]:doc["end"]],
+            return_counts=True,
+        )
+        lemma_pos = np.divmod(doc_keys, n_pos)
+        keys.append((lemma_pos[0] * len(corpus.partitions) + partition_id) * n_pos + lemma_pos[1])
+        counts.append(doc_counts)
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Several documents of one partition share keys, so merge them
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    return keys, np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+
+
+def build_heatmap(corpus, arrays, tab):
+    """Precompute the top HEATMAP_MAX_ROWS lemmas of one heatmap tab from lemma, party, pos and count arrays."""
+    n_parties = len(corpus.vocab["party"])
+    excluded = [corpus.id("lemma", lemma) for lemma in HEATMAP_EXCLUDED]
+    mask = np.isin(arrays["pos"], pos_ids_matching(corpus, HEATMAP_POS[tab])) & ~np.isin(arrays["lemma"], excluded)
+    keys, inverse = np.unique(arrays["lemma"][mask].astype(np.int64) * n_parties + arrays["party"][mask], return_inverse=True)
+    freq = np.bincount(inverse, weights=arrays["count"][mask])
+    lemma_ids, party_ids = np.divmod(keys, n_parties)
+    party_sums = np.bincount(party_ids, weights=freq, minlength=n_parties)
+    rel_freq = freq / party_sums[party_ids] * 100 if len(freq) else freq
+
+    # Rank lemmas by their summed relative frequency; ties keep alphabetical order like nlargest on a groupby
+    lemmas, lemma_inverse = np.unique(lemma_ids, return_inverse=True)
+    scores = np.bincount(lemma_inverse, weights=rel_freq, minlength=len(lemmas))
+    alphabetical = np.argsort(corpus.decode("lemma", lemmas).astype(str), kind="stable")
+    rank = np.empty_like(alphabetical)
+    rank[alphabetical] = np.arange(len(alphabetical))
+    top = np.lexsort((rank, -scores))[:HEATMAP_MAX_ROWS]
+
+    present = np.unique(party_ids)
+    parties = sorted(corpus.vocab["party"][i] for i in present)
+    column = {corpus.id("party", party): j for j, party in enumerate(parties)}
+    row = {lemma_index: i for i, lemma_index in enumerate(top)}
+    rel_matrix = np.zeros((len(top), len(parties)))
+    freq_matrix = np.zeros((len(top), len(parties)))
+    for entry in np.flatnonzero(np.isin(lemma_inverse, top)):
+        i, j = row[lemma_inverse[entry]], column[party_ids[entry]]
+        rel_matrix[i, j] = rel_freq[entry]
+        freq_matrix[i, j] = freq[entry]
+    return {
+        "lemmas": list(corpus.decode("lemma", lemmas[top])),
+        "parties": parties,
+        "rel_freq": rel_matrix.tolist(),
+        "freq": freq_matrix.tolist(),
+    }
+
+
+def build_election_heatmaps(corpus, arrays):
+    """Precompute the heatmap tabs of every election in the corpus."""
+    party = corpus.partition_party[arrays["partition"]]
+    heatmaps = {}
+    for election, year in corpus.elections:
+        mask = np.isin(arrays["partition"], corpus.partition_ids(year=year, election=election))
+        selected = {"lemma": arrays["lemma"][mask], "party": party[mask], "pos": arrays["pos"][mask], "count": arrays["count"][mask]}
+        heatmaps[election_label(election, year)] = {tab: build_heatmap(corpus, selected, tab) for tab in HEATMAP_POS}
+    return heatmaps
+
+
+def cube_arrays(corpus):
+    """Return the count arrays, partition totals and heatmap tables of a corpus."""
+    n_pos = len(corpus.vocab["pos"])
+    n_partitions = len(corpus.partitions)
+    keys, counts = count_cube(corpus)
+    lemma_partition, pos = np.divmod(keys, n_pos)
+    lemma, partition = np.divmod(lemma_partition, n_partitions)
+    arrays = {
+        "lemma": lemma.astype(smallest_dtype(len(corpus.vocab["lemma"]))),
+        "partition": partition.astype(smallest_dtype(n_partitions)),
+        "pos": pos.astype(smallest_dtype(n_pos)),
+        "count": counts.astype(smallest_dtype(int(counts.max()) + 1 if len(counts) else 1)),
+    }
+    arrays["partition_totals"] = np.bincount(arrays["partition"], weights=counts, minlength=n_partitions).astype(np.int64)
+    arrays["heatmap"] = build_election_heatmaps(corpus, arrays)
+    return arrays
+
+
+def build_cube(corpus, save=True):
+    """Build the count cube and heatmap tables of a corpus and optionally persist them."""
+    arrays = cube_arrays(corpus)
+    if save:
+        save_artifact(corpus, CUBE_DIR, arrays)
+    return Cube(corpus, arrays)
+
+
+def load_cube(corpus):
+    """Return the count cube of a corpus, loading or building it on first use."""
+    if "cube" not in corpus.cache:
+        corpus.cache["cube"] = Cube(corpus, load_artifact(corpus, CUBE_DIR, lambda: cube_arrays(corpus)))
+    return corpus.cache["cube"]
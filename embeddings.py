@@ -0,0 +1,246 @@
+"""Distributional word vectors per party and for the whole corpus.
+
+The vectors are built from the corpus itself, because the spaCy model has no
+useful ones. Lemmas are counted together in symmetric windows of five tokens, as
+for the collocations, and windows stop at the end of a manifesto. The counts are
+weighted with positive pointwise mutual information (PPMI, with context
+distribution smoothing) and reduced with a truncated SVD. Every party gets its own
+vectors, built from its own manifestos only. These are rotated onto the vectors
+of the whole corpus (orthogonal Procrustes over the lemmas frequent in both), so
+that the vectors of one lemma can be compared across parties.
+
+The vocabulary is the most frequent lemmas, without punctuation. All vectors are
+stored as one float32 array under ``<corpus>/embeddings/``. Rows have unit
+length, so the nearest neighbours of a lemma are an exact search: one
+matrix-vector product and a partial sort.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.linalg import orthogonal_procrustes
+
+from corpus import load_artifact, save_artifact
+from cube import load_cube
+from index import gather_ranges
+from source import context_windows
+
+EMBEDDINGS_DIR = "embeddings"
+VOCABULARY_SIZE = 10000
+WINDOW = 5  # tokens left and right, as in the collocations
+DIMENSIONS = 100
+CONTEXT_SMOOTHING = 0.75
+MIN_COUNT = 5  # lemmas rarer than this in a party get no neighbours there
+OVERSAMPLING = 10
+POWER_ITERATIONS = 4
+COOCCURRENCE_BLOCK = 1 << 20  # positions whose windows are counted at once
+
+
+class Embeddings:
+    """Unit-length lemma vectors of the whole corpus and of every party, in one aligned space."""
+
+    def __init__(self, corpus, lemma, freq, vectors):
+        self.corpus = corpus
+        self.lemma = lemma
+        self.freq = freq
+        self.vectors = vectors
+        self.total = np.asarray(freq).sum(axis=1)
+        self.row = np.full(len(corpus.vocab["lemma"]), -1, dtype=np.int64)
+        self.row[lemma] = np.arange(len(lemma))
+
+    @property
+    def parties(self):
+        """Return the parties with vectors, alphabetically."""
+        return sorted(party for i, party in enumerate(self.corpus.vocab["party"]) if self.freq[:, i].any())
+
+    def space(self, party=None):
+        """Return the vectors of a party, or of the whole corpus, and the frequency of every row in it."""
+        if party is None:
+            return self.vectors[0], self.total
+        party_id = self.corpus.id("party", party)
+        return self.vectors[1 + party_id], self.freq[:, party_id]
+
+    def lookup(self, lemma):
+        """Return the row of a lemma, or -1 if it has no vector."""
+        lemma_id = self.corpus.id("lemma", lemma)
+        return int(self.row[lemma_id]) if lemma_id >= 0 else -1
+
+    def neighbours(self, row, party=None, top=20):
+        """Return the rows most similar to row in a party's space and their cosine similarities."""
+        vectors, freq = self.space(party)
+        scores = np.asarray(vectors @ vectors[row], dtype=np.float64)
+        scores[freq < MIN_COUNT] = -np.inf
+        scores[row] = -np.inf
+        top = min(top, int(np.isfinite(scores).sum()))
+        if top <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return best, scores[best]
+
+    def similar(self, lemma, party=None, top=20):
+        """Return the lemmas used most like lemma, in one party or in the whole corpus, with similarity and frequency."""
+        columns = ["lemma", "similarity", "freq"]
+        row = self.lookup(lemma)
+        vectors, freq = self.space(party)
+        if row < 0 or freq[row] < MIN_COUNT:
+            return pd.DataFrame(columns=columns)
+        rows, scores = self.neighbours(row, party, top)
+        return pd.DataFrame({
+            "lemma": self.corpus.decode("lemma", self.lemma[rows]),
+            "similarity": scores,
+            "freq": freq[rows],
+        }, columns=columns)
+
+    def shift(self, lemma, top=5):
+        """Return, per party, how close its vector of lemma is to the corpus-wide one and its nearest neighbours.
+
+        Parties in which the lemma is rarer than MIN_COUNT are left out.
+        """
+        columns = ["party", "freq", "similarity", "neighbours"]
+        row = self.lookup(lemma)
+        rows = []
+        if row >= 0:
+            overall = self.vectors[0][row]
+            for party in self.parties:
+                vectors, freq = self.space(party)
+                if freq[row] < MIN_COUNT:
+                    continue
+                neighbours, _ = self.neighbours(row, party, top)
+                rows.append((party, int(freq[row]), float(vectors[row] @ overall),
+                             ", ".join(self.corpus.decode("lemma", self.lemma[neighbours]))))
+        return pd.DataFrame(rows, columns=columns)
+
+    def party_similarity(self, lemma):
+        """Return the cosine similarities of the party vectors of lemma as a party x party table."""
+        row = self.lookup(lemma)
+        if row < 0:
+            return pd.DataFrame()
+        parties = [party for party in self.parties if self.space(party)[1][row] >= MIN_COUNT]
+        matrix = np.array([self.space(party)[0][row] for party in parties], dtype=np.float64).reshape(len(parties), -1)
+        return pd.DataFrame(matrix @ matrix.T, index=parties, columns=parties)
+
+
+def embedding_vocabulary(corpus, size=VOCABULARY_SIZE):
+    """Return the ids of the most frequent lemmas, without punctuation, and their lemma x party counts."""
+    counts = load_cube(corpus)
+    words = np.array([i for i, tag in enumerate(corpus.vocab["pos"]) if not tag.startswith("$")], dtype=np.int64)
+    matrix = counts.lemma_party_matrix(words)
+    totals = matrix.sum(axis=1)
+    lemma = np.argsort(-totals, kind="stable")[:size]
+    lemma = lemma[totals[lemma] >= MIN_COUNT]
+    return lemma, matrix[lemma]
+
+
+def cooccurrences(corpus, row, n_rows, starts, ends, window=WINDOW, block_tokens=COOCCURRENCE_BLOCK):
+    """Count how often two vocabulary rows occur within window tokens of each other in some documents.
+
+    The windows are those of the collocations, clipped to each document. They are
+    taken for block_tokens positions at a time; every block contributes its distinct
+    pairs and their counts, and the matrix is built from all of them at the end.
+    The result is symmetric.
+    """
+    offsets = np.concatenate((np.arange(-window, 0), np.arange(1, window + 1)))
+    positions = gather_ranges(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+    codes = corpus.codes["lemma"]
+    keys, counts = [], []
+    for block in range(0, len(positions), block_tokens):
+        centre = positions[block:block + block_tokens]
+        centre = centre[row[codes[centre]] >= 0]
+        context, hit = context_windows(corpus, centre, offsets)
+        context_row = row[codes[context]]
+        keep = context_row >= 0
+        pairs, n = np.unique(row[codes[centre[hit[keep]]]] * n_rows + context_row[keep], return_counts=True)
+        keys.append(pairs)
+        counts.append(n)
+    keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+    counts = np.concatenate(counts).astype(np.float64) if counts else np.zeros(0)
+    # Pairs found in several blocks are summed by the conversion
+    return sparse.coo_matrix((counts, (keys // n_rows, keys % n_rows)), shape=(n_rows, n_rows)).tocsr()
+
+
+def ppmi(matrix, smoothing=CONTEXT_SMOOTHING):
+    """Weight a co-occurrence matrix with positive PMI; context counts are raised to smoothing."""
+    matrix = matrix.tocoo()
+    word = np.asarray(matrix.sum(axis=1)).ravel()
+    context = np.asarray(matrix.sum(axis=0)).ravel() ** smoothing
+    pmi = np.log(matrix.data * context.sum() / (word[matrix.row] * context[matrix.col]))
+    keep = pmi > 0
+    return sparse.csr_matrix((pmi[keep], (matrix.row[keep], matrix.col[keep])), shape=matrix.shape)
+
+
+def truncated_svd(matrix, dimensions, oversampling=OVERSAMPLING, iterations=POWER_ITERATIONS, seed=0):
+    """Return the leading left singular vectors and values of a sparse matrix by randomized SVD.
+
+    A seeded random projection with a few power iterations needs only some dozen
+    sparse block products, instead of the hundreds of matrix-vector products of
+    ARPACK, and gives the same result on every run.
+    """
+    rng = np.random.default_rng(seed)
+    basis = matrix @ rng.standard_normal((matrix.shape[1], dimensions + oversampling))
+    basis, _ = np.linalg.qr(basis)
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(matrix.T @ basis)
+        basis, _ = np.linalg.qr(matrix @ basis)
+    u, s, _ = np.linalg.svd((matrix.T @ basis).T, full_matrices=False)
+    return (basis @ u)[:, :dimensions], s[:dimensions]
+
+
+def svd_vectors(matrix, dimensions=DIMENSIONS):
+    """Reduce a PPMI matrix to unit-length float32 vectors with a truncated SVD."""
+    dimensions = min(dimensions, min(matrix.shape) - 1)
+    if matrix.nnz == 0 or dimensions < 1:
+        return np.zeros((matrix.shape[0], max(dimensions, 0)), dtype=np.float32)
+    if dimensions + OVERSAMPLING < min(matrix.shape):
+        u, s = truncated_svd(matrix, dimensions)
+    else:
+        # Small vocabularies are decomposed exactly
+        u, s, _ = np.linalg.svd(matrix.toarray(), full_matrices=False)
+        u, s = u[:, :dimensions], s[:dimensions]
+    # Weight the dimensions by the square root of the singular values
+    vectors = u * np.sqrt(s)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+def align(vectors, reference, anchors):
+    """Rotate vectors onto reference, fitted on the anchor rows, and keep them unit length."""
+    if len(anchors) == 0:
+        return vectors
+    rotation, _ = orthogonal_procrustes(vectors[anchors], reference[anchors])
+    return (vectors @ rotation).astype(np.float32)
+
+
+def embedding_arrays(corpus, size=VOCABULARY_SIZE, window=WINDOW, dimensions=DIMENSIONS):
+    """Build the vocabulary, its lemma x party counts and the aligned vectors of the corpus and every party."""
+    lemma, freq = embedding_vocabulary(corpus, size)
+    row = np.full(len(corpus.vocab["lemma"]), -1, dtype=np.int64)
+    row[lemma] = np.arange(len(lemma))
+
+    # The corpus-wide counts are the sum of the party counts
+    matrices = []
+    for party in corpus.vocab["party"]:
+        starts, ends = corpus.document_ranges(party=party)
+        matrices.append(cooccurrences(corpus, row, len(lemma), starts, ends, window))
+    overall = svd_vectors(ppmi(sum(matrices, sparse.csr_matrix((len(lemma), len(lemma))))), dimensions)
+    vectors = np.zeros((len(matrices) + 1, *overall.shape), dtype=np.float32)
+    vectors[0] = overall
+    for party_id, matrix in enumerate(matrices):
+        anchors = np.flatnonzero(freq[:, party_id] >= MIN_COUNT)
+        vectors[1 + party_id] = align(svd_vectors(ppmi(matrix), dimensions), overall, anchors)
+    return {"lemma": lemma, "freq": freq, "vectors": vectors}
+
+
+def build_embeddings(corpus, save=True):
+    """Compute the vectors of the corpus and every party and optionally persist them."""
+    arrays = embedding_arrays(corpus)
+    if save:
+        save_artifact(corpus, EMBEDDINGS_DIR, arrays)
+    return Embeddings(corpus, **arrays)
+
+
+def load_embeddings(corpus):
+    """Return the embeddings of a corpus, memory-mapped, building them on first use."""
+    if "embeddings" not in corpus.cache:
+        corpus.cache["embeddings"] = Embeddings(corpus, **load_artifact(corpus, EMBEDDINGS_DIR, lambda: embedding_arrays(corpus)))
+    return corpus.cache["embeddings"]
@@ -0,0 +1,160 @@
+"""Concurrent PDF fetching with a content-addressed on-disk cache."""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from fake_useragent import UserAgent
+
+CACHE_DIR = "cache"
+
+FetchResult = namedtuple("FetchResult", ["url", "path", "sha256", "from_cache"])
+
+
+def make_session(retries=3, backoff=0.5, pool_size=16):
+    """Create a pooled HTTP session that retries transient failures with exponential backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = UserAgent().random
+    return session
+
+
+class PdfFetcher:
+    """Download PDFs concurrently into a cache keyed by URL and content hash.
+
+    The cache directory holds one blob per distinct content (``blobs/<sha256>.pdf``)
+    and an ``index.json`` mapping each URL to its hash and validators. Cached URLs are
+    revalidated with ETag/Last-Modified; in offline mode only the cache is read.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, offline=False, max_workers=8, per_host=2,
+                 retries=3, backoff=0.5, timeout=60, session=None):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.offline = offline
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = session if session is not None else make_session(retries, backoff, max_workers)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.index = self._load_index()
+        self._lock = threading.Lock()
+        self._host_slots = {}
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def blob_path(self, sha256):
+        """Return the cache path for content with the given hash."""
+        return os.path.join(self.blob_dir, f"{sha256}.pdf")
+
+    def cached(self, url):
+        """Return the cached FetchResult for url, or None if it is not in the cache."""
+        entry = self.index.get(url)
+        if entry is None or not os.path.exists(self.blob_path(entry["sha256"])):
+            return None
+        return FetchResult(url, self.blob_path(entry["sha256"]), entry["sha256"], True)
+
+    def fetch(self, url):
+        """Return a FetchResult for url, downloading only if the cached copy is missing or stale."""
+        cached = self.cached(url)
+        if self.offline:
+            if cached is None:
+                raise FileNotFoundError(f"Not in cache (offline mode): {url}")
+            return cached
+
+        headers = {}
+        if cached is not None:
+            entry = self.index[url]
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        print(f"Downloading PDF from {url}...")
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    if response.status_code == 304 and cached is not None:
+                        print(f"Not modified, using cached copy of {url}.")
+                        return cached
+                    if response.status_code == 403:
+                        raise requests.HTTPError(f"Access denied (403) for URL: {url}", response=response)
+                    response.raise_for_status()
+                    sha256 = self._store(response)
+                    validators = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            print(f"Request failed for {url} ({e}), using cached copy.", file=sys.stderr)
+            return cached
+
+        with self._lock:
+            self.index[url] = {"sha256": sha256, **validators}
+            self._save_index()
+        print(f"Download complete: {url}")
+        return FetchResult(url, self.blob_path(sha256), sha256, False)
+
+    def _store(self, response):
+        """Stream a response body into the blob store and return its SHA-256."""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in response.iter_content(chunk_size=1 << 16):
+                    digest.update(block)
+                    f.write(block)
+            sha256 = digest.hexdigest()
+            os.replace(tmp_path, self.blob_path(sha256))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return sha256
+
+    def fetch_all(self, urls):
+        """Fetch urls concurrently; return a dict mapping each URL to a FetchResult or the raised exception."""
+        def attempt(url):
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                return e
+
+        unique_urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(unique_urls, executor.map(attempt, unique_urls)))
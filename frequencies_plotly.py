@@ -1,10 +1,13 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import random
 from datetime import datetime
-from collections import Counter
-import numpy as np
+import analysis
+import corpus
+import phrase
+import service
+import vocabulary
+
+CORPUS_PATH = "btw25_corrected.corpus"
 
 today_date = datetime.today().strftime("%d.%m.%Y")
 
@@ -32,84 +35,55 @@ flection = {
 }
 
 # UI for input
-lemma = st.text_input("Suchwort eingeben (unflektierte Grundform): ")
-
-# Load data
-df = pd.read_csv("btw25_corrected.tsv", sep="\t", quoting=3)
-
-# Group data by lemma and party
-df_grouped = df.groupby(['lemma', 'party']).size().reset_index(name='freq')
-
-def generate_kwic(df, query_lemma, selected_party, context_size=15, max_examples=10):
-    # Filter the DataFrame for the query lemma and party
-    filtered_df = df[(df["lemma"] == query_lemma) & (df["party"] == selected_party)].reset_index()
-
-    # If there are fewer examples than max_examples, adjust the number of examples to the available count
-    num_examples_to_select = min(len(filtered_df), max_examples)
-
-    # Randomly sample the rows
-    sampled_rows = filtered_df.sample(n=num_examples_to_select)
-
-    kwic_examples = []
-    for _, row in sampled_rows.iterrows():
-        index = row['index']  # Get the current row index
-        start = max(index - context_size, 0)  # Start of the context
-        end = min(index + context_size + 1, len(df))  # End of the context
-
-        # Extract tokens and indices for the context
-        context_tokens = df.iloc[start:end]["token"].tolist()
-        context_indices = df.iloc[start:end].index.tolist()
-
-        # Highlight the query token
-        kwic_line = " ".join(
-            [f"**{token}**" if idx == index else token for token, idx in zip(context_tokens, context_indices)]
-        )
-        kwic_examples.append(kwic_line)
-
-    return kwic_examples
-
-def get_collocations(df, query_lemma, selected_party, context_size=5):
-    filtered_df = df[(df["lemma"] == query_lemma) & (df["party"] == selected_party)].reset_index()
-    df_party = df[df["party"] == selected_party].reset_index()
-    collocation_base = []
-
-    for _, row in filtered_df.iterrows():
-        index = row['index']  # Get the current row index
-        start = max(index - context_size, 0)  # Start of the context
-        end = min(index + context_size + 1, len(df))  # End of the context
-        context_lemmas = (
-            df.iloc[start:index]["lemma"].to_list() +  # Tokens before the current lemma
-            df.iloc[index + 1:end]["lemma"].to_list()  # Tokens after the current lemma
-        )
-        collocation_base.extend(context_lemmas)
-
-    df_collo = pd.DataFrame(Counter(collocation_base).most_common(), columns=["lemma","freq"])
-    df_collo["size"] = df_collo["freq"].sum()
-    
-    df_party_freq = df_party.groupby("lemma").size().reset_index(name='freq_total')
-    df_collo = df_collo.merge(df_party_freq, on="lemma")
-    
-    df_collo["freq_reference"] = df_collo["freq_total"] - df_collo["freq"]
-    df_collo["size_reference"] = df_collo["freq_reference"].sum()
-    df_collo["relfreq"] = df_collo.freq / df_collo.size
-    df_collo["relfreq_reference"] = (df_collo.freq_reference) / df_collo.size_reference
-    df_collo.loc[df_collo["relfreq_reference"] == 0, "relfreq_reference"] = 0.5
-    df_collo["LogRatio"] = np.log2(df_collo.relfreq / df_collo.relfreq_reference)
-    
-    return df_collo
-
-if lemma:
-    # Filter data for the input lemma
-    df_lemma = df_grouped[df_grouped["lemma"] == lemma].reset_index(drop=True)
-    df_size = pd.DataFrame(df["party"].value_counts(normalize=False))
-    df_size = df_size.rename(columns={"party": "count"})
-    df_lemma = pd.merge(df_lemma, df_size, on='party', how='outer')
-    df_lemma["relfreq"] = df_lemma["freq"] / df_lemma["count"] * 1000000
-
-    mean = (df_lemma["freq"].sum() / df_lemma["count"].sum() * 1000000)
-
-    # Adjust the relfreq column to center around the mean
-    df_lemma['relfreq_centered'] = df_lemma['relfreq'] - mean
+lemma = st.text_input("Suchwort eingeben (unflektierte Grundform, Platzhalter * und ? möglich): ")
+use_regex = st.checkbox("Suchwort als regulären Ausdruck auswerten")
+
+# Shared corpus service: one copy of corpus, indexes and counts per server process
+corpus_service = service.get_service(CORPUS_PATH, source_tsv="btw25_corrected.tsv")
+
+# Corpora with several elections are queried one election at a time; only its partitions are read
+elections = corpus_service.elections
+election, year = elections[-1]
+if len(elections) > 1:
+    election, year = st.selectbox("Wahl:", elections, index=len(elections) - 1, format_func=lambda pair: corpus.election_label(*pair))
+
+def generate_kwic(corpus_service, query_lemma, selected_party, context_size=15, max_examples=10):
+    # Look up the lemma's positions in the prebuilt index and cut the context windows from the token array
+    return corpus_service.kwic(query_lemma, selected_party, context_size=context_size, max_examples=max_examples, year=year, election=election)
+
+def get_collocations(corpus_service, query_lemma, selected_party, context_size=5, min_freq=1):
+    # Count collocates over all context windows at once, against the party's precomputed lemma totals
+    return corpus_service.collocations(query_lemma, selected_party, left=context_size, right=context_size, min_freq=min_freq, year=year, election=election)
+
+# Several words or bracketed constraints are a sequence query, answered from the suffix array
+sequence = bool(lemma) and not use_regex and phrase.is_phrase(lemma)
+
+# Patterns like "Klima*" or "*schutz" are expanded to the most frequent matching lemmas via the vocabulary index
+query = lemma
+if sequence:
+    try:
+        df_lemma = corpus_service.phrase_frequencies(lemma, year=year, election=election)
+    except ValueError:
+        query = None
+        st.error(f'"{lemma}" ist keine gültige Suchanfrage.')
+elif lemma and (use_regex or vocabulary.is_pattern(lemma)):
+    try:
+        query, n_matches = corpus_service.expand(lemma, regex=use_regex)
+    except ValueError:
+        query = ()
+        st.error(f'"{lemma}" ist kein gültiger regulärer Ausdruck.')
+    else:
+        if n_matches > len(query):
+            st.caption(f"{n_matches} passende Wörter gefunden, ausgewertet werden die {len(query)} häufigsten: {', '.join(query)}")
+        elif query:
+            st.caption(f"Ausgewertet werden {len(query)} passende Wörter: {', '.join(query)}")
+        else:
+            st.write(f'Kein Wort im Korpus passt auf "{lemma}".')
+
+if query:
+    # Relative frequencies per party, centred on the cross-party mean; matches of a pattern are summed
+    if not sequence:
+        df_lemma = corpus_service.frequencies(query, year=year, election=election, label=None if query == lemma else lemma)
 
     # Define party colors
     party_colors = {
@@ -187,12 +161,34 @@ if lemma:
         )
     )
 
-    # Display the interactive plots in two tabs
-    tab1, tab2 = st.tabs(["Relative Häufigkeiten", "Relative Häufigkeiten (mittelwertzentriert)"])
-    with tab1:
+    # Display the interactive plots in two tabs, plus the development across elections if there are several
+    show_series = len(elections) > 1 and not sequence
+    tab_names = ["Relative Häufigkeiten", "Relative Häufigkeiten (mittelwertzentriert)"]
+    if show_series:
+        tab_names.append("Verlauf über die Wahlen")
+    tab_objects = st.tabs(tab_names)
+    with tab_objects[0]:
         st.plotly_chart(fig, use_container_width=True)     
-    with tab2:
+    with tab_objects[1]:
         st.plotly_chart(fig2, use_container_width=True)    
+    if show_series:
+        with tab_objects[2]:
+            # One vectorized lookup over all partitions of the count cube
+            df_series = corpus_service.series(query)
+            df_series["wahl"] = [corpus.election_label(e, y) for e, y in zip(df_series["election"], df_series["year"])]
+            fig3 = px.line(
+                df_series,
+                x="wahl",
+                y="relfreq",
+                color="party",
+                color_discrete_map=party_colors,
+                markers=True,
+                labels={"relfreq": "Relative Häufigkeit", "wahl": "", "party": "Partei"},
+                title=f"Relative Häufigkeiten von '{lemma}' im Zeitverlauf",
+                hover_data={"freq": True},
+            )
+            fig3.update_layout(margin={"l": 40, "r": 40, "t": 60, "b": 00}, title_y=.9)
+            st.plotly_chart(fig3, use_container_width=True)
     
     # Display the raw data
     df_lemma_display = df_lemma.dropna(subset=["freq"])
@@ -207,31 +203,60 @@ if lemma:
     clicked_party = st.selectbox(
         "Partei auswählen für eine Zufallsauswahl von max. 10 Belegen:",
         party_options,
-        index=party_options.index(default_party))
+        index=party_options.index(default_party) if default_party in party_options else 0)
 
     default_message = f"Showing KWIC examples for default party: {default_party}"
 
-    kwic_output = generate_kwic(df, query_lemma=lemma, selected_party=clicked_party)
+    if sequence:
+        kwic_output = corpus_service.phrase_kwic(lemma, clicked_party, year=year, election=election)
+    else:
+        kwic_output = generate_kwic(corpus_service, query_lemma=query, selected_party=clicked_party)
     
     if len(kwic_output) > 0:
         for example in kwic_output:
             st.write(example)
     else:
-        st.write(f'Im Wahlprogramm {flection[clicked_party]} kommt das Wort "{lemma}" nicht vor.')
+        st.write(f'Im Wahlprogramm {flection.get(clicked_party, clicked_party)} kommt das Wort "{lemma}" nicht vor.')
 
-    collo = get_collocations(df, query_lemma=lemma, selected_party=clicked_party)
-    collo_filtered = collo[(collo["LogRatio"] > 0) & (collo["freq"] > 2)]
-    collo_filtered.rename(columns={"lemma":"Lemma","freq":"Collocate Frequency"}, inplace=True)
-    collo_filtered = collo_filtered[["Lemma","Collocate Frequency","LogRatio"]].sort_values(by="LogRatio", ascending=False)
+    # Collocations are computed around single lemmas only
+    collo_filtered = []
+    if not sequence:
+        collo = get_collocations(corpus_service, query_lemma=query, selected_party=clicked_party, min_freq=3)
+        collo_filtered = collo[collo["LogRatio"] > 0].rename(columns={"lemma":"Lemma","freq":"Collocate Frequency"})
     
     if len(collo_filtered) > 0:
-        with st.expander(f"Kollokationen von '{lemma}' im Programm {flection[clicked_party]} anzeigen"):
-            st.dataframe(collo_filtered)
+        with st.expander(f"Kollokationen von '{lemma}' im Programm {flection.get(clicked_party, clicked_party)} anzeigen"):
+            measure = st.selectbox("Assoziationsmaß:", analysis.MEASURES)
+            st.dataframe(collo_filtered[["Lemma","Collocate Frequency",measure]].sort_values(by=measure, ascending=False))
+
+    # Words used alike come from the corpus-derived word vectors, which exist for single lemmas only
+    if not sequence and isinstance(query, str):
+        df_similar = corpus_service.similar(query, clicked_party)
+        if len(df_similar) > 0:
+            with st.expander(f"Ähnlich wie '{lemma}' verwendete Wörter im Programm {flection.get(clicked_party, clicked_party)} anzeigen"):
+                st.dataframe(df_similar.rename(columns={"lemma": "Lemma", "similarity": "Ähnlichkeit", "freq": "Häufigkeit"}), hide_index=True)
+
+        df_shift, df_pairs = corpus_service.shift(query)
+        if len(df_shift) > 1:
+            with st.expander(f"Verwendung von '{lemma}' im Vergleich der Parteien anzeigen"):
+                st.dataframe(df_shift.rename(columns={
+                    "party": "Partei", "freq": "Häufigkeit", "similarity": "Ähnlichkeit zu allen Programmen", "neighbours": "Ähnlichste Wörter",
+                }), hide_index=True)
+                fig4 = px.imshow(
+                    df_pairs,
+                    text_auto=".2f",
+                    color_continuous_scale="Blues",
+                    labels={"color": "Ähnlichkeit"},
+                    title=f"Ähnlichkeit der Verwendung von '{lemma}' zwischen den Parteien",
+                )
+                st.plotly_chart(fig4, use_container_width=True)
 
     st.divider()
 
     # Print link to original text
-    st.write(f"Das ganze Wahlprogramm {flection[clicked_party]} kann [hier]({programs[clicked_party]}) eingesehen werden.")
+    # Links are only known for the BTW25 manifestos
+    if clicked_party in programs and (election, year) == elections[-1]:
+        st.write(f"Das ganze Wahlprogramm {flection[clicked_party]} kann [hier]({programs[clicked_party]}) eingesehen werden.")
 
     st.divider()
 
@@ -241,6 +266,14 @@ with st.expander("Für Informationen zu diesem Tool hier klicken!"):
 
     Dieses interaktive Tool erlaubt die Abfrage von Worthäufigkeiten in den Wahlprogrammen zur Bundestagswahl 2025. Datengrundlage sind die (im Falle der AfD und der Linken vorläufigen) Wahlprogramme im PDF-Format, die in ein txt-Format überführt und manuell bereinigt wurden. Für die Korrektheit dieser Aufbereitung wird keine Garantie übernommen. Für die linguistische Vorverarbeitung (Tokenisierung und Lemmatisierung) wurde der TreeTagger genutzt.
 
+    **Wie kann nach mehreren Wörtern gesucht werden?**
+
+    Im Suchfeld können Platzhalter verwendet werden: `*` steht für beliebig viele Zeichen, `?` für genau ein Zeichen. So findet `*schutz` alle Komposita auf -schutz und `Klima*` alle Wörter, die mit Klima beginnen. Wahlweise kann das Suchwort auch als regulärer Ausdruck ausgewertet werden. Ausgewertet werden die bis zu 50 häufigsten passenden Wörter, deren Häufigkeiten zusammengezählt werden.
+
+    **Wie kann nach Wortfolgen gesucht werden?**
+
+    Mehrere durch Leerzeichen getrennte Grundformen werden als Wortfolge gesucht, etwa `sozial Gerechtigkeit`. In Anführungszeichen gesetzte Wörter werden in genau dieser Wortform gesucht (`"soziale" Gerechtigkeit`). In eckigen Klammern können Bedingungen an Grundform (`lemma`), Wortform (`word`) und Wortart (`pos`, Tags des STTS) gestellt werden, deren Werte als reguläre Ausdrücke gelesen werden: `[pos="ADJA"] Energie` findet alle Adjektive vor *Energie*, `[]` steht für ein beliebiges Wort, und mehrere Bedingungen werden mit `&` verknüpft. Für Wortfolgen werden keine Kollokationen berechnet.
+
     **Was zeigen die Balkendiagramme und wie sind sie zu lesen?**
     
     Die Balkendiagramme zeigen relative Häufigkeiten (Treffer pro Millionen Wörter), d.h. die absoluten Häufigkeiten auf die auf die jeweils unterschiedlichen Umfänge der Wahlprogramme skaliert, damit sie untereinander vergleichbar werden. Bei der mittelwertzentrierten Darstellung wird als Nullpunkt der Mittelwert angezeigt. Zeigt ein Balken nach oben, verwendet die Partei das Wort häufiger als der parteiübergreifende Durchschnitt, zeigt er nach unten, verwendet sie es seltener.
@@ -251,7 +284,11 @@ with st.expander("Für Informationen zu diesem Tool hier klicken!"):
 
     **Was sind Kollokationen?**
 
-    Bei hinreichend frequenten Wörtern werden unter den Beispielbelegen auch Kollokationen angezeigt. Das sind Wörter, die im unmittelbaren Kontext des Suchwortes relativ häufiger vorkommen als im restlichen Text. Kollokationen zeigen also häufige Wortkombinationen an (etwa 'soziale Gerechtigkeit') und können im Verbund einen Eindruck von parteispezifischen Wortgebräuchen vermitteln. Das genutzte Assoziationsmaß ist LogRatio (die logarithmierte Ratio der relativen Häufigkeiten) bei einer Kontextgröße von 5 Wörtern links und rechts und eine Mindestfrequenz von 3.
+    Bei hinreichend frequenten Wörtern werden unter den Beispielbelegen auch Kollokationen angezeigt. Das sind Wörter, die im unmittelbaren Kontext des Suchwortes relativ häufiger vorkommen als im restlichen Text. Kollokationen zeigen also häufige Wortkombinationen an (etwa 'soziale Gerechtigkeit') und können im Verbund einen Eindruck von parteispezifischen Wortgebräuchen vermitteln. Das voreingestellte Assoziationsmaß ist LogRatio (die logarithmierte Ratio der relativen Häufigkeiten) bei einer Kontextgröße von 5 Wörtern links und rechts und eine Mindestfrequenz von 3. Alternativ können Log-Likelihood, Mutual Information (MI) und t-score gewählt werden.
+
+    **Was sind ähnlich verwendete Wörter?**
+
+    Für einzelne Suchwörter werden außerdem Wörter angezeigt, die in ähnlichen Kontexten vorkommen wie das Suchwort. Dafür wird aus dem Korpus selbst für jedes der 10.000 häufigsten Wörter ein Wortvektor berechnet: Gezählt wird, wie oft es im Abstand von bis zu 5 Wörtern mit jedem anderen Wort vorkommt, diese Zählungen werden mit Positive Pointwise Mutual Information (PPMI) gewichtet und mit einer Singulärwertzerlegung auf 100 Dimensionen verdichtet. Die Ähnlichkeit ist der Kosinus zweier Vektoren (1 = gleiche Kontexte). Die Vektoren werden für alle Wahlprogramme zusammen und für jede Partei getrennt berechnet; im Parteienvergleich wird angezeigt, wie sehr die Verwendung eines Wortes in einer Partei der in allen Programmen und der in den anderen Parteien gleicht. Berücksichtigt werden nur Wörter, die in der Partei mindestens fünfmal vorkommen. Da einzelne Wahlprogramme für solche Verfahren recht kleine Textmengen sind, sind die Ergebnisse als Anregung für die Lektüre der Belege zu verstehen.
 
     **Es handelt sich um eine Testversion!** Feedback gerne an [simon.meier-vieracker@tu-dresden.de](mailto:simon.meier-vieracker@tu-dresden.de). Das Analyseskript kann auf GitHub eingesehen werden, Anpassungs- und Erweiterungsvorschläge sind sehr willkommen.
     """)
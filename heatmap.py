@@ -1,11 +1,15 @@
 import streamlit as st
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 from datetime import datetime
+import corpus
+import cube
+import service
+
+CORPUS_PATH = "btw25_corrected.corpus"
 
 # Load data
-df = pd.read_csv("btw25_corrected.tsv", sep="\t", quoting=3)
+corpus_service = service.get_service(CORPUS_PATH, source_tsv="btw25_corrected.tsv")
 
 today_date = datetime.today().strftime("%d.%m.%Y")
 
@@ -15,30 +19,19 @@ st.write("Diese Heatmaps zeigen für verschiedene Wortarten die relativen Häufi
 
 st.caption(f"Ein Tool von [Simon Meier-Vieracker](https://tu-dresden.de/gsw/slk/germanistik/al/die-professur/inhaber), Stand {today_date}. Bitte beachten Sie die Infobox am Ende dieser Seite.")
 
-number_of_rows = st.slider("Wieviele Wörter sollen angezeigt werden?", 25, 50, 25)
-
-pos_dict = {
-	"Substantive":"NN",
-	"Adjektive":"ADJ",
-	"Verben":"VV"
-}
-
-def create_heatmap(df, selected_pos, number_of_rows):
-	df_filtered = df[df.pos.str.contains(pos_dict[selected_pos])]
-	df_grouped = df_filtered.groupby(by=["lemma", "party"]).size().reset_index(name="freq")
-	df_filtered = df_grouped[~df_grouped['lemma'].isin(["Freie", "Demokrat"])].copy()
-	df_filtered['rel_freq'] = df_filtered.groupby('party')['freq'].transform(lambda x: x / x.sum() * 100)
+number_of_rows = st.slider("Wieviele Wörter sollen angezeigt werden?", 25, cube.HEATMAP_MAX_ROWS, 25)
 
-	# Get top lemmas
-	top_lemmas_list = df_filtered.groupby('lemma')['rel_freq'].sum().nlargest(number_of_rows).index
-	top_df = df_filtered[df_filtered['lemma'].isin(top_lemmas_list)]
+pos_dict = cube.HEATMAP_POS
 
-	# Create pivot table for heatmap
-	matrix = top_df.pivot_table(index='lemma', columns='party', values='rel_freq')
-	matrix = matrix.fillna(0)
+# Heatmaps are precomputed per election; the latest one is shown unless the corpus holds several
+elections = corpus_service.elections
+election, year = elections[-1]
+if len(elections) > 1:
+    election, year = st.selectbox("Wahl:", elections, index=len(elections) - 1, format_func=lambda pair: corpus.election_label(*pair))
 
-	matrix_table = top_df.pivot_table(index='lemma', columns='party', values='freq')
-	matrix_table = matrix_table.fillna(0)
+def create_heatmap(corpus_service, selected_pos, number_of_rows):
+	# Top lemmas per POS tab are precomputed up to the slider maximum, so this only slices them
+	matrix, matrix_table = corpus_service.heatmap(selected_pos, number_of_rows, election, year)
 
 	plot_height = .24 * number_of_rows
 	
@@ -59,7 +52,7 @@ tab_objects = st.tabs(tabs)
 
 for tab, pos in zip(tab_objects, tabs):
     with tab:
-        create_heatmap(df, pos, number_of_rows)
+        create_heatmap(corpus_service, pos, number_of_rows)
 
 with st.expander("Für Informationen zu diesem Tool hier klicken!"):
     st.write("""
@@ -1,163 +1,325 @@
 import spacy
 import fitz  # PyMuPDF for extracting text from PDFs
-import csv
-import requests
-import io
 import sys
 import json
-from fake_useragent import UserAgent
+import os
+import argparse
+import bisect
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 import re
+import metrics
+from fetch import PdfFetcher, CACHE_DIR
+from corpus import Corpus, CorpusWriter, DEFAULT_ELECTION, concat_corpora, corpus_path_for, write_tsv
+from index import build_index, FIELDS as INDEX_FIELDS
+from vocabulary import build_vocabulary_index
+from phrase import build_suffix_array
+from cube import build_cube
+from keyness import build_keyness
+from embeddings import build_embeddings
+from sentiment import write_sentiments
 
-# Load spaCy model for German
-nlp = spacy.load("de_core_news_sm")
+SPACY_MODEL = "de_core_news_sm"
+# Dependency parses and named entities are never used downstream
+EXCLUDED_COMPONENTS = ["parser", "ner"]
+CHUNK_SIZE = 20000  # characters per spaCy document
+BATCH_SIZE = 16  # chunks per nlp.pipe batch
+# Bump whenever clean_text changes, so that all shards are re-annotated
+CLEANING_RULES_VERSION = 1
+# Bump whenever shards gain new data; version 2 added the source text layer, version 3 chunks across pages
+SHARD_VERSION = 3
+BUILD_DIR = "build"
 
-def load_sentiws():
-    """Load SentiWS data from local files and return dictionaries for positive and negative words."""
-    positive = {}
-    negative = {}
+nlp = None
 
-    def load_file(filepath, sentiment_dict):
-        with open(filepath, "r", encoding="utf-8") as file:
-            for line in file:
-                parts = line.strip().split("\t")
-                if len(parts) >= 2:
-                    word = parts[0].split("|")[0].lower()
-                    sentiment_dict[word] = sentiment_dict.get(word, 0) + 1
-
-    load_file("SentiWS_v2.0_Positive.txt", positive)
-    load_file("SentiWS_v2.0_Negative.txt", negative)
-
-    return positive, negative
+def load_nlp():
+    """Load the German spaCy model once per process, without unused components."""
+    global nlp
+    if nlp is None:
+        nlp = spacy.load(SPACY_MODEL, exclude=EXCLUDED_COMPONENTS)
+        # Without the parser, the small sentence recognizer provides the sentence boundaries
+        if "senter" in nlp.disabled:
+            nlp.enable_pipe("senter")
+    return nlp
 
 def clean_text(text):
     """Clean text by removing unwanted characters like separators and excessive punctuation."""
-    print("Cleaning text...")
     # Remove sequences of dots, dashes, or other non-alphanumeric characters
     text = re.sub(r"[\.-]{2,}", " ", text)
     # Remove excessive whitespace
     text = re.sub(r"\s+", " ", text).strip()
-    print("Text cleaning complete.")
     return text
 
-def calculate_sentiments(text, positive, negative):
-    """Calculate sentiment counts for the given text using SentiWS."""
-    print("Calculating sentiments...")
-    positive_count = 0
-    negative_count = 0
-    neutral_count = 0
-
-    doc = nlp(text)
-    for token in doc:
-        lemma = token.lemma_.lower()
-        if lemma in positive:
-            positive_count += 1
-        elif lemma in negative:
-            negative_count += 1
-        else:
-            neutral_count += 1
-
-    print(f"Sentiments calculated: Positive={positive_count}, Negative={negative_count}, Neutral={neutral_count}")
-    return positive_count, negative_count, neutral_count
-
-def extract_text_from_pdf_url(url):
-    """Download and extract text from a PDF file via URL."""
-    print(f"Downloading PDF from {url}...")
-    user_agent = UserAgent().random
-    headers = {"User-Agent": user_agent}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 403:
-        raise Exception(f"Access denied (403) for URL: {url}")
-    response.raise_for_status()
-    print("Download complete. Extracting text...")
-    with fitz.open(stream=io.BytesIO(response.content), filetype="pdf") as pdf:
-        text = "".join(page.get_text() for page in pdf)
+def chunk_end(text, start, chunk_size=CHUNK_SIZE):
+    """Return where a chunk starting at start ends: at most chunk_size characters on, preferably at a sentence end."""
+    end = start + chunk_size
+    if end < len(text):
+        split = text.rfind(". ", start, end)
+        if split <= start:
+            split = text.rfind(" ", start, end)
+        if split > start:
+            end = split + 1
+    return min(end, len(text))
+
+def split_into_chunks(text, chunk_size=CHUNK_SIZE):
+    """Split cleaned text into chunks of at most chunk_size characters, preferably at sentence ends."""
+    start = 0
+    while start < len(text):
+        end = chunk_end(text, start, chunk_size)
+        yield text[start:end].strip()
+        start = end
+
+def iter_pages(path):
+    """Yield (page number, text) for each page of a PDF file, one page at a time."""
+    print(f"Extracting text from {path}...")
+    with fitz.open(path) as pdf:
+        for page in pdf:
+            yield page.number + 1, page.get_text()
     print("Text extraction complete.")
-    return text
 
-def process_text(text, party, year):
-    """Process text with spaCy and create structured data."""
+def iter_chunks(pages, chunk_size=CHUNK_SIZE):
+    """Clean pages and yield (chunk, pages) pairs, where pages lists the (character offset, page number) of every page in the chunk.
+
+    Chunks run across page breaks, so sentences continuing on the next page stay whole.
+    At most one chunk and one page are held in memory.
+    """
+    text = ""
+    offsets = []  # (offset in text, page number) of every page in text, the first at offset 0
+    for page_number, page_text in pages:
+        page_text = clean_text(page_text)
+        if not page_text:
+            continue
+        if text:
+            text += " "
+        offsets.append((len(text), page_number))
+        text += page_text
+        # Only full chunks are cut; the tail may continue on the next page
+        while len(text) > chunk_size:
+            chunk, text, offsets = _cut_chunk(text, offsets, chunk_end(text, 0, chunk_size))
+            if chunk[0]:
+                yield chunk
+    while text:
+        chunk, text, offsets = _cut_chunk(text, offsets, chunk_end(text, 0, chunk_size))
+        if chunk[0]:
+            yield chunk
+
+def _cut_chunk(text, offsets, end):
+    """Split text at end into a chunk with its page offsets and the rest with its offsets rebased to 0."""
+    chunk = text[:end].rstrip()
+    rest = text[end:].lstrip()
+    shift = len(text) - len(rest)
+    rest_offsets = []
+    if rest:
+        # The rest starts on the last page that began before the cut
+        started = [page_number for offset, page_number in offsets if offset <= shift]
+        rest_offsets = [(0, started[-1])] + [(offset - shift, page_number) for offset, page_number in offsets if offset > shift]
+    return (chunk, [(offset, page_number) for offset, page_number in offsets if offset < len(chunk)]), rest, rest_offsets
+
+def annotate_chunks(chunks, party, year, batch_size=BATCH_SIZE, n_process=1):
+    """Annotate chunks with spaCy, yielding the token rows and source spans of one chunk at a time."""
+    year = str(year)  # Ensure year is a string for TSV output
+    docs = load_nlp().pipe(chunks, as_tuples=True, batch_size=batch_size, n_process=n_process)
+    for doc, pages in docs:
+        rows = [(token.text, token.tag_, token.lemma_, party, year) for token in doc]  # tag_ is the STTS tag
+        token_start = [token.idx for token in doc]
+        # The page of each token is the last page starting at or before it
+        page_offsets = [offset for offset, _ in pages]
+        token_page = [pages[max(bisect.bisect_right(page_offsets, start) - 1, 0)][1] for start in token_start]
+        page_start = [i for i in range(len(token_page)) if i == 0 or token_page[i] != token_page[i - 1]]
+        source = {
+            "text": doc.text,
+            "token_start": token_start,
+            "token_end": [token.idx + len(token) for token in doc],
+            "sentence_start": [token.i for token in doc if token.i == 0 or token.is_sent_start],
+            "page": [token_page[i] for i in page_start],
+            "page_start": page_start,
+        }
+        yield rows, source
+
+def process_program(program, pdf_path, shard_path, batch_size=BATCH_SIZE, n_process=1):
+    """Stream one manifesto page by page into its own corpus shard; runs in a worker process.
+
+    Pages are extracted, cleaned, annotated and written chunk by chunk, so peak memory
+    does not depend on the size of the document.
+    """
+    party = program["Party"]
+    year = program["Year"]
+    labels = {"party": party, "year": year}
     print(f"Processing text for party {party}, year {year}...")
-    text = clean_text(text)  # Clean the text before processing
-    doc = nlp(text)
-    data = []
-    for token in doc:
-        data.append({
-            "token": token.text,
-            "pos": token.tag_,  # STTS tag
-            "lemma": token.lemma_,
-            "party": party,
-            "year": str(year)  # Ensure year is a string for TSV output
-        })
-    print(f"Processing complete for party {party}, year {year}.")
-    return data
-
-def save_to_tsv(data, output_file):
-    """Save processed data to a single TSV file."""
-    print(f"Saving data to {output_file}...")
-    fieldnames = ["token", "pos", "lemma", "party", "year"]
-    with open(output_file, "a", encoding="utf-8", newline="") as tsvfile:
-        writer = csv.DictWriter(tsvfile, fieldnames=fieldnames, delimiter="\t")
-        if tsvfile.tell() == 0:
-            writer.writeheader()  # Write header only if the file is empty
-        writer.writerows(data)
+    # Stage times are exclusive, so the write stage only counts what is left after extracting, cleaning and annotating
+    pages = metrics.iterate("extract", iter_pages(pdf_path), **labels)
+    chunks = metrics.iterate("clean", iter_chunks(pages), **labels)
+    try:
+        with metrics.stage("write", **labels), CorpusWriter(shard_path, election=program_election(program), url=program["URL"]) as shard_writer:
+            for rows, source in metrics.iterate("annotate", annotate_chunks(chunks, party, year, batch_size, n_process), **labels):
+                shard_writer.add_rows(rows)
+                shard_writer.add_source(**source)
+        print(f"Processing complete for party {party}, year {year}.")
+    finally:
+        # The worker is reused, so a failed manifesto must not hand its entries on to the next one
+        entries = metrics.drain()
+    return entries
+
+def program_election(program):
+    """Return the election of a manifesto, e.g. "BTW" or "LTW-SN"; party.json entries default to federal."""
+    return program.get("Election", DEFAULT_ELECTION)
+
+def shard_key(program):
+    """Return the manifest key and shard directory name of a manifesto."""
+    key = f"{program['Party']}_{program['Year']}"
+    if "Election" in program:
+        key = f"{program['Election']}_{key}"
+    return re.sub(r"[^\w-]", "_", key)
+
+def partition_order(programs):
+    """Return the manifestos grouped by year and election, keeping party.json order within an election."""
+    return sorted(programs, key=lambda program: (str(program["Year"]), program_election(program)))
+
+def build_fingerprint(fetch_result):
+    """Return everything a shard depends on: PDF content, spaCy model and cleaning rules."""
+    return {
+        "pdf_sha256": fetch_result.sha256,
+        "spacy_model": SPACY_MODEL,
+        "spacy_model_version": spacy.util.get_package_version(SPACY_MODEL),
+        "cleaning_rules_version": CLEANING_RULES_VERSION,
+        "shard_version": SHARD_VERSION,
+    }
+
+def load_manifest(path):
+    """Load the build manifest, or an empty one before the first build."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, path):
+    """Write the build manifest atomically."""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+def replace_shard(tmp_path, shard_path):
+    """Swap a freshly written shard in for the previous one."""
+    shutil.rmtree(shard_path, ignore_errors=True)
+    os.replace(tmp_path, shard_path)
+
+def assemble(shard_dir, keys, corpus_path, output_file):
+    """Concatenate the shards into the corpus, build all derived artifacts and write the TSV; return the corpus."""
+    print(f"Assembling {len(keys)} shards into {corpus_path}...")
+    with metrics.stage("write", target="corpus"):
+        corpus = concat_corpora([os.path.join(shard_dir, key) for key in keys], corpus_path)
+    with metrics.stage("write", target="index"):
+        for field in INDEX_FIELDS:
+            build_index(corpus, field)
+            build_vocabulary_index(corpus, field)
+        build_suffix_array(corpus, "lemma")
+    with metrics.stage("write", target="cube"):
+        build_cube(corpus)
+    with metrics.stage("write", target="keyness"):
+        build_keyness(corpus)
+    with metrics.stage("write", target="embeddings"):
+        build_embeddings(corpus)
+    with metrics.stage("write", target="tsv"):
+        write_tsv(corpus, output_file)
     print(f"Data saved to {output_file}.")
+    return corpus
 
-def save_sentiments_to_tsv(sentiments, output_file):
-    """Save sentiment analysis results to a TSV file."""
-    print(f"Saving sentiments to {output_file}...")
-    fieldnames = ["Party", "Year", "Positive", "Negative", "Neutral"]
-    with open(output_file, "w", encoding="utf-8", newline="") as tsvfile:
-        writer = csv.DictWriter(tsvfile, fieldnames=fieldnames, delimiter="\t")
-        writer.writeheader()
-        writer.writerows(sentiments)
-    print(f"Sentiments saved to {output_file}.")
+def parse_args():
+    """Parse command line options for the import run."""
+    parser = argparse.ArgumentParser(description="Import election manifestos into a token TSV and corpus.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="manifestos processed in parallel")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="chunks per nlp.pipe batch")
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy processes per manifesto")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="directory of the PDF download cache")
+    parser.add_argument("--offline", action="store_true", help="read PDFs from the cache only")
+    parser.add_argument("--build-dir", default=BUILD_DIR, help="directory of the per-manifesto shards and build manifest")
+    parser.add_argument("--force", action="store_true", help="re-annotate all manifestos, even unchanged ones")
+    parser.add_argument("--metrics", action="store_true", help="record time and memory per stage")
+    parser.add_argument("--metrics-log", default=metrics.LOG_PATH, help="JSON lines log of the stage metrics")
+    parser.add_argument("--metrics-prom", default=metrics.PROM_PATH, help="Prometheus text file of the stage totals")
+    return parser.parse_args()
 
 def main():
-    """Main function to process a list of PDFs from a JSON file and output results as TSV."""
+    """Main function to incrementally process a list of PDFs from a JSON file and output results as TSV and corpus."""
+    args = parse_args()
+    if args.metrics:
+        metrics.enable(args.metrics_log, args.metrics_prom)
     with open("party.json", "r", encoding="utf-8") as json_file:
         programs = json.load(json_file)
 
     output_file = "btw25.tsv"
     sentiment_output_file = "sent25.tsv"
-    sentiments = []
+    sentiment_curves_file = "sent25_curves.tsv"
+    sentiment_sections_file = "sent25_sections.tsv"
+    shard_dir = os.path.join(args.build_dir, "shards")
+    manifest_path = os.path.join(args.build_dir, "manifest.json")
+    assembled_path = os.path.join(args.build_dir, "assembled.json")
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = load_manifest(manifest_path)
 
-    # Load sentiment data from SentiWS files
-    positive, negative = load_sentiws()
+    # Download (or revalidate) all PDFs concurrently before annotating
+    fetcher = PdfFetcher(cache_dir=args.cache_dir, offline=args.offline)
+    with metrics.stage("download"):
+        fetched = fetcher.fetch_all(program["URL"] for program in programs)
 
-    # Clear existing data in the output file
-    with open(output_file, "w", encoding="utf-8") as f:
-        pass
+    jobs = max(1, min(args.jobs, len(programs)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = {}
+        for program in programs:
+            key = shard_key(program)
+            result = fetched[program["URL"]]
+            if isinstance(result, Exception):
+                pending[key] = result
+                continue
+            fingerprint = build_fingerprint(result)
+            entry = manifest.get(key)
+            shard_path = os.path.join(shard_dir, key)
+            if not args.force and entry is not None and entry["fingerprint"] == fingerprint and os.path.exists(shard_path):
+                print(f"{program['Party']} ({program['Year']}) is up to date.")
+                continue
+            future = executor.submit(process_program, program, result.path, shard_path + ".tmp", args.batch_size, args.n_process)
+            pending[key] = (future, fingerprint)
 
-    for program in programs:
-        try:
+        for program in programs:
+            key = shard_key(program)
+            if key not in pending:
+                continue
             party = program["Party"]
             year = program["Year"]
-            url = program["URL"]
-
-            # Extract text from the PDF URL
-            text = extract_text_from_pdf_url(url)
-
-            # Process text and generate structured data
-            data = process_text(text, party, year)
-
-            # Save to TSV
-            save_to_tsv(data, output_file)
-
-            # Calculate sentiments
-            print(f"Analyzing sentiments for {party}, {year}...")
-            positive_count, negative_count, neutral_count = calculate_sentiments(text, positive, negative)
-            sentiments.append({
-                "Party": party,
-                "Year": year,
-                "Positive": positive_count,
-                "Negative": negative_count,
-                "Neutral": neutral_count
-            })
-        except Exception as e:
-            print(f"Error processing {program['Party']} ({program['Year']}): {e}", file=sys.stderr)
-
-    # Save sentiments to TSV
-    save_sentiments_to_tsv(sentiments, sentiment_output_file)
+            try:
+                if isinstance(pending[key], Exception):
+                    raise pending[key]
+                future, fingerprint = pending[key]
+                metrics.merge(future.result())
+            except Exception as e:
+                kept = " Keeping the previous shard." if key in manifest else ""
+                print(f"Error processing {party} ({year}): {e}.{kept}", file=sys.stderr)
+                continue
+            replace_shard(os.path.join(shard_dir, key) + ".tmp", os.path.join(shard_dir, key))
+            manifest[key] = {"party": party, "year": year, "election": program_election(program), "url": program["URL"], "fingerprint": fingerprint}
+            save_manifest(manifest, manifest_path)
+
+    # Re-assemble corpus and TSV from the shards, one election after another, unless the same shards were assembled last time
+    keys = [shard_key(program) for program in partition_order(programs) if shard_key(program) in manifest]
+    corpus_path = corpus_path_for(output_file)
+    assembled = {"corpus": corpus_path, "shards": [[key, manifest[key]] for key in keys]}
+    if not args.force and load_manifest(assembled_path) == assembled and os.path.exists(corpus_path) and os.path.exists(output_file):
+        print(f"{corpus_path} is up to date.")
+        corpus = Corpus(corpus_path)
+    else:
+        # Forget the previous assembly first, so that an interrupted one is never taken as up to date
+        if os.path.exists(assembled_path):
+            os.remove(assembled_path)
+        corpus = assemble(shard_dir, keys, corpus_path, output_file)
+        save_manifest(assembled, assembled_path)
+
+    # Sentiment is scored from the assembled corpus, without running spaCy again
+    try:
+        with metrics.stage("sentiment"):
+            write_sentiments(corpus, sentiment_output_file, sentiment_curves_file, sentiment_sections_file)
+    except FileNotFoundError as e:
+        print(f"Skipping sentiment analysis: {e}", file=sys.stderr)
+    metrics.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,94 @@
+"""Positional inverted index from lemma, token or POS ids to sorted corpus positions.
+
+For each field the index stores, in ``index/<field>/``, ``postings.npy``, all corpus
+positions ordered by id and then by position, and ``offsets.npy``, where the
+postings of id ``i`` are ``postings[offsets[i]:offsets[i + 1]]``. Because
+documents are contiguous position ranges, the postings of selected partitions
+(parties, years, elections) are found by binary search within that slice.
+"""
+import os
+
+import numpy as np
+
+from corpus import load_artifact, save_artifact, smallest_dtype
+
+INDEX_DIR = "index"
+FIELDS = ("lemma", "token", "pos")
+
+
+class PositionalIndex:
+    """Sorted corpus positions per vocabulary id of one corpus column."""
+
+    def __init__(self, corpus, field, postings, offsets):
+        self.corpus = corpus
+        self.field = field
+        self.postings = postings
+        self.offsets = offsets
+
+    def positions(self, value_id):
+        """Return the sorted positions of a vocabulary id (empty for -1)."""
+        if value_id < 0:
+            return self.postings[:0]
+        return self.postings[self.offsets[value_id]:self.offsets[value_id + 1]]
+
+    def lookup(self, value, party=None, year=None, election=None):
+        """Return the sorted positions of a string value, optionally only within the matching partitions.
+
+        For a list of values the positions of each value are sorted, but they are not
+        merged across values.
+        """
+        if not isinstance(value, str):
+            lookups = [self.lookup(v, party, year, election) for v in value]
+            return np.concatenate(lookups) if lookups else self.postings[:0]
+        positions = self.positions(self.corpus.id(self.field, value))
+        if party is None and year is None and election is None:
+            return positions
+        starts, ends = self.corpus.document_ranges(party, year, election)
+        return restrict(positions, starts, ends)
+
+    def count(self, value, party=None, year=None, election=None):
+        """Return the frequency of a string value, optionally within the matching partitions."""
+        return len(self.lookup(value, party, year, election))
+
+
+def restrict(positions, starts, ends):
+    """Return the sorted positions that fall into any of the sorted, disjoint [start, end) ranges."""
+    lo = np.searchsorted(positions, starts)
+    hi = np.searchsorted(positions, ends)
+    if len(lo) == 1:
+        return positions[lo[0]:hi[0]]
+    return positions[gather_ranges(lo, hi)]
+
+
+def gather_ranges(lo, hi):
+    """Return the indices of all [lo, hi) ranges, so several slices are gathered at once."""
+    lengths = np.asarray(hi, dtype=np.int64) - lo
+    shift = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return shift + np.arange(lengths.sum())
+
+
+def index_arrays(corpus, field):
+    """Return the postings and offsets of a corpus column."""
+    ids = corpus.codes[field]
+    # A stable sort keeps the positions of each id in ascending order
+    postings = np.argsort(ids, kind="stable").astype(smallest_dtype(len(corpus)))
+    counts = np.bincount(ids, minlength=len(corpus.vocab[field]))
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return {"postings": postings, "offsets": offsets}
+
+
+def build_index(corpus, field, save=True):
+    """Build the positional index of a corpus column and optionally persist it next to the corpus."""
+    arrays = index_arrays(corpus, field)
+    if save:
+        save_artifact(corpus, os.path.join(INDEX_DIR, field), arrays)
+    return PositionalIndex(corpus, field, **arrays)
+
+
+def load_index(corpus, field="lemma"):
+    """Return the positional index of a corpus column, loading or building it on first use."""
+    key = ("index", field)
+    if key not in corpus.cache:
+        arrays = load_artifact(corpus, os.path.join(INDEX_DIR, field), lambda: index_arrays(corpus, field))
+        corpus.cache[key] = PositionalIndex(corpus, field, **arrays)
+    return corpus.cache[key]
@@ -0,0 +1,95 @@
+"""Keyness of every lemma of every party against the rest of the corpus.
+
+All parties are scored in one pass: the count cube gives a dense lemma x party
+matrix, the reference frequency of a lemma is its row sum minus the party's own
+count, and log-likelihood, LogRatio and %DIFF are computed for all cells at once.
+Every lemma a party uses is scored; lemmas with at least MIN_TOTAL_FREQ hits in
+the selection are also scored in the parties that never use them, as these are
+the strongest cases of under-use. Zero counts are taken as 0.5 in LogRatio. The
+reference corpus of a party is the text of all other parties in the same
+selection (an election, or the whole corpus). Like the heatmaps, the tables can
+be restricted to a part of speech. They are stored per election and POS filter
+under ``<corpus>/keyness/``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import log_likelihood, log_ratio, percent_diff
+from corpus import load_artifact, save_artifact, smallest_dtype
+from cube import HEATMAP_POS, load_cube, pos_ids_matching
+
+KEYNESS_DIR = "keyness"
+KEYNESS_POS = {"Alle": None, **HEATMAP_POS}
+KEYNESS_MEASURES = ("LogLikelihood", "LogRatio", "%DIFF")
+MIN_TOTAL_FREQ = 5  # lemmas this frequent are scored in every party, also with a count of 0
+COLUMNS = ["lemma", "party", "freq", "size", "freq_reference", "size_reference", *KEYNESS_MEASURES]
+
+
+def keyness_arrays(counts, tab="Alle", year=None, election=None, min_total=MIN_TOTAL_FREQ):
+    """Score the (lemma, party) pairs with a non-zero count or a lemma total of min_total; returns parallel arrays keyed by column."""
+    corpus = counts.corpus
+    pattern = KEYNESS_POS[tab]
+    partitions = counts.selection(year, election)
+    matrix = counts.lemma_party_matrix(None if pattern is None else pos_ids_matching(corpus, pattern), partitions)
+    sizes = counts.party_sizes(partitions)
+
+    # Row-major cells: sorted by lemma, then party; parties without text in the selection are left out
+    totals = matrix.sum(axis=1)
+    lemma, party = np.nonzero((matrix > 0) | ((totals >= min_total)[:, None] & (sizes > 0)[None, :]))
+    freq = matrix[lemma, party]
+    freq_reference = totals[lemma] - freq
+    size = sizes[party]
+    size_reference = np.maximum(sizes.sum() - size, 1)
+    return {
+        "lemma": lemma.astype(smallest_dtype(len(corpus.vocab["lemma"]))),
+        "party": party.astype(smallest_dtype(len(corpus.vocab["party"]))),
+        "freq": freq,
+        "size": size,
+        "freq_reference": freq_reference,
+        "size_reference": size_reference,
+        "LogLikelihood": log_likelihood(freq, size, freq_reference, size_reference),
+        "LogRatio": log_ratio(freq, size, freq_reference, size_reference),
+        "%DIFF": percent_diff(freq, size, freq_reference, size_reference),
+    }
+
+
+def keyness_name(tab, election=None, year=None):
+    selection = "all" if election is None else f"{election}_{year}"
+    return os.path.join(KEYNESS_DIR, f"{selection}_{tab}")
+
+
+def build_keyness(corpus, save=True):
+    """Compute the keyness tables of every election and POS filter and optionally persist them."""
+    counts = load_cube(corpus)
+    tables = {}
+    for election, year in corpus.elections:
+        for tab in KEYNESS_POS:
+            arrays = keyness_arrays(counts, tab, year, election)
+            if save:
+                save_artifact(corpus, keyness_name(tab, election, year), arrays)
+            tables[(tab, election, year)] = arrays
+    return tables
+
+
+def keyness_frame(corpus, arrays):
+    """Decode keyness arrays into a table sorted by party and descending log-likelihood."""
+    # Sort on the ids before decoding; parties are ranked alphabetically
+    party_rank = np.argsort(np.argsort(corpus.vocab["party"], kind="stable"))
+    order = np.lexsort((-arrays["LogLikelihood"], party_rank[arrays["party"]]))
+    df = pd.DataFrame({column: arrays[column][order] for column in COLUMNS}, columns=COLUMNS)
+    df["lemma"] = corpus.decode("lemma", df["lemma"].to_numpy())
+    df["party"] = corpus.decode("party", df["party"].to_numpy())
+    df["relfreq"] = df["freq"] / df["size"] * 1000000
+    df["relfreq_reference"] = df["freq_reference"] / df["size_reference"] * 1000000
+    return df
+
+
+def load_keyness(corpus, tab="Alle", election=None, year=None):
+    """Return the keyness table of a POS filter and election, loading or computing it on first use."""
+    key = ("keyness", tab, election, year)
+    if key not in corpus.cache:
+        arrays = load_artifact(corpus, keyness_name(tab, election, year), lambda: keyness_arrays(load_cube(corpus), tab, year, election))
+        corpus.cache[key] = keyness_frame(corpus, arrays)
+    return corpus.cache[key]
@@ -0,0 +1,65 @@
+import streamlit as st
+from datetime import datetime
+import corpus
+import keyness
+import service
+
+CORPUS_PATH = "btw25_corrected.corpus"
+
+# Load data
+corpus_service = service.get_service(CORPUS_PATH, source_tsv="btw25_corrected.tsv")
+
+today_date = datetime.today().strftime("%d.%m.%Y")
+
+st.write("### Schlüsselwörter der Wahlprogramme zur Bundestagswahl 2025")
+
+st.write("Diese Tabellen zeigen für jede Partei die Wörter, die sie im Vergleich zu allen anderen Wahlprogrammen auffällig häufig verwendet.")
+
+st.caption(f"Ein Tool von [Simon Meier-Vieracker](https://tu-dresden.de/gsw/slk/germanistik/al/die-professur/inhaber), Stand {today_date}. Bitte beachten Sie die Infobox am Ende dieser Seite.")
+
+# Keyness tables are precomputed per election; the latest one is shown unless the corpus holds several
+elections = corpus_service.elections
+election, year = elections[-1]
+if len(elections) > 1:
+    election, year = st.selectbox("Wahl:", elections, index=len(elections) - 1, format_func=lambda pair: corpus.election_label(*pair))
+
+selected_pos = st.radio("Wortart:", list(keyness.KEYNESS_POS), horizontal=True)
+df_keyness = corpus_service.keyness(selected_pos, election, year)
+
+party_options = sorted(df_keyness["party"].unique())
+selected_party = st.selectbox("Partei:", party_options)
+measure = st.selectbox("Sortieren nach:", keyness.KEYNESS_MEASURES)
+min_freq = st.slider("Mindesthäufigkeit:", 1, 20, 3, help="Auffällig häufige Wörter müssen so oft in der Partei vorkommen, auffällig seltene so oft im Rest.")
+show_negative = st.checkbox("Auch seltener als im Rest verwendete Wörter anzeigen")
+
+# Words a party never uses have a count of 0 there, so under-use is filtered on the count in the rest
+df_party = df_keyness[df_keyness["party"] == selected_party]
+keep = (df_party["LogRatio"] > 0) & (df_party["freq"] >= min_freq)
+if show_negative:
+    keep |= (df_party["LogRatio"] <= 0) & (df_party["freq_reference"] >= min_freq)
+df_party = df_party[keep]
+df_party = df_party.sort_values(measure, ascending=False)
+
+# st.dataframe lets users re-sort by clicking on any column
+st.dataframe(
+    df_party[["lemma", "freq", "relfreq", "relfreq_reference", *keyness.KEYNESS_MEASURES]].rename(columns={
+        "lemma": "Lemma", "freq": "Häufigkeit", "relfreq": "Relative Häufigkeit", "relfreq_reference": "Relative Häufigkeit (Rest)",
+    }),
+    hide_index=True,
+    use_container_width=True,
+)
+
+with st.expander("Für Informationen zu diesem Tool hier klicken!"):
+    st.write("""
+    ### Daten und Methode
+
+    Für jede Partei wird jedes Wort ihres Wahlprogramms mit allen übrigen Wahlprogrammen derselben Wahl verglichen (Keyness-Analyse). Datengrundlage sind die (im Falle der AfD und der Linken vorläufigen) Wahlprogramme im PDF-Format, die in ein txt-Format überführt und manuell bereinigt wurden. Für die Korrektheit dieser Aufbereitung wird keine Garantie übernommen. Die Auswertung beruht auf lemmatisierter Basis und kann wie bei den Heatmaps auf Substantive, Adjektive oder Verben beschränkt werden.
+
+    **Welche Maße werden angezeigt?**
+
+    Die relativen Häufigkeiten sind Treffer pro Million Wörter im Wahlprogramm der Partei und im Rest. LogRatio ist der binäre Logarithmus ihres Verhältnisses: Ein Wert von 1 bedeutet doppelt so häufig, ein Wert von -1 halb so häufig wie im Rest. %DIFF gibt denselben Unterschied in Prozent an. Log-Likelihood misst, wie sicher der Unterschied angesichts der Textmengen ist; Werte über 3,84 gelten als signifikant (p < 0,05). Seltene Wörter können große LogRatio-Werte bei geringer Log-Likelihood haben, deshalb lässt sich eine Mindesthäufigkeit einstellen. Wörter, die eine Partei gar nicht verwendet, erscheinen unter den auffällig seltenen Wörtern, sofern sie in den Wahlprogrammen insgesamt mindestens fünfmal vorkommen.
+
+    **Wichtig**: Auch hier gilt, dass die Häufigkeit von *Wörtern* nur zum Teil etwas über die Relevanz der mit diesen Wörtern bezeichneten *Themen* aussagt. [In einem anderen Tool](https://btw25frequencies.streamlit.app/) können für einzelne Wörter Belege für die Verwendung im Kontext angezeigt werden.
+
+    **Es handelt sich um eine Testversion!** Feedback gerne an [simon.meier-vieracker@tu-dresden.de](mailto:simon.meier-vieracker@tu-dresden.de). Das Analyseskript kann auf GitHub eingesehen werden, Anpassungs- und Erweiterungsvorschläge sind sehr willkommen.
+    """)
@@ -0,0 +1,98 @@
+"""Simulate concurrent app sessions against the shared corpus service.
+
+Every session runs in its own thread, as Streamlit sessions do. A session looks up
+random lemmas and, like a user of frequencies_plotly.py and heatmap.py, requests
+frequencies, KWIC lines, collocations and a heatmap for each of them. The script
+reports latency percentiles per query type, the cache hit rate and the process's
+peak RSS.
+
+    python loadtest.py btw25_corrected.corpus --sessions 50 --queries 20
+"""
+import argparse
+import random
+import resource
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import service
+from cube import HEATMAP_POS, HEATMAP_MAX_ROWS
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def candidate_lemmas(corpus_service, top=2000):
+    """Return the most frequent lemmas, which users are most likely to type."""
+    totals = np.bincount(corpus_service.counts.lemma, weights=corpus_service.counts.count)
+    return list(corpus_service.corpus.decode("lemma", np.argsort(-totals)[:top]))
+
+
+def run_session(corpus_service, lemmas, queries, seed, timings, lock):
+    rng = random.Random(seed)
+    parties = corpus_service.parties
+    local = defaultdict(list)
+    for _ in range(queries):
+        lemma = rng.choice(lemmas)
+        party = rng.choice(parties)
+        steps = [
+            ("frequency", lambda: corpus_service.frequencies(lemma)),
+            ("kwic", lambda: corpus_service.kwic(lemma, party)),
+            ("collocation", lambda: corpus_service.collocations(lemma, party, min_freq=3)),
+            ("heatmap", lambda: corpus_service.heatmap(rng.choice(list(HEATMAP_POS)), rng.randint(25, HEATMAP_MAX_ROWS))),
+        ]
+        for name, query in steps:
+            start = time.perf_counter()
+            query()
+            local[name].append(time.perf_counter() - start)
+    with lock:
+        for name, values in local.items():
+            timings[name].extend(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the shared corpus service with N concurrent sessions.")
+    parser.add_argument("corpus", help="corpus directory")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--queries", type=int, default=20, help="lemma lookups per session")
+    parser.add_argument("--lemmas", type=int, default=2000, help="draw lemmas from this many most frequent ones")
+    parser.add_argument("--cache-size", type=int, default=service.CACHE_SIZE, help="LRU cache entries")
+    args = parser.parse_args()
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    corpus_service = service.get_service(args.corpus, cache_size=args.cache_size)
+    print(f"Service ready in {time.perf_counter() - start:.2f}s, {len(corpus_service.corpus)} tokens.")
+    rss_loaded = peak_rss_mb()
+    lemmas = candidate_lemmas(corpus_service, args.lemmas)
+
+    timings = defaultdict(list)
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_session, args=(corpus_service, lemmas, args.queries, seed, timings, lock))
+        for seed in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in timings.values())
+    print(f"{args.sessions} sessions, {total} queries in {elapsed:.2f}s ({total / elapsed:.0f} queries/s)")
+    print(f"{'query':<12} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, values in timings.items():
+        p50, p95 = np.percentile(values, [50, 95]) * 1000
+        print(f"{name:<12} {p50:8.2f} {p95:8.2f} {max(values) * 1000:8.2f}")
+    cache = corpus_service.cache
+    print(f"Cache: {len(cache)} entries, hit rate {cache.hits / max(cache.hits + cache.misses, 1):.0%}")
+    print(f"Peak RSS: {rss_before:.0f} MiB at start, {rss_loaded:.0f} MiB after loading, {peak_rss_mb():.0f} MiB after the run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Optional wall time, CPU time and peak memory instrumentation of import stages and app queries.
+
+Instrumentation is off unless the environment variable BTW_METRICS is set (the
+apps) or enable() is called (``import.py --metrics``). When it is off, stage()
+returns a shared no-op context manager and iterate() returns its iterable
+unchanged, so instrumented code pays one function call.
+
+When it is on, every finished stage is appended as one JSON object per line to
+the log (BTW_METRICS_LOG, default metrics.jsonl). Totals per stage and query
+latency histograms are written in the Prometheus text format (BTW_METRICS_PROM,
+default metrics.prom), e.g. for the node exporter's textfile collector. Times are
+exclusive: a stage nested in another is not counted twice, which keeps the
+interleaved stages of a streaming pipeline apart.
+"""
+import atexit
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+
+LOG_PATH = "metrics.jsonl"
+PROM_PATH = "metrics.prom"
+PROM_INTERVAL = 10  # seconds between Prometheus file rewrites while queries come in
+QUERY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_enabled = os.environ.get("BTW_METRICS", "") not in ("", "0")
+_log_path = os.environ.get("BTW_METRICS_LOG", LOG_PATH)
+_prom_path = os.environ.get("BTW_METRICS_PROM", PROM_PATH)
+# Worker processes log their stages but leave the Prometheus file to the process that enabled metrics
+_owner_pid = int(os.environ.get("BTW_METRICS_OWNER", os.getpid()))
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_local = threading.local()
+_records = []
+_totals = defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": 0})
+_histograms = defaultdict(lambda: [0] * (len(QUERY_BUCKETS) + 1))
+_last_flush = 0.0
+
+
+def enable(log_path=LOG_PATH, prom_path=PROM_PATH):
+    """Switch instrumentation on for this process and the worker processes it starts."""
+    global _enabled, _log_path, _prom_path, _owner_pid
+    _enabled, _log_path, _prom_path, _owner_pid = True, log_path, prom_path, os.getpid()
+    os.environ.update({
+        "BTW_METRICS": "1", "BTW_METRICS_LOG": log_path, "BTW_METRICS_PROM": prom_path,
+        "BTW_METRICS_OWNER": str(os.getpid()),
+    })
+
+
+def enabled():
+    return _enabled
+
+
+def is_owner():
+    """Return whether this process enabled metrics (and not a worker forked from it)."""
+    return os.getpid() == _owner_pid
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage:
+    """Accumulates the exclusive wall and CPU time of one stage over one or more entries."""
+
+    def __init__(self, name, kind, labels, once=True):
+        self.name = name
+        self.kind = kind
+        self.labels = labels
+        self.once = once
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        # [wall start, cpu start, wall of nested stages, cpu of nested stages]
+        stack.append([time.perf_counter(), time.process_time(), 0.0, 0.0])
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        stack = _local.stack
+        wall_start, cpu_start, nested_wall, nested_cpu = stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        if stack:
+            stack[-1][2] += wall
+            stack[-1][3] += cpu
+        self.calls += 1
+        self.wall += wall - nested_wall
+        self.cpu += cpu - nested_cpu
+        if self.once:
+            self.emit()
+
+    def emit(self):
+        """Record the accumulated times as one log entry."""
+        record({
+            "time": time.time(), "pid": os.getpid(), "kind": self.kind, "stage": self.name,
+            "calls": self.calls, "wall_s": self.wall, "cpu_s": self.cpu, "peak_rss_mb": peak_rss_bytes() / 2**20,
+            **self.labels,
+        })
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return None
+
+    def emit(self):
+        return None
+
+
+NULL_STAGE = _NullStage()
+
+
+def stage(name, kind="import", once=True, **labels):
+    """Return a context manager timing a stage; with once=False call emit() after the last entry."""
+    if not _enabled:
+        return NULL_STAGE
+    return Stage(name, kind, labels, once)
+
+
+def iterate(name, iterable, kind="import", **labels):
+    """Time the work done producing each item of an iterable and record it as one stage at the end."""
+    if not _enabled:
+        return iterable
+    return _iterate(Stage(name, kind, labels, once=False), iter(iterable))
+
+
+def _iterate(timer, iterator):
+    try:
+        while True:
+            with timer:
+                item = next(iterator, timer)
+            if item is timer:
+                return
+            yield item
+    finally:
+        timer.emit()
+
+
+def _aggregate(entry):
+    key = (entry["kind"], entry["stage"])
+    totals = _totals[key]
+    totals["calls"] += entry["calls"]
+    totals["wall"] += entry["wall_s"]
+    totals["cpu"] += entry["cpu_s"]
+    totals["peak_rss"] = max(totals["peak_rss"], int(entry["peak_rss_mb"] * 2**20))
+    if entry["kind"] == "query":
+        histogram = _histograms[key]
+        for i, bound in enumerate(QUERY_BUCKETS):
+            if entry["wall_s"] <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[-1] += 1
+
+
+def record(entry):
+    """Log one finished stage as a JSON line and add it to the Prometheus totals."""
+    global _last_flush
+    line = json.dumps(entry, ensure_ascii=False)
+    owner = is_owner()
+    with _lock:
+        with open(_log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        if not owner:
+            _records.append(entry)  # kept until the worker's entries are drained
+        _aggregate(entry)
+        due = owner and entry["kind"] == "query" and time.monotonic() - _last_flush > PROM_INTERVAL
+    if due:
+        flush()
+
+
+def drain():
+    """Return and forget the entries recorded so far, e.g. to send them from a worker to the main process."""
+    with _lock:
+        entries = list(_records)
+        _records.clear()
+    return entries
+
+
+def merge(entries):
+    """Add entries recorded in another process to this process's Prometheus totals."""
+    with _lock:
+        for entry in entries:
+            _aggregate(entry)
+
+
+def prometheus_text():
+    """Return the stage totals and query histograms in the Prometheus text exposition format."""
+    lines = []
+    series = (
+        ("btw_stage_wall_seconds_total", "counter", "Exclusive wall time spent in a stage.", "wall"),
+        ("btw_stage_cpu_seconds_total", "counter", "Exclusive CPU time spent in a stage.", "cpu"),
+        ("btw_stage_calls_total", "counter", "Number of times a stage was entered.", "calls"),
+        ("btw_stage_peak_rss_bytes", "gauge", "Highest peak RSS of a process at the end of a stage.", "peak_rss"),
+    )
+    with _lock:
+        totals = {key: dict(value) for key, value in _totals.items()}
+        histograms = {key: list(value) for key, value in _histograms.items()}
+    for metric, metric_type, description, field in series:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for (kind, name), value in sorted(totals.items()):
+            lines.append(f'{metric}{{kind="{kind}",stage="{name}"}} {value[field]}')
+    lines.append("# HELP btw_query_duration_seconds Wall time of app queries.")
+    lines.append("# TYPE btw_query_duration_seconds histogram")
+    for (kind, name), counts in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*QUERY_BUCKETS, "+Inf"), counts):
+            cumulative += count
+            lines.append(f'btw_query_duration_seconds_bucket{{query="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'btw_query_duration_seconds_sum{{query="{name}"}} {totals[(kind, name)]["wall"]}')
+        lines.append(f'btw_query_duration_seconds_count{{query="{name}"}} {cumulative}')
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    """Rewrite the Prometheus file atomically."""
+    global _last_flush
+    if not _enabled or not is_owner():
+        return
+    _last_flush = time.monotonic()
+    text = prometheus_text()
+    with _flush_lock:
+        with open(_prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(_prom_path + ".tmp", _prom_path)
+
+
+atexit.register(flush)
@@ -0,0 +1,240 @@
+"""Phrase and CQL-style sequence queries over the integer-encoded corpus.
+
+A query is a sequence of terms:
+
+    sozial Gerechtigkeit                   lemmas
+    erneuerbar Energie*                    wildcards as in single-lemma queries
+    "sozialen" Gerechtigkeit               a quoted term is a word form
+    [pos="ADJ.*"] [lemma="Energie"]        attribute constraints, values are regexes
+    [pos="ADJA" & lemma="neu"] [] Energie  & combines constraints, [] is any token
+
+Runs of literal lemmas are looked up in a suffix array of the lemma sequence.
+The array is sorted on the first MAX_PHRASE_LENGTH lemmas of every suffix, so a
+phrase is one binary search for a contiguous range. Other terms are checked
+vectorized at fixed offsets from the candidates; without a lemma run, the
+candidates come from the postings of the most selective term. Matches never
+cross document boundaries. The suffix array is stored in ``index/lemma.suffixes/``
+next to the positional index.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from analysis import add_relative_frequencies, kwic_lines
+from corpus import load_artifact, save_artifact, smallest_dtype
+from cube import load_cube
+from index import INDEX_DIR, gather_ranges, load_index, restrict
+from vocabulary import is_pattern, load_vocabulary_index, wildcard_regex
+
+MAX_PHRASE_LENGTH = 8  # suffixes are sorted on this many lemmas
+ATTRIBUTES = {"lemma": "lemma", "word": "token", "pos": "pos"}
+TERM_PATTERN = re.compile(r'\[[^\]]*\]|"[^"]*"|\S+')
+CONSTRAINT_PATTERN = re.compile(r'\s*(\w+)\s*=\s*"([^"]*)"\s*')
+
+
+class SuffixArray:
+    """Corpus positions ordered by the id sequences starting there, up to a fixed depth."""
+
+    def __init__(self, corpus, field, suffixes, depth):
+        self.corpus = corpus
+        self.field = field
+        self.suffixes = suffixes
+        self.depth = depth
+
+    def _bound(self, ids, upper):
+        # Binary search over the suffixes; a suffix cut short by the corpus end sorts first
+        codes = self.corpus.codes[self.field]
+        lo, hi = 0, len(self.suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = int(self.suffixes[mid])
+            prefix = codes[start:start + len(ids)].tolist()
+            if prefix < ids or (upper and prefix == ids):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, values):
+        """Return the sorted start positions of a sequence of string values."""
+        ids = [self.corpus.id(self.field, value) for value in values]
+        if not ids or min(ids) < 0:
+            return np.zeros(0, dtype=np.int64)
+        head = ids[:self.depth]
+        positions = np.sort(np.asarray(self.suffixes[self._bound(head, False):self._bound(head, True)], dtype=np.int64))
+        codes = self.corpus.codes[self.field]
+        for offset in range(self.depth, len(ids)):
+            positions = positions[positions + offset < len(codes)]
+            positions = positions[codes[positions + offset] == ids[offset]]
+        return positions
+
+
+def suffix_arrays(corpus, field="lemma", depth=MAX_PHRASE_LENGTH):
+    """Sort all corpus positions by their next depth ids with prefix doubling."""
+    n = len(corpus)
+    rank = np.asarray(corpus.codes[field], dtype=np.int64) + 1  # 0 marks the corpus end
+    suffixes = np.argsort(rank, kind="stable")
+    k = 1
+    while k < depth and n:
+        following = np.zeros(n, dtype=np.int64)
+        following[:n - k] = rank[k:]
+        # Ranks stay below n + 2, so the pair fits one int64 key; the stable sort keeps ties in position order
+        key = rank * (n + 2) + following
+        suffixes = np.argsort(key, kind="stable")
+        sorted_key = key[suffixes]
+        rank[suffixes] = np.concatenate(([1], np.cumsum(sorted_key[1:] != sorted_key[:-1]) + 1))
+        k *= 2
+    # The depth is stored with the order, so a changed MAX_PHRASE_LENGTH does not misread it
+    return {"suffixes": suffixes.astype(smallest_dtype(n)), "depth": depth}
+
+
+def build_suffix_array(corpus, field="lemma", depth=MAX_PHRASE_LENGTH, save=True):
+    """Build the suffix array of a corpus column and optionally persist it."""
+    arrays = suffix_arrays(corpus, field, depth)
+    if save:
+        save_artifact(corpus, os.path.join(INDEX_DIR, f"{field}.suffixes"), arrays)
+    return SuffixArray(corpus, field, arrays["suffixes"], arrays["depth"])
+
+
+def load_suffix_array(corpus, field="lemma"):
+    """Return the suffix array of a corpus column, loading or building it on first use."""
+    key = ("suffixes", field)
+    if key not in corpus.cache:
+        arrays = load_artifact(corpus, os.path.join(INDEX_DIR, f"{field}.suffixes"), lambda: suffix_arrays(corpus, field))
+        corpus.cache[key] = SuffixArray(corpus, field, arrays["suffixes"], arrays["depth"])
+    return corpus.cache[key]
+
+
+def is_phrase(query):
+    """Return whether a query is a sequence query rather than a single lemma or wildcard pattern."""
+    query = query.strip()
+    return len(query.split()) > 1 or query.startswith(("[", '"'))
+
+
+def parse_query(query):
+    """Parse a query into one dict of column -> value regex per token; an empty dict matches any token."""
+    terms = []
+    for term in TERM_PATTERN.findall(query):
+        if term.startswith("["):
+            constraints = {}
+            body = term[1:-1].strip()
+            for part in body.split("&") if body else []:
+                match = CONSTRAINT_PATTERN.fullmatch(part)
+                if match is None or match.group(1) not in ATTRIBUTES:
+                    raise ValueError(f"Invalid constraint {part.strip()!r}; use lemma=\"...\", word=\"...\" or pos=\"...\"")
+                constraints[ATTRIBUTES[match.group(1)]] = match.group(2)
+            terms.append(constraints)
+        elif term.startswith('"'):
+            terms.append({"token": re.escape(term.strip('"'))})
+        elif is_pattern(term):
+            terms.append({"lemma": wildcard_regex(term)})
+        else:
+            terms.append({"lemma": re.escape(term)})
+    if not any(terms):
+        raise ValueError(f"Query {query!r} does not constrain any token")
+    return terms
+
+
+def as_wildcard(pattern):
+    """Return the wildcard pattern (or plain string) equivalent to a regex, or None if there is none."""
+    wildcard = re.sub(r"\\(.)|\.\*|\.", lambda m: m.group(1) or ("*" if m.group(0) == ".*" else "?"), pattern)
+    return wildcard if wildcard_regex(wildcard) == pattern else None
+
+
+def literal(pattern):
+    """Return the string a regex matches if it has no special characters, else None."""
+    value = as_wildcard(pattern)
+    return None if value is None or is_pattern(value) else value
+
+
+def allowed_ids(corpus, field, pattern):
+    """Return the ids of a column's vocabulary fully matching a value regex.
+
+    Regexes that are plain strings or wildcard patterns (``ADJ.*``) are looked up in
+    the sorted vocabulary instead of being matched against every string.
+    """
+    vocabulary = load_vocabulary_index(corpus, field)
+    value = as_wildcard(pattern)
+    if value is not None:
+        return vocabulary.match(value)
+    return vocabulary.regex(pattern)
+
+
+def lemma_run(terms):
+    """Return (offset, lemmas) of the longest run of terms that are plain literal lemmas."""
+    best = (0, [])
+    start = 0
+    while start < len(terms):
+        run = []
+        while start + len(run) < len(terms):
+            term = terms[start + len(run)]
+            value = literal(term["lemma"]) if set(term) == {"lemma"} else None
+            if value is None:
+                break
+            run.append(value)
+        if len(run) > len(best[1]):
+            best = (start, run)
+        start += len(run) + 1
+    return best
+
+
+def find(corpus, query, party=None, year=None, election=None):
+    """Return the sorted start positions of a query's matches and the number of tokens they span."""
+    terms = parse_query(query)
+    allowed = [{field: allowed_ids(corpus, field, pattern) for field, pattern in term.items()} for term in terms]
+    offset, run = lemma_run(terms)
+    checked = set(range(offset, offset + len(run)))
+    if len(run) > 1:
+        positions = load_suffix_array(corpus, "lemma").find(run) - offset
+    else:
+        # Anchor on the term whose postings are shortest
+        def postings_count(field, ids):
+            offsets = load_index(corpus, field).offsets
+            return int((offsets[ids + 1] - offsets[ids]).sum())
+        offset, field, ids = min(
+            ((i, field, ids) for i, term in enumerate(allowed) for field, ids in term.items()),
+            key=lambda candidate: postings_count(candidate[1], candidate[2]),
+        )
+        index = load_index(corpus, field)
+        positions = np.sort(index.postings[gather_ranges(index.offsets[ids], index.offsets[ids + 1])]).astype(np.int64) - offset
+        checked = {offset} if len(terms[offset]) == 1 else set()
+    positions = positions[(positions >= 0) & (positions + len(terms) <= len(corpus))]
+
+    for i, term in enumerate(allowed):
+        if i in checked:
+            continue
+        for field, ids in term.items():
+            mask = np.zeros(len(corpus.vocab[field]), dtype=bool)
+            mask[ids] = True
+            positions = positions[mask[corpus.codes[field][positions + i]]]
+
+    # Drop matches running into the next document, then keep the selected partitions
+    document = np.searchsorted(corpus.document_starts, positions, side="right")
+    positions = positions[document == np.searchsorted(corpus.document_starts, positions + len(terms) - 1, side="right")]
+    if party is not None or year is not None or election is not None:
+        positions = restrict(positions, *corpus.document_ranges(party, year, election))
+    return positions, len(terms)
+
+
+def frequency_table(corpus, query, year=None, election=None):
+    """Return the per-party frequencies of a query in the same layout as analysis.relative_frequencies."""
+    counts = load_cube(corpus)
+    positions, _ = find(corpus, query, year=year, election=election)
+    document = np.searchsorted(corpus.document_starts, positions, side="right") - 1
+    freq = np.bincount(counts.partition_party[corpus.document_partition[document]], minlength=len(corpus.vocab["party"]))
+    df = pd.DataFrame({
+        "lemma": np.where(freq > 0, query, None),
+        "party": corpus.vocab["party"],
+        "freq": np.where(freq > 0, freq, np.nan),
+        "count": counts.party_sizes(counts.selection(year, election)),
+    })
+    df = df[df["count"] > 0].sort_values("party").reset_index(drop=True)
+    return add_relative_frequencies(df)
+
+
+def kwic(corpus, query, party, context_size=15, max_examples=10, rng=None, year=None, election=None):
+    """Return up to max_examples random KWIC lines for a query in one party's documents, with the match in bold."""
+    positions, length = find(corpus, query, party, year, election)
+    return kwic_lines(corpus, positions, length, context_size, max_examples, rng)
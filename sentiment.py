@@ -0,0 +1,163 @@
+"""Weighted SentiWS sentiment scores computed from an annotated corpus.
+
+SentiWS is mapped once onto the corpus's lemma ids as a weight array, so scores
+are gathers and sums over the stored lemma arrays and never need spaCy. Besides
+one row per manifesto there are two curves: over windows of a fixed number of
+tokens, and over the sections of a manifesto, which are its PDF pages as
+recorded in the source layer (corpora without one have no sections). Running
+this module rewrites the sentiment tables from an existing corpus:
+
+    python sentiment.py btw25.corpus --window 1000
+"""
+import argparse
+import csv
+
+import numpy as np
+
+from corpus import Corpus
+from source import load_source
+
+SENTIWS_FILES = ("SentiWS_v2.0_Positive.txt", "SentiWS_v2.0_Negative.txt")
+WINDOW_SIZE = 1000
+SENTIMENT_FIELDS = ["Party", "Year", "Positive", "Negative", "Neutral", "PositiveWeight", "NegativeWeight", "ScorePer1000", "Election"]
+CURVE_FIELDS = ["Party", "Year", "Window", "Start", "End", "Positive", "Negative", "Score", "Election"]
+SECTION_FIELDS = ["Party", "Year", "Section", "Page", "Start", "End", "Positive", "Negative", "Score", "Election"]
+
+
+def load_sentiws(files=SENTIWS_FILES):
+    """Load SentiWS into a dict from lower-cased word form to polarity weight.
+
+    Base forms and their inflected forms are all included. A base form wins over an
+    inflected form with the same spelling, and the positive list wins over the
+    negative one.
+    """
+    base_forms = {}
+    inflected_forms = {}
+    for filepath in files:
+        with open(filepath, "r", encoding="utf-8") as file:
+            for line in file:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) < 2:
+                    continue
+                weight = float(parts[1])
+                base_forms.setdefault(parts[0].split("|")[0].lower(), weight)
+                if len(parts) > 2:
+                    for form in parts[2].split(","):
+                        if form:
+                            inflected_forms.setdefault(form.lower(), weight)
+    return {**inflected_forms, **base_forms}
+
+
+def lemma_weights(corpus, sentiws):
+    """Return the SentiWS weight of every lemma id (0 for lemmas not in SentiWS)."""
+    return np.fromiter((sentiws.get(lemma.lower(), 0.0) for lemma in corpus.vocab["lemma"]), dtype=np.float64, count=len(corpus.vocab["lemma"]))
+
+
+def score_range(weights, lemma_ids):
+    """Return counts and weighted sums of positive and negative tokens in a slice of lemma ids."""
+    token_weights = weights[lemma_ids]
+    positive = token_weights > 0
+    negative = token_weights < 0
+    n_positive = int(np.count_nonzero(positive))
+    n_negative = int(np.count_nonzero(negative))
+    return {
+        "Positive": n_positive,
+        "Negative": n_negative,
+        "Neutral": len(lemma_ids) - n_positive - n_negative,
+        "PositiveWeight": float(token_weights[positive].sum()),
+        "NegativeWeight": float(token_weights[negative].sum()),
+    }
+
+
+def run_scores(token_weights, starts):
+    """Return the summed positive and negative weights and the per-1000-token score of the runs beginning at starts."""
+    positive = np.add.reduceat(np.where(token_weights > 0, token_weights, 0), starts)
+    negative = np.add.reduceat(np.where(token_weights < 0, token_weights, 0), starts)
+    lengths = np.diff(np.append(starts, len(token_weights)))
+    return positive, negative, (positive + negative) / lengths * 1000
+
+
+def score_corpus(corpus, sentiws, window=WINDOW_SIZE):
+    """Return per-document sentiment rows and per-window sentiment curve rows."""
+    weights = lemma_weights(corpus, sentiws)
+    lemma_ids = corpus.codes["lemma"]
+    sentiments = []
+    curves = []
+    for doc in corpus.documents:
+        doc_ids = lemma_ids[doc["start"]:doc["end"]]
+        scores = score_range(weights, doc_ids)
+        n_tokens = max(len(doc_ids), 1)
+        scores["ScorePer1000"] = (scores["PositiveWeight"] + scores["NegativeWeight"]) / n_tokens * 1000
+        sentiments.append({"Party": doc["party"], "Year": doc["year"], **scores, "Election": doc["election"]})
+
+        if len(doc_ids) == 0:
+            continue
+        starts = np.arange(0, len(doc_ids), window)
+        positive, negative, score = run_scores(weights[doc_ids], starts)
+        ends = np.minimum(starts + window, len(doc_ids))
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            curves.append({
+                "Party": doc["party"], "Year": doc["year"], "Window": i,
+                "Start": doc["start"] + int(start), "End": doc["start"] + int(end),
+                "Positive": positive[i], "Negative": negative[i], "Score": score[i],
+                "Election": doc["election"],
+            })
+    return sentiments, curves
+
+
+def score_sections(corpus, sentiws):
+    """Return sentiment curve rows over the PDF pages of every document; empty for a corpus without a source layer."""
+    source = load_source(corpus)
+    if source is None:
+        return []
+    weights = lemma_weights(corpus, sentiws)
+    page_start = np.asarray(source.page_start, dtype=np.int64)
+    sections = []
+    for doc in corpus.documents:
+        if doc["end"] <= doc["start"]:
+            continue
+        # Page runs starting inside the document, and the run the document starts in
+        inside = page_start[np.searchsorted(page_start, doc["start"], side="right"):np.searchsorted(page_start, doc["end"])]
+        starts = np.concatenate(([doc["start"]], inside))
+        positive, negative, score = run_scores(weights[corpus.codes["lemma"][doc["start"]:doc["end"]]], starts - doc["start"])
+        ends = np.append(starts[1:], doc["end"])
+        for i, (start, end, page) in enumerate(zip(starts, ends, source.pages(starts))):
+            sections.append({
+                "Party": doc["party"], "Year": doc["year"], "Section": i, "Page": int(page),
+                "Start": int(start), "End": int(end),
+                "Positive": positive[i], "Negative": negative[i], "Score": score[i],
+                "Election": doc["election"],
+            })
+    return sections
+
+
+def save_tsv(rows, fieldnames, output_file):
+    """Save sentiment rows to a TSV file."""
+    print(f"Saving sentiments to {output_file}...")
+    with open(output_file, "w", encoding="utf-8", newline="") as tsvfile:
+        writer = csv.DictWriter(tsvfile, fieldnames=fieldnames, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Sentiments saved to {output_file}.")
+
+
+def write_sentiments(corpus, output_file, curves_file, sections_file=None, window=WINDOW_SIZE, files=SENTIWS_FILES):
+    """Score a corpus with SentiWS and write the sentiment table, the window curves and optionally the section curves."""
+    sentiws = load_sentiws(files)
+    sentiments, curves = score_corpus(corpus, sentiws, window)
+    save_tsv(sentiments, SENTIMENT_FIELDS, output_file)
+    save_tsv(curves, CURVE_FIELDS, curves_file)
+    if sections_file is not None:
+        save_tsv(score_sections(corpus, sentiws), SECTION_FIELDS, sections_file)
+    return sentiments, curves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute SentiWS sentiment scores from an annotated corpus.")
+    parser.add_argument("corpus", help="corpus directory")
+    parser.add_argument("--output", default="sent25.tsv", help="per-document sentiment table")
+    parser.add_argument("--curves", default="sent25_curves.tsv", help="per-window sentiment curves")
+    parser.add_argument("--sections", default="sent25_sections.tsv", help="per-page sentiment curves")
+    parser.add_argument("--window", type=int, default=WINDOW_SIZE, help="tokens per curve window")
+    args = parser.parse_args()
+    write_sentiments(Corpus(args.corpus), args.output, args.curves, args.sections, args.window)
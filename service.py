@@ -0,0 +1,180 @@
+"""Process-wide corpus service shared by all Streamlit sessions.
+
+Streamlit re-executes the app scripts for every session and interaction, but
+imported modules live once per server process. get_service() therefore hands
+every session the same CorpusService. It holds the memory-mapped corpus,
+its indexes and the count cube, and it caches query results in a bounded LRU
+cache. Because the arrays are memory-mapped, several server processes on one
+machine share them through the page cache as well.
+"""
+import threading
+from collections import OrderedDict
+
+import analysis
+import embeddings
+import keyness
+import metrics
+import phrase
+import vocabulary
+from corpus import load_corpus
+from cube import load_cube
+from index import load_index, FIELDS as INDEX_FIELDS
+
+CACHE_SIZE = 1024
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond maxsize."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CorpusService:
+    """Frequency, KWIC, collocation and heatmap queries against one shared corpus."""
+
+    def __init__(self, path, source_tsv=None, cache_size=CACHE_SIZE):
+        self.corpus = load_corpus(path, source_tsv=source_tsv)
+        # Load everything up front so concurrent sessions never build an index twice
+        self.counts = load_cube(self.corpus)
+        for field in INDEX_FIELDS:
+            load_index(self.corpus, field)
+        vocabulary.load_vocabulary_index(self.corpus, "lemma")
+        # The suffix array and the word vectors take long to build and serve only some queries; see _artifact()
+        self._artifacts = {}
+        self._artifacts_lock = threading.Lock()
+        self.cache = LRUCache(cache_size)
+
+    def _artifact(self, name, load):
+        """Return an artifact loaded (or built) on first use; the lock keeps concurrent sessions from building it twice."""
+        with self._artifacts_lock:
+            if name not in self._artifacts:
+                self._artifacts[name] = load()
+            return self._artifacts[name]
+
+    @property
+    def embeddings(self):
+        return self._artifact("embeddings", lambda: embeddings.load_embeddings(self.corpus))
+
+    def _load_suffix_array(self):
+        # phrase.find() then takes it from the corpus cache
+        return self._artifact("suffix_array", lambda: phrase.load_suffix_array(self.corpus, "lemma"))
+
+    @property
+    def parties(self):
+        return [party for party, total in zip(self.corpus.vocab["party"], self.counts.party_totals) if total > 0]
+
+    @property
+    def elections(self):
+        """Return the (election, year) pairs of the corpus, oldest first."""
+        return self.corpus.elections
+
+    def expand(self, query, regex=False, limit=vocabulary.MAX_EXPANSIONS):
+        """Return the most frequent lemmas matching a wildcard pattern or regex and the number of all matches.
+
+        The lemmas come as a tuple, so they can be passed on to the other queries as a cache key.
+        """
+        with metrics.stage("expand", kind="query", lemma=query):
+            lemmas, n_matches = self.cache.get_or_compute(("expand", query, regex, limit), lambda: vocabulary.expand(self.corpus, query, regex=regex, limit=limit))
+            return tuple(lemmas), n_matches
+
+    def frequencies(self, lemma, year=None, election=None, label=None):
+        """Return relative and mean-centred frequencies of a lemma (or tuple of lemmas) per party, optionally in some elections only."""
+        key = ("frequencies", lemma, year, election, label)
+        with metrics.stage("frequency", kind="query", lemma=label or lemma):
+            result = self.cache.get_or_compute(key, lambda: analysis.relative_frequencies(self.counts, lemma, year, election, label))
+            return result.copy()
+
+    def series(self, lemma, party=None):
+        """Return the frequencies of a lemma in every election and party."""
+        with metrics.stage("series", kind="query", lemma=lemma):
+            result = self.cache.get_or_compute(("series", lemma, party), lambda: analysis.frequency_series(self.counts, lemma, party))
+            return result.copy()
+
+    def kwic(self, lemma, party, context_size=15, max_examples=10, year=None, election=None):
+        """Return a fresh random sample of KWIC lines; samples are deliberately not cached."""
+        with metrics.stage("kwic", kind="query", lemma=lemma, party=party):
+            return analysis.kwic(self.corpus, lemma, party, context_size=context_size, max_examples=max_examples, year=year, election=election)
+
+    def collocations(self, lemma, party, left=5, right=5, min_freq=1, year=None, election=None):
+        """Return the collocation table of a lemma in one party's documents."""
+        key = ("collocations", lemma, party, left, right, min_freq, year, election)
+        with metrics.stage("collocation", kind="query", lemma=lemma, party=party):
+            result = self.cache.get_or_compute(key, lambda: analysis.collocations(self.corpus, lemma, party, left, right, min_freq, year, election))
+            return result.copy()
+
+    def keyness(self, tab="Alle", election=None, year=None):
+        """Return the keyness table of all parties for a POS filter, by default of the latest election."""
+        if election is None:
+            election, year = self.corpus.elections[-1]
+        with metrics.stage("keyness", kind="query", tab=tab):
+            return keyness.load_keyness(self.corpus, tab, election, year).copy()
+
+    def similar(self, lemma, party=None, top=20):
+        """Return the lemmas used most like lemma in one party's manifestos, or in the whole corpus."""
+        key = ("similar", lemma, party, top)
+        with metrics.stage("similar", kind="query", lemma=lemma, party=party):
+            result = self.cache.get_or_compute(key, lambda: self.embeddings.similar(lemma, party, top))
+            return result.copy()
+
+    def shift(self, lemma, top=5):
+        """Return how each party's use of lemma differs from the whole corpus, and the party x party similarities."""
+        key = ("shift", lemma, top)
+        with metrics.stage("shift", kind="query", lemma=lemma):
+            table, matrix = self.cache.get_or_compute(key, lambda: (self.embeddings.shift(lemma, top), self.embeddings.party_similarity(lemma)))
+            return table.copy(), matrix.copy()
+
+    def phrase_frequencies(self, query, year=None, election=None):
+        """Return relative and mean-centred frequencies of a phrase or sequence query per party."""
+        key = ("phrase_frequencies", query, year, election)
+        self._load_suffix_array()
+        with metrics.stage("phrase_frequency", kind="query", lemma=query):
+            result = self.cache.get_or_compute(key, lambda: phrase.frequency_table(self.corpus, query, year, election))
+            return result.copy()
+
+    def phrase_kwic(self, query, party, context_size=15, max_examples=10, year=None, election=None):
+        """Return a fresh random sample of KWIC lines of a phrase or sequence query."""
+        self._load_suffix_array()
+        with metrics.stage("phrase_kwic", kind="query", lemma=query, party=party):
+            return phrase.kwic(self.corpus, query, party, context_size=context_size, max_examples=max_examples, year=year, election=election)
+
+    def heatmap(self, tab, number_of_rows, election=None, year=None):
+        """Return the relative and absolute frequency matrices of a heatmap tab, by default of the latest election."""
+        key = ("heatmap", tab, number_of_rows, election, year)
+        with metrics.stage("heatmap", kind="query", tab=tab):
+            matrix, matrix_table = self.cache.get_or_compute(key, lambda: self.counts.heatmap(tab, number_of_rows, election, year))
+            return matrix.copy(), matrix_table.copy()
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(path, source_tsv=None, cache_size=CACHE_SIZE):
+    """Return the process-wide service for a corpus directory, creating it on first use."""
+    with _services_lock:
+        if path not in _services:
+            _services[path] = CorpusService(path, source_tsv=source_tsv, cache_size=cache_size)
+        return _services[path]
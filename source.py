@@ -0,0 +1,115 @@
+"""Source text, sentences and PDF pages of a corpus, for KWIC snippets with provenance.
+
+import.py stores the cleaned text every manifesto was annotated from in the corpus
+directory (``source/``, see corpus.py). The text file is memory-mapped and a
+snippet is decoded from one slice of it, so a KWIC line reads only its own bytes.
+The byte range of every token maps corpus positions into the text, the sentence
+starts bound KWIC windows and the page runs give the PDF page of a hit.
+
+Corpora without a source layer (e.g. converted from a TSV) still get sentence
+bounds; they are derived from sentence-final punctuation (STTS tag ``$.``).
+"""
+import os
+
+import numpy as np
+
+from corpus import SOURCE_DIR
+
+SENTENCE_END_TAGS = ("$.",)
+
+
+class SourceText:
+    """Memory-mapped source text with the byte range and PDF page of every token."""
+
+    def __init__(self, corpus, text, token_start, token_end, page_start, page):
+        self.corpus = corpus
+        self.text = text
+        self.token_start = token_start
+        self.token_end = token_end
+        self.page_start = page_start
+        self.page = page
+
+    def span(self, start, end):
+        """Return the original text from the start of token start to the end of token end - 1."""
+        if end <= start:
+            return ""
+        text = self.text[self.token_start[start]:self.token_end[end - 1]].tobytes().decode("utf-8", errors="replace")
+        return text.replace("\n", " ")
+
+    def gap(self, position):
+        """Return the original text between token position - 1 and token position (usually a space)."""
+        if position <= 0 or position >= len(self.token_start):
+            return ""
+        return self.text[self.token_end[position - 1]:self.token_start[position]].tobytes().decode("utf-8", errors="replace").replace("\n", " ")
+
+    def pages(self, positions):
+        """Return the PDF page of each position; 0 if it is unknown."""
+        return np.asarray(self.page)[np.searchsorted(self.page_start, positions, side="right") - 1]
+
+
+def load_source(corpus):
+    """Return the source text layer of a corpus, or None if the corpus has none."""
+    if "source" not in corpus.cache:
+        source = None
+        if os.path.exists(corpus.artifact_path(SOURCE_DIR, "text.txt")):
+            arrays = {
+                name: np.load(corpus.artifact_path(SOURCE_DIR, f"{name}.npy"), mmap_mode="r")
+                for name in ("token_start", "token_end", "page_start", "page")
+            }
+            text = np.memmap(corpus.artifact_path(SOURCE_DIR, "text.txt"), dtype=np.uint8, mode="r")
+            source = SourceText(corpus, text, **arrays)
+        corpus.cache["source"] = source
+    return corpus.cache["source"]
+
+
+def sentence_starts(corpus):
+    """Return the sorted positions where sentences start, recorded at import or derived from punctuation."""
+    if "sentences" not in corpus.cache:
+        if os.path.exists(corpus.artifact_path(SOURCE_DIR, "sentence_start.npy")):
+            starts = np.load(corpus.artifact_path(SOURCE_DIR, "sentence_start.npy"), mmap_mode="r")
+        else:
+            end_tags = [corpus.id("pos", tag) for tag in SENTENCE_END_TAGS]
+            ends = np.flatnonzero(np.isin(corpus.codes["pos"], end_tags)) + 1
+            starts = np.union1d(corpus.document_starts, ends[ends < len(corpus)])
+        corpus.cache["sentences"] = starts
+    return corpus.cache["sentences"]
+
+
+def context_bounds(corpus, positions, length=1, within="sentence"):
+    """Return start and end arrays of the document, or sentence, around each hit of length tokens.
+
+    KWIC windows and collocation windows are clipped to these bounds, so that they
+    never reach into another party's manifesto. A hit spanning several sentences
+    keeps all of them.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    document = np.searchsorted(corpus.document_starts, positions, side="right") - 1
+    lo = corpus.document_starts[document]
+    hi = corpus.document_ends[document]
+    if within == "sentence":
+        starts = np.asarray(sentence_starts(corpus), dtype=np.int64)
+        lo = np.maximum(lo, starts[np.maximum(np.searchsorted(starts, positions, side="right") - 1, 0)])
+        following = np.searchsorted(starts, positions + length - 1, side="right")
+        hi = np.minimum(hi, np.append(starts, len(corpus))[following])
+    elif within != "document":
+        raise ValueError(f"Unknown context bound {within!r}, expected 'sentence' or 'document'")
+    return lo, hi
+
+
+def context_windows(corpus, positions, offsets, within="document"):
+    """Return the positions at offsets around each hit that stay within its document (or sentence), and the index of the hit of each.
+
+    Collocations and the co-occurrence counts of the word vectors share these windows.
+    If no window reaches a bound, nothing needs to be clipped.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    windows = positions[:, None] + offsets
+    hits = np.broadcast_to(np.arange(len(positions))[:, None], windows.shape)
+    if len(positions) == 0 or len(offsets) == 0:
+        return windows.ravel(), hits.ravel()
+    lo, hi = context_bounds(corpus, positions, within=within)
+    if np.any((positions + offsets.min() < lo) | (positions + offsets.max() >= hi)):
+        keep = (windows >= lo[:, None]) & (windows < hi[:, None])
+        return windows[keep], hits[keep]
+    return windows.ravel(), hits.ravel()
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from corpus import COLUMNS, Corpus, CorpusWriter  # noqa: E402
+
+
+@pytest.fixture
+def make_corpus(tmp_path):
+    """Return a function writing (token, pos, lemma, party, year) rows to a corpus directory."""
+    def make(rows, name="test.corpus", election="BTW"):
+        path = str(tmp_path / name)
+        with CorpusWriter(path, election=election) as writer:
+            writer.add_columns({column: [row[i] for row in rows] for i, column in enumerate(COLUMNS)})
+        return Corpus(path)
+    return make
+
+
+# Lemmas and POS tags of the synthetic corpora, and the parties of each year
+LEMMAS = {"Klima": "NN", "Steuer": "NN", "Freiheit": "NN", "Energie": "NN", "Europa": "NE", "sozial": "ADJA",
+          "schnell": "ADJD", "fordern": "VVFIN", "und": "KON", "die": "ART", "wir": "PPER"}
+PARTITIONS = (("2021", ("AfD", "CDU")), ("2025", ("AfD", "CDU", "SPD")))
+
+
+def synthetic_rows(size=2000, seed=0, lemmas=LEMMAS, partitions=PARTITIONS, weights=None, sentence_end=0.0):
+    """Return seeded random (token, pos, lemma, party, year) rows, one run per year and party.
+
+    size is the number of lemmas per party, or a (low, high) range to draw it from.
+    Every party draws from lemmas, a mapping to POS tags, with weights of its own
+    unless weights are given. With probability sentence_end a "." follows a lemma.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(lemmas)
+    rows = []
+    for year, parties in partitions:
+        for party in parties:
+            n = size if np.isscalar(size) else int(rng.integers(*size))
+            p = rng.dirichlet(np.ones(len(names))) if weights is None else weights
+            for i in rng.choice(len(names), n, p=p):
+                rows.append((names[i], lemmas[names[i]], names[i], party, year))
+                if sentence_end and rng.random() < sentence_end:
+                    rows.append((".", "$.", ".", party, year))
+    return rows
+
+
+@pytest.fixture
+def synthetic_corpus(make_corpus):
+    """Return a function writing synthetic_rows() with the given parameters to a corpus directory."""
+    def make(name="synthetic.corpus", **parameters):
+        return make_corpus(synthetic_rows(**parameters), name=name)
+    return make
@@ -0,0 +1,124 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+from conftest import synthetic_rows
+from corpus import concat_corpora
+from cube import load_cube
+from index import load_index
+
+
+@pytest.fixture
+def corpus(synthetic_corpus):
+    return synthetic_corpus(size=1500, seed=5, sentence_end=0.1)
+
+
+def direct_collocations(corpus, lemma, party, left, right, year=None):
+    """Compute the collocation table of lemma token by token, with windows clipped to each document."""
+    lemmas = corpus.decode("lemma", corpus.codes["lemma"]).tolist()
+    documents = [doc for doc in corpus.documents if doc["party"] == party and year in (None, doc["year"])]
+    window, totals = set(), Counter()
+    for doc in documents:
+        totals.update(lemmas[doc["start"]:doc["end"]])
+        for position in range(doc["start"], doc["end"]):
+            if lemmas[position] == lemma:
+                window.update(p for p in range(max(position - left, doc["start"]), min(position + right + 1, doc["end"])) if p != position)
+    size = len(window)
+    size_reference = sum(totals.values()) - size
+    table = {}
+    for collocate, freq in Counter(lemmas[p] for p in window).items():
+        freq_reference = totals[collocate] - freq
+        expected = size * totals[collocate] / (size + size_reference)
+        expected_reference = size_reference * totals[collocate] / (size + size_reference)
+        ll = 2 * (freq * math.log(freq / expected) + (freq_reference * math.log(freq_reference / expected_reference) if freq_reference else 0))
+        table[collocate] = {
+            "freq": freq, "size": size, "freq_reference": freq_reference, "size_reference": size_reference,
+            "LogRatio": math.log2((freq / size) / (max(freq_reference, 0.5) / size_reference)),
+            "LogLikelihood": ll, "MI": math.log2(freq / expected), "TScore": (freq - expected) / math.sqrt(freq),
+        }
+    return table
+
+
+@pytest.mark.parametrize("lemma, party, left, right, year", [
+    ("Klima", "AfD", 5, 5, None),
+    ("Europa", "CDU", 2, 7, None),
+    ("sozial", "SPD", 5, 5, "2025"),
+    ("die", "AfD", 3, 0, "2021"),
+])
+def test_collocations_match_a_direct_calculation(corpus, lemma, party, left, right, year):
+    table = analysis.collocations(corpus, lemma, party, left, right, year=year).set_index("lemma")
+    expected = direct_collocations(corpus, lemma, party, left, right, year)
+    assert set(table.index) == set(expected)
+    assert table["freq"].is_monotonic_decreasing
+    for collocate, row in expected.items():
+        for column, value in row.items():
+            assert table.loc[collocate, column] == pytest.approx(value), (collocate, column)
+
+
+def test_collocation_windows_stop_at_document_boundaries(make_corpus):
+    rows = [(lemma, "NN", lemma, party, year) for lemma, party, year in (
+        ("Klima", "AfD", "2021"), ("a", "AfD", "2021"), ("b", "AfD", "2021"), ("Klima", "AfD", "2021"),
+        # Same party, next election: another document
+        ("c", "AfD", "2025"), ("d", "CDU", "2025"), ("Klima", "CDU", "2025"),
+    )]
+    corpus = make_corpus(rows)
+    table = analysis.collocations(corpus, "Klima", "AfD", 5, 5)
+    # The window of the first hit starts at the corpus start, the window of the second ends at its document
+    assert dict(zip(table["lemma"], table["freq"])) == {"Klima": 2, "a": 1, "b": 1}
+    assert table["size"].iloc[0] == 4
+    table = analysis.collocations(corpus, "Klima", "CDU", 5, 5)
+    assert dict(zip(table["lemma"], table["freq"])) == {"d": 1}
+    assert analysis.collocations(corpus, "Unbekannt", "AfD").empty
+
+
+@pytest.fixture
+def elections(make_corpus, tmp_path):
+    """Two federal elections and a European one in between, written as one corpus like import.py does."""
+    federal = make_corpus(synthetic_rows(800, seed=8, sentence_end=0.1), name="btw.corpus")
+    european = make_corpus(synthetic_rows(600, seed=9, partitions=(("2024", ("AfD", "SPD")),)), name="ep.corpus", election="EP")
+    return concat_corpora([federal.path, european.path], str(tmp_path / "all.corpus"))
+
+
+def token_table(corpus):
+    df = corpus.to_dataframe()
+    df["election"] = np.repeat([doc["election"] for doc in corpus.documents], [doc["end"] - doc["start"] for doc in corpus.documents])
+    return df
+
+
+@pytest.mark.parametrize("year, election", [(None, None), ("2025", None), (None, "EP"), ("2024", "EP"), (["2021", "2024"], None)])
+def test_frequencies_count_only_the_selected_partitions(elections, year, election):
+    df = token_table(elections)
+    selected = df
+    if year is not None:
+        selected = selected[selected["year"].isin([int(y) for y in np.atleast_1d(year)])]
+    if election is not None:
+        selected = selected[selected["election"] == election]
+    counts = load_cube(elections)
+    for lemma in ("Klima", ["Klima", "Europa"]):
+        table = analysis.relative_frequencies(counts, lemma, year=year, election=election).set_index("party")
+        assert list(table.index) == sorted(selected["party"].unique())
+        for party, rows in selected.groupby("party"):
+            assert table.loc[party, "count"] == len(rows)
+            assert table.loc[party, "freq"] == rows["lemma"].isin(np.atleast_1d(lemma)).sum()
+        positions = load_index(elections).lookup("Klima", "AfD", year, election)
+        assert positions.tolist() == selected.index[(selected["lemma"] == "Klima") & (selected["party"] == "AfD")].tolist()
+
+
+def test_frequency_series_has_one_row_per_partition(elections):
+    df = token_table(elections)
+    counts = load_cube(elections)
+    series = analysis.frequency_series(counts, "Europa")
+    assert list(zip(series["year"], series["election"], series["party"])) == [
+        ("2021", "BTW", "AfD"), ("2021", "BTW", "CDU"), ("2024", "EP", "AfD"), ("2024", "EP", "SPD"),
+        ("2025", "BTW", "AfD"), ("2025", "BTW", "CDU"), ("2025", "BTW", "SPD")]
+    for row in series.itertuples():
+        partition = df[(df["year"] == int(row.year)) & (df["election"] == row.election) & (df["party"] == row.party)]
+        assert (row.freq, row.count) == ((partition["lemma"] == "Europa").sum(), len(partition))
+        assert row.relfreq == pytest.approx(row.freq / row.count * 1000000)
+    spd = analysis.frequency_series(counts, "Europa", party="SPD")
+    pd.testing.assert_frame_equal(spd, series[series["party"] == "SPD"].reset_index(drop=True))
+    assert analysis.frequency_series(counts, "Unbekannt")["freq"].eq(0).all()
@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import numpy as np
+
+from corpus import ARTIFACT_FILE, Corpus, load_artifact, read_artifact, save_artifact
+from index import load_index
+
+ROWS = [(lemma, "NN", lemma, party, "2025") for party in ("AfD", "CDU") for lemma in ("Klima", "und", "Steuer", "Klima")]
+
+
+def test_artifact_is_built_once_and_then_loaded(make_corpus):
+    corpus = make_corpus(ROWS)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"counts": np.arange(3), "labels": {"a": [1, 2]}}
+
+    first = load_artifact(corpus, "test", build)
+    second = load_artifact(Corpus(corpus.path), "test", build)
+    assert len(builds) == 1
+    assert isinstance(second["counts"], np.memmap)
+    np.testing.assert_array_equal(second["counts"], first["counts"])
+    assert second["labels"] == {"a": [1, 2]}
+    # Another version of the artifact is rebuilt
+    load_artifact(corpus, "test", build, version=2)
+    assert len(builds) == 2
+
+
+def test_artifacts_of_a_rewritten_corpus_are_rebuilt(make_corpus, tmp_path):
+    corpus = make_corpus(ROWS)
+    assert load_index(corpus).count("Klima") == 4
+    # Rewrite the corpus with other lemmas, but put the old index back, as a copy of the old directory would
+    shutil.copytree(corpus.artifact_path("index"), tmp_path / "old_index")
+    rewritten = make_corpus([(token, pos, "Klima" if lemma == "und" else lemma, party, year) for token, pos, lemma, party, year in ROWS])
+    shutil.copytree(tmp_path / "old_index", rewritten.artifact_path("index"))
+    assert rewritten.fingerprint != corpus.fingerprint
+    assert load_index(rewritten).count("Klima") == 6
+
+
+def test_interrupted_save_is_not_loaded(make_corpus):
+    corpus = make_corpus(ROWS)
+    save_artifact(corpus, "test", {"counts": np.arange(3)})
+    assert read_artifact(corpus, "test") is not None
+    os.remove(os.path.join(corpus.artifact_path("test"), ARTIFACT_FILE))
+    assert read_artifact(corpus, "test") is None
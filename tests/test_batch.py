@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+import batch
+from cube import load_cube
+
+
+@pytest.fixture
+def corpus(synthetic_corpus):
+    return synthetic_corpus(size=2000, seed=3, sentence_end=0.05)
+
+
+def test_read_lemmas(tmp_path):
+    path = tmp_path / "lemmas.txt"
+    path.write_text("Klima\n\n# Kommentar\nSteuer  # zweites\nKlima\n", encoding="utf-8")
+    assert batch.read_lemmas(str(path)) == ["Klima", "Steuer"]
+
+
+def test_frequencies_match_the_app(corpus):
+    counts = load_cube(corpus)
+    table = batch.frequency_table(counts, ["Klima", "Unbekannt", "Europa"], year="2025")
+    assert len(table) == 3 * 3
+    assert (table[table["lemma"] == "Unbekannt"]["freq"] == 0).all()
+    for lemma in ("Klima", "Europa"):
+        expected = analysis.relative_frequencies(counts, lemma, year="2025")
+        actual = table[table["lemma"] == lemma].reset_index(drop=True)
+        assert actual["party"].tolist() == expected["party"].tolist()
+        for column in ("freq", "count", "relfreq", "relfreq_centered"):
+            np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].fillna(0).to_numpy(dtype=float))
+
+
+def test_parallel_run_equals_serial_run(corpus):
+    lemmas = ["Europa", "Klima", "Unbekannt", "sozial", "wir", "Freiheit"]
+    serial = batch.run(corpus.path, lemmas, jobs=1)
+    parallel = batch.run(corpus.path, lemmas, jobs=3)
+    for name in ("frequencies", "collocations", "kwic"):
+        pd.testing.assert_frame_equal(serial[name], parallel[name], check_dtype=False)
+    # Lemma file order, then parties alphabetically
+    kwic = serial["kwic"]
+    assert list(pd.unique(kwic["lemma"])) == ["Europa", "Klima", "sozial", "wir", "Freiheit"]
+    assert list(pd.unique(kwic[kwic["lemma"] == "Klima"]["party"])) == ["AfD", "CDU", "SPD"]
+    assert len(serial["collocations"]) > 0
+
+
+def test_kwic_sample_depends_only_on_seed(corpus):
+    first = batch.kwic_rows(corpus, ["Klima", "Europa"], "CDU", max_examples=3, seed=7)
+    alone = batch.kwic_rows(corpus, ["Europa"], "CDU", max_examples=3, seed=7)
+    pd.testing.assert_frame_equal(first[first["lemma"] == "Europa"].reset_index(drop=True), alone)
+    assert not batch.kwic_rows(corpus, ["Europa"], "CDU", max_examples=3, seed=8).equals(alone)
+
+
+@pytest.mark.parametrize("fmt", batch.FORMATS)
+def test_tables_are_written_in_every_format(corpus, tmp_path, fmt):
+    tables = batch.run(corpus.path, ["Klima", "Europa"], jobs=1, election="BTW", year="2025")
+    paths = batch.write_tables(tables, str(tmp_path / "report"), fmt)
+    assert paths == [str(tmp_path / f"report.{name}.{fmt}") for name in ("frequencies", "collocations", "kwic")]
+    if fmt == "tsv":
+        frequencies = pd.read_csv(paths[0], sep="\t")
+    elif fmt == "parquet":
+        frequencies = pd.read_parquet(paths[0])
+    else:
+        with open(paths[0], encoding="utf-8") as f:
+            frequencies = pd.DataFrame(json.load(f))
+    assert frequencies["freq"].tolist() == tables["frequencies"]["freq"].tolist()
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        batch.write_tables({"frequencies": pd.DataFrame()}, str(tmp_path / "report"), "xlsx")
@@ -0,0 +1,58 @@
+import os
+import signal
+
+import numpy as np
+import pytest
+
+import benchmark
+
+
+def test_generated_corpus_has_one_document_per_party(tmp_path):
+    corpus = benchmark.generate_corpus(str(tmp_path / "p3.corpus"), 30_001, 3, block_tokens=4_000)
+    assert len(corpus) == 30_001
+    assert [doc["party"] for doc in corpus.documents] == ["P000", "P001", "P002"]
+    assert sum(doc["end"] - doc["start"] for doc in corpus.documents) == 30_001
+    assert len(corpus.vocab["lemma"]) == benchmark.vocabulary_size(30_001)
+
+
+def test_generated_lemmas_are_zipfian_and_seeded(tmp_path):
+    corpus = benchmark.generate_corpus(str(tmp_path / "a.corpus"), 50_000, 1)
+    again = benchmark.generate_corpus(str(tmp_path / "b.corpus"), 50_000, 1)
+    assert np.array_equal(corpus.codes["lemma"], again.codes["lemma"])
+    counts = np.bincount(corpus.codes["lemma"], minlength=len(corpus.vocab["lemma"]))
+    assert counts[0] == counts.max()
+    assert counts[0] > 10 * counts[100]
+    # Every lemma has one POS tag
+    pos = corpus.codes["pos"]
+    assert all(len(np.unique(pos[corpus.codes["lemma"] == lemma])) == 1 for lemma in range(10))
+
+
+def test_compare_reports_only_real_regressions():
+    baseline = {"scenarios": {"p1_t100": {"kwic_r1": 0.010, "load": 0.0005, "write_peak_rss_mb": 100.0, "cube_build": 1.0}}}
+    results = {"scenarios": {
+        "p1_t100": {"kwic_r1": 0.020, "load": 0.0015, "write_peak_rss_mb": 126.0, "cube_build": 1.2, "similar_r1": 5.0},
+        "p7_t100": {"kwic_r1": 1.0},
+    }}
+    regressions = benchmark.compare(results, baseline, max_regression=0.25)
+    # load is slower by less than MIN_DELTA, cube_build within 25 %, and metrics without a baseline are skipped
+    assert regressions == [("p1_t100", "kwic_r1", 0.010, 0.020), ("p1_t100", "write_peak_rss_mb", 100.0, 126.0)]
+    assert benchmark.compare(results, baseline, max_regression=0.25, min_delta=0) == [
+        ("p1_t100", "kwic_r1", 0.010, 0.020), ("p1_t100", "load", 0.0005, 0.0015), ("p1_t100", "write_peak_rss_mb", 100.0, 126.0)]
+    assert benchmark.compare(results, baseline, max_regression=1.5) == []
+
+
+def test_scenario_reports_every_metric(tmp_path):
+    metrics = benchmark.run_scenario(2, 20_000, str(tmp_path), repeat=1)
+    assert metrics["write_peak_rss_mb"] > 0
+    for name in ("write", "index_build", "cube_build", "load", "embeddings_build"):
+        assert metrics[name] >= 0
+    for rank in benchmark.QUERY_RANKS:
+        assert f"kwic_r{rank}" in metrics and f"similar_r{rank}" in metrics
+
+
+def test_killed_writer_is_reported(tmp_path, monkeypatch):
+    def killed(path, n_tokens, n_parties, queue):
+        os.kill(os.getpid(), signal.SIGKILL)
+    monkeypatch.setattr(benchmark, "_write_in_child", killed)
+    with pytest.raises(RuntimeError, match="exited with code -9"):
+        benchmark.measure_write(str(tmp_path / "killed.corpus"), 1000, 1)
@@ -0,0 +1,44 @@
+import os
+
+from corpus import COLUMNS, Corpus, load_corpus, write_tsv
+from index import load_index
+
+
+def write_rows(path, lemmas, mtime=None):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\t".join(COLUMNS) + "\n")
+        for lemma in lemmas:
+            f.write(f"{lemma}\tNN\t{lemma}\tAfD\t2025\n")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_corpus_is_converted_again_when_its_tsv_changes(tmp_path):
+    tsv, path = str(tmp_path / "btw.tsv"), str(tmp_path / "btw.corpus")
+    write_rows(tsv, ["Klima", "und", "Klima"], mtime=10**18)
+    corpus = load_corpus(path, source_tsv=tsv)
+    assert load_index(corpus).count("Klima") == 2
+    assert load_corpus(path, source_tsv=tsv).meta["id"] == corpus.meta["id"]
+    # Same size, later modification time
+    write_rows(tsv, ["Klima", "und", "Krise"], mtime=10**18 + 1)
+    converted = load_corpus(path, source_tsv=tsv)
+    assert converted.meta["id"] != corpus.meta["id"]
+    assert load_index(converted).count("Klima") == 1
+    assert load_index(converted).count("Krise") == 1
+
+
+def test_exported_tsv_is_recorded(make_corpus, tmp_path):
+    corpus = make_corpus([("Klima", "NN", "Klima", "AfD", "2025")], name="btw.corpus")
+    tsv = str(tmp_path / "btw.tsv")
+    # Without a record the corpus is kept, even if the TSV differs
+    write_rows(tsv, ["Krise"])
+    assert load_corpus(corpus.path, source_tsv=tsv).meta["id"] == corpus.meta["id"]
+    write_tsv(corpus, tsv)
+    write_tsv(corpus, str(tmp_path / "copy.tsv"))
+    assert Corpus(corpus.path).fingerprint == corpus.fingerprint
+    assert load_corpus(corpus.path, source_tsv=tsv).meta["id"] == corpus.meta["id"]
+    # Exporting another file does not hide an edit of this one
+    write_rows(tsv, ["Krise", "Krise"])
+    converted = load_corpus(corpus.path, source_tsv=tsv)
+    assert converted.meta["id"] != corpus.meta["id"]
+    assert converted.vocab["lemma"] == ["Krise"]
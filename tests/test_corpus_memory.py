@@ -0,0 +1,77 @@
+"""Peak memory of writing a corpus and importing a manifesto must not grow with its length.
+
+Each run happens in a fresh interpreter, which reports its own peak RSS, so the
+numbers of one run do not leak into the next.
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+
+ROWS = 200_000
+PAGES = 40
+GROWTH_MB = 25  # allowed peak RSS difference between a run and one ten times as long
+
+WRITER_SCRIPT = """
+import resource, sys
+import numpy as np
+from corpus import CorpusWriter
+rows, path = int(sys.argv[1]), sys.argv[2]
+words = [f"Wort{i}" for i in range(1000)]
+rng = np.random.default_rng(0)
+with CorpusWriter(path) as writer:
+    for start in range(0, rows, 10_000):
+        ids = rng.integers(0, len(words), min(10_000, rows - start))
+        tokens = [words[i] for i in ids]
+        writer.add_columns({"token": tokens, "pos": ["NN"] * len(tokens), "lemma": tokens,
+                            "party": ["A"] * len(tokens), "year": ["2025"] * len(tokens)})
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+"""
+
+IMPORT_SCRIPT = """
+import importlib, resource, sys
+import spacy
+importer = importlib.import_module("import")
+nlp = spacy.blank("de")
+nlp.add_pipe("sentencizer")
+importer.nlp = nlp  # stands in for the German model
+program = {"Party": "A", "Year": 2025, "URL": "https://example.org/a.pdf"}
+importer.process_program(program, sys.argv[1], sys.argv[2])
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+"""
+
+
+def peak_rss_mb(script, *args):
+    result = subprocess.run([sys.executable, "-c", script, *map(str, args)], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().splitlines()[-1])
+
+
+def write_pdf(path, pages):
+    fitz = pytest.importorskip("fitz")
+    sentence = "Wir fordern mehr Klimaschutz und soziale Gerechtigkeit für alle Menschen im Land. "
+    with fitz.open() as pdf:
+        for _ in range(pages):
+            page = pdf.new_page()
+            page.insert_textbox(page.rect + (36, 36, -36, -36), sentence * 40, fontsize=8)
+        pdf.save(str(path))
+
+
+def test_corpus_writer_memory_is_bounded(tmp_path):
+    small = peak_rss_mb(WRITER_SCRIPT, ROWS, tmp_path / "small.corpus")
+    large = peak_rss_mb(WRITER_SCRIPT, 10 * ROWS, tmp_path / "large.corpus")
+    assert large - small < GROWTH_MB, f"peak RSS grew from {small} MB to {large} MB"
+
+
+def test_process_program_memory_is_bounded(tmp_path):
+    pytest.importorskip("spacy")
+    write_pdf(tmp_path / "small.pdf", PAGES)
+    write_pdf(tmp_path / "large.pdf", 10 * PAGES)
+    small = peak_rss_mb(IMPORT_SCRIPT, tmp_path / "small.pdf", tmp_path / "small.corpus")
+    large = peak_rss_mb(IMPORT_SCRIPT, tmp_path / "large.pdf", tmp_path / "large.corpus")
+    assert large - small < GROWTH_MB, f"peak RSS grew from {small} MB to {large} MB"
+    with open(tmp_path / "large.corpus" / "meta.json", encoding="utf-8") as f:
+        assert json.load(f)["n_tokens"] > 10 * ROWS // 20
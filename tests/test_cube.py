@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from conftest import synthetic_rows
+from cube import HEATMAP_MAX_ROWS, HEATMAP_POS, load_cube
+
+# Enough lemmas per tab to cut the heatmaps, and the lemmas the heatmaps leave out
+LEMMAS = {**{f"Nomen{i}": "NN" for i in range(40)}, **{f"adj{i}": ("ADJA", "ADJD")[i % 2] for i in range(30)},
+          **{f"verb{i}": ("VVFIN", "VVINF", "VVPP")[i % 3] for i in range(30)}, "Freie": "ADJA", "Demokrat": "NN"}
+
+
+@pytest.fixture
+def corpus(make_corpus):
+    rows = synthetic_rows(3000, seed=6, lemmas=LEMMAS)
+    # One lemma with two tags of a tab, and one with a tag of another tab
+    rows += [("adj0", "ADJD", "adj0", "SPD", "2025"), ("Nomen0", "VVFIN", "Nomen0", "SPD", "2025")] * 20
+    return make_corpus(rows)
+
+
+def pandas_heatmap(df, tab, number_of_rows):
+    """The heatmap of heatmap.py before the cube: groupby, transform and pivot over the token table."""
+    df_filtered = df[df.pos.str.contains(HEATMAP_POS[tab])]
+    df_grouped = df_filtered.groupby(by=["lemma", "party"]).size().reset_index(name="freq")
+    df_filtered = df_grouped[~df_grouped["lemma"].isin(["Freie", "Demokrat"])].copy()
+    df_filtered["rel_freq"] = df_filtered.groupby("party")["freq"].transform(lambda x: x / x.sum() * 100)
+    top_lemmas_list = df_filtered.groupby("lemma")["rel_freq"].sum().nlargest(number_of_rows).index
+    top_df = df_filtered[df_filtered["lemma"].isin(top_lemmas_list)]
+    matrix = top_df.pivot_table(index="lemma", columns="party", values="rel_freq").fillna(0)
+    matrix_table = top_df.pivot_table(index="lemma", columns="party", values="freq").fillna(0)
+    return matrix, matrix_table
+
+
+@pytest.mark.parametrize("tab", list(HEATMAP_POS))
+@pytest.mark.parametrize("number_of_rows", [10, 25, HEATMAP_MAX_ROWS])
+def test_heatmap_equals_the_pandas_groupby(corpus, tab, number_of_rows):
+    counts = load_cube(corpus)
+    df = corpus.to_dataframe()
+    for election, year in corpus.elections:
+        matrix, matrix_table = counts.heatmap(tab, number_of_rows, election, year)
+        expected, expected_table = pandas_heatmap(df[df["year"] == int(year)], tab, number_of_rows)
+        pd.testing.assert_frame_equal(matrix, expected, check_dtype=False)
+        pd.testing.assert_frame_equal(matrix_table, expected_table, check_dtype=False)
+
+
+def test_heatmap_defaults_to_the_latest_election(corpus):
+    counts = load_cube(corpus)
+    latest = counts.heatmap("Verben", 10, "BTW", "2025")
+    for frame, expected in zip(counts.heatmap("Verben", 10), latest):
+        pd.testing.assert_frame_equal(frame, expected)
+    with pytest.raises(ValueError, match="At most"):
+        counts.heatmap("Verben", HEATMAP_MAX_ROWS + 1)
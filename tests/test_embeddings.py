@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+import embeddings
+from conftest import synthetic_rows
+
+# In each party one other lemma is used exactly like "Klima": they share all their neighbours
+TOPICS = {"AfD": ("Lüge", [f"a{i}" for i in range(12)]), "SPD": ("Umwelt", [f"s{i}" for i in range(12)])}
+
+
+@pytest.fixture
+def corpus(make_corpus):
+    rng = np.random.default_rng(4)
+    rows = []
+    for party, (twin, words) in TOPICS.items():
+        drawn = synthetic_rows(600 * 4, seed=int(rng.integers(1 << 16)), lemmas=dict.fromkeys(words, "NN"),
+                               partitions=(("2025", (party,)),), weights=np.full(len(words), 1 / len(words)))
+        for start in range(0, len(drawn), 4):
+            sentence = drawn[start:start + 4]
+            lemma = "Klima" if rng.random() < 0.5 else twin
+            sentence.insert(int(rng.integers(5)), (lemma, "NN", lemma, party, "2025"))
+            rows += sentence + [(".", "$.", ".", party, "2025")]
+    return make_corpus(rows)
+
+
+def test_vectors_are_unit_length_and_reproducible(corpus):
+    first = embeddings.build_embeddings(corpus, save=False)
+    second = embeddings.build_embeddings(corpus, save=False)
+    assert np.array_equal(first.vectors, second.vectors)
+    assert first.vectors.shape[0] == 1 + len(corpus.vocab["party"])
+    for party in [None, *first.parties]:
+        vectors, freq = first.space(party)
+        norms = np.linalg.norm(vectors[freq > 0], axis=1)
+        np.testing.assert_allclose(norms, 1, atol=1e-5)
+    assert "." not in corpus.decode("lemma", first.lemma)
+
+
+def test_similar_finds_the_lemma_used_alike_in_each_party(corpus):
+    vectors = embeddings.build_embeddings(corpus, save=False)
+    assert vectors.parties == ["AfD", "SPD"]
+    for party, (twin, _) in TOPICS.items():
+        table = vectors.similar("Klima", party, top=3)
+        assert table["lemma"].iloc[0] == twin
+        assert table["similarity"].is_monotonic_decreasing
+        assert (table["freq"] >= embeddings.MIN_COUNT).all()
+        # Lemmas of the other party do not occur in this one
+        assert twin not in set(vectors.similar("Klima", "SPD" if party == "AfD" else "AfD")["lemma"])
+    assert len(vectors.similar("Klima", top=50)) == len(vectors.lemma) - 1
+    assert vectors.similar("Unbekannt").empty
+
+
+def test_shift_compares_parties_with_the_whole_corpus(corpus):
+    vectors = embeddings.build_embeddings(corpus, save=False)
+    table = vectors.shift("Klima", top=2)
+    assert table["party"].tolist() == ["AfD", "SPD"]
+    assert table["similarity"].between(-1.0001, 1.0001).all()
+    assert table["neighbours"].str.split(", ").map(len).tolist() == [2, 2]
+    # Lemmas of one party only are not compared
+    assert vectors.shift("Umwelt")["party"].tolist() == ["SPD"]
+    matrix = vectors.party_similarity("Klima")
+    assert list(matrix.index) == ["AfD", "SPD"]
+    np.testing.assert_allclose(matrix.to_numpy(), matrix.to_numpy().T, atol=1e-6)
+    np.testing.assert_allclose(np.diag(matrix.to_numpy()), 1, atol=1e-5)
+
+
+def test_stored_embeddings_are_loaded(corpus):
+    built = embeddings.build_embeddings(corpus)
+    corpus.cache.clear()
+    loaded = embeddings.load_embeddings(corpus)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert np.array_equal(loaded.vectors, built.vectors)
+    assert loaded.similar("Klima", "AfD").equals(built.similar("Klima", "AfD"))
+
+
+def test_truncated_svd_matches_exact_svd():
+    rng = np.random.default_rng(5)
+    low_rank = rng.standard_normal((300, 8)) @ rng.standard_normal((8, 200))
+    u, s = embeddings.truncated_svd(sparse.csr_matrix(low_rank), 5)
+    _, exact, _ = np.linalg.svd(low_rank)
+    np.testing.assert_allclose(s, exact[:5], rtol=1e-6)
+    np.testing.assert_allclose(u.T @ u, np.eye(5), atol=1e-8)
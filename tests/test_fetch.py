@@ -0,0 +1,117 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from fetch import PdfFetcher
+
+PDF = b"%PDF-1.4 test manifesto"
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve PDF with an ETag, answer 304 to a matching If-None-Match and 403 under /forbidden."""
+
+    requests_seen = []
+    status = 200
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/forbidden"):
+            self.send_response(403)
+            self.end_headers()
+        elif self.status != 200:
+            self.send_response(self.status)
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(PDF)))
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.requests_seen = []
+    Handler.status = 200
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path="/programm.pdf"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def fetcher(tmp_path, **kwargs):
+    # A plain session: no retries and no random user agent
+    return PdfFetcher(str(tmp_path / "cache"), session=requests.Session(), timeout=5, **kwargs)
+
+
+def test_download_is_cached(server, tmp_path):
+    result = fetcher(tmp_path).fetch(url(server))
+    assert not result.from_cache
+    with open(result.path, "rb") as f:
+        assert f.read() == PDF
+    # A new fetcher reads the index written by the first one
+    assert fetcher(tmp_path).cached(url(server)) == result._replace(from_cache=True)
+
+
+def test_unchanged_pdf_is_revalidated(server, tmp_path):
+    fetcher(tmp_path).fetch(url(server))
+    result = fetcher(tmp_path).fetch(url(server))
+    assert result.from_cache
+    assert Handler.requests_seen == [("/programm.pdf", None), ("/programm.pdf", ETAG)]
+
+
+def test_offline_reads_only_the_cache(server, tmp_path):
+    fetcher(tmp_path).fetch(url(server))
+    assert fetcher(tmp_path, offline=True).fetch(url(server)).from_cache
+    with pytest.raises(FileNotFoundError):
+        fetcher(tmp_path, offline=True).fetch(url(server, "/andere.pdf"))
+    assert len(Handler.requests_seen) == 1
+
+
+def test_server_down_falls_back_to_cache(server, tmp_path):
+    address = url(server)
+    fetcher(tmp_path).fetch(address)
+    server.shutdown()
+    server.server_close()
+    assert fetcher(tmp_path).fetch(address).from_cache
+    with pytest.raises(requests.ConnectionError):
+        fetcher(tmp_path).fetch(address.replace("programm", "andere"))
+
+
+def test_server_error_falls_back_to_cache(server, tmp_path):
+    fetcher(tmp_path).fetch(url(server))
+    Handler.status = 500
+    assert fetcher(tmp_path).fetch(url(server)).from_cache
+    with pytest.raises(requests.HTTPError):
+        fetcher(tmp_path).fetch(url(server, "/andere.pdf"))
+
+
+def test_forbidden_is_reported(server, tmp_path):
+    address = url(server, "/forbidden.pdf")
+    with pytest.raises(requests.HTTPError, match="Access denied"):
+        fetcher(tmp_path).fetch(address)
+    results = fetcher(tmp_path).fetch_all([address, url(server)])
+    assert isinstance(results[address], Exception)
+    assert not results[url(server)].from_cache
+
+
+def test_forbidden_falls_back_to_cache(server, tmp_path):
+    fetcher(tmp_path).fetch(url(server))
+    Handler.status = 403
+    assert fetcher(tmp_path).fetch(url(server)).from_cache
@@ -0,0 +1,63 @@
+import importlib
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_DIR
+
+importer = importlib.import_module("import")
+
+# Metrics are switched on per process, so the worker test runs in its own interpreter
+WORKER_SCRIPT = """
+import importlib, sys
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+importer = importlib.import_module("import")
+metrics.enable(sys.argv[1], sys.argv[2])
+program = {"Party": "A", "Year": 2025, "URL": "https://example.org/a.pdf"}
+with ProcessPoolExecutor(max_workers=1) as executor:
+    failed = executor.submit(importer.process_program, program, sys.argv[3], sys.argv[4])
+    print(type(failed.exception()).__name__)
+    print(len(executor.submit(metrics.drain).result()))
+"""
+
+
+def pages_of(chunks):
+    return [(chunk, [page for _, page in pages]) for chunk, pages in chunks]
+
+
+def test_chunks_run_across_pages():
+    chunks = list(importer.iter_chunks([(1, "Wir fordern"), (2, "mehr Klimaschutz."), (3, "   "), (4, "Und Wohnungen.")], chunk_size=100))
+    assert pages_of(chunks) == [("Wir fordern mehr Klimaschutz. Und Wohnungen.", [1, 2, 4])]
+    assert chunks[0][1] == [(0, 1), (12, 2), (30, 4)]
+
+
+def test_chunk_cut_keeps_page_of_the_rest():
+    chunks = list(importer.iter_chunks([(1, "Erster Satz. Zweiter"), (2, "Satz geht weiter.")], chunk_size=15))
+    assert pages_of(chunks) == [("Erster Satz.", [1]), ("Zweiter Satz", [1, 2]), ("geht weiter.", [2])]
+
+
+def test_annotated_tokens_know_their_page():
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("de")
+    nlp.add_pipe("sentencizer")
+    importer.nlp = nlp
+    try:
+        chunks = importer.iter_chunks([(3, "Wir fordern"), (4, "mehr Klimaschutz.")])
+        [(rows, source)] = importer.annotate_chunks(chunks, "A", 2025)
+    finally:
+        importer.nlp = None
+    assert [row[0] for row in rows] == ["Wir", "fordern", "mehr", "Klimaschutz", "."]
+    assert source["page"] == [3, 4]
+    assert source["page_start"] == [0, 2]
+
+
+def test_failed_worker_does_not_pass_on_its_metrics(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT, tmp_path / "metrics.jsonl", tmp_path / "metrics.prom",
+         tmp_path / "missing.pdf", tmp_path / "a.corpus"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    error, left = result.stdout.splitlines()[-2:]
+    assert error != "NoneType"
+    assert left == "0"
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import keyness
+
+LEMMAS = {"Klima": "NN", "Steuer": "NN", "sozial": "ADJA", "schnell": "ADJD", "fordern": "VVFIN", "die": "ART"}
+
+
+@pytest.fixture
+def corpus(synthetic_corpus):
+    return synthetic_corpus(size=(200, 400), seed=2, lemmas=LEMMAS)
+
+
+def direct(df, sizes, party, lemma):
+    """Compute the keyness measures of one cell straight from the token table; sizes are all tokens per party."""
+    size = sizes[party]
+    size_reference = sizes.sum() - size
+    freq = ((df["party"] == party) & (df["lemma"] == lemma)).sum()
+    freq_reference = ((df["party"] != party) & (df["lemma"] == lemma)).sum()
+    total = freq + freq_reference
+    expected = size * total / (size + size_reference)
+    expected_reference = size_reference * total / (size + size_reference)
+    ll = 2 * ((freq * math.log(freq / expected) if freq else 0)
+              + (freq_reference * math.log(freq_reference / expected_reference) if freq_reference else 0))
+    # Zero counts are smoothed in LogRatio only
+    ratio = (max(freq, 0.5) / size) / (max(freq_reference, 0.5) / size_reference)
+    diff = (freq / size) / (max(freq_reference, 0.5) / size_reference)
+    return {"freq": freq, "size": size, "freq_reference": freq_reference, "size_reference": size_reference,
+            "LogLikelihood": ll, "LogRatio": math.log2(ratio), "%DIFF": (diff - 1) * 100}
+
+
+@pytest.mark.parametrize("tab", list(keyness.KEYNESS_POS))
+def test_keyness_matches_direct_computation(corpus, tab):
+    df = corpus.to_dataframe()
+    df = df[df["year"] == 2025]
+    # The POS filter applies to the counts, not to the text sizes
+    sizes = df["party"].value_counts()
+    pattern = keyness.KEYNESS_POS[tab]
+    if pattern is not None:
+        df = df[df["pos"].str.contains(pattern)]
+    table = keyness.load_keyness(corpus, tab, "BTW", "2025")
+    used = set(df.groupby(["party", "lemma"]).size().index)
+    frequent = [lemma for lemma, n in df["lemma"].value_counts().items() if n >= keyness.MIN_TOTAL_FREQ]
+    expected = used | {(party, lemma) for party in sizes.index for lemma in frequent}
+    assert sorted(zip(table["party"], table["lemma"])) == sorted(expected)
+    for row in table.itertuples(index=False):
+        values = direct(df, sizes, row.party, row.lemma)
+        actual = dict(zip(table.columns, row))
+        for column, value in values.items():
+            assert actual[column] == pytest.approx(value), (row.party, row.lemma, column)
+
+
+def test_table_is_sorted_by_party_and_log_likelihood(corpus):
+    table = keyness.load_keyness(corpus)
+    assert list(pd.unique(table["party"])) == ["AfD", "CDU", "SPD"]
+    for _, rows in table.groupby("party"):
+        assert rows["LogLikelihood"].is_monotonic_decreasing
+
+
+def test_stored_tables_are_reused(corpus):
+    tables = keyness.build_keyness(corpus)
+    assert set(tables) == {(tab, "BTW", year) for tab in keyness.KEYNESS_POS for year in ("2021", "2025")}
+    corpus.cache.clear()
+    table = keyness.load_keyness(corpus, "Substantive", "BTW", "2021")
+    assert set(table["lemma"]) == {"Klima", "Steuer"}
+    assert set(table["party"]) == {"AfD", "CDU"}
+
+
+def test_lemmas_a_party_never_uses_are_scored_as_under_use(make_corpus):
+    rows = [("Atomkraft", "NN", "Atomkraft", "AfD", "2025")] * 10 + [("Rarität", "NN", "Rarität", "AfD", "2025")] * 2
+    rows += [("die", "ART", "die", party, "2025") for party in ("AfD", "SPD") for _ in range(50)]
+    table = keyness.load_keyness(make_corpus(rows)).set_index(["party", "lemma"])
+    never = table.loc[("SPD", "Atomkraft")]
+    assert never["freq"] == 0 and never["freq_reference"] == 10
+    assert never["LogRatio"] == pytest.approx(math.log2((0.5 / 50) / (10 / 62)))
+    assert never["%DIFF"] == -100
+    assert never["LogLikelihood"] > 3.84
+    # Lemmas below MIN_TOTAL_FREQ are only scored where they occur
+    assert ("AfD", "Rarität") in table.index
+    assert ("SPD", "Rarität") not in table.index
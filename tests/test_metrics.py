@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from collections import defaultdict
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch, tmp_path):
+    """Reset the module state and keep enable() from leaking into the environment of other tests."""
+    for name in ("BTW_METRICS", "BTW_METRICS_LOG", "BTW_METRICS_PROM", "BTW_METRICS_OWNER"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setattr(metrics, "_enabled", False)
+    monkeypatch.setattr(metrics, "_owner_pid", os.getpid())
+    monkeypatch.setattr(metrics, "_log_path", str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(metrics, "_prom_path", str(tmp_path / "metrics.prom"))
+    monkeypatch.setattr(metrics, "_records", [])
+    monkeypatch.setattr(metrics, "_totals", defaultdict(lambda: {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": 0}))
+    monkeypatch.setattr(metrics, "_histograms", defaultdict(lambda: [0] * (len(metrics.QUERY_BUCKETS) + 1)))
+    return metrics._log_path, metrics._prom_path
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_disabled_metrics_record_nothing(fresh_metrics):
+    log_path, prom_path = fresh_metrics
+    items = [1, 2, 3]
+    assert metrics.stage("annotate") is metrics.NULL_STAGE
+    assert metrics.iterate("extract", items) is items
+    with metrics.stage("annotate"):
+        pass
+    metrics.flush()
+    assert not os.path.exists(log_path) and not os.path.exists(prom_path)
+    assert dict(metrics._totals) == {}
+
+
+def test_nested_stages_are_timed_exclusively(fresh_metrics):
+    log_path, prom_path = fresh_metrics
+    metrics.enable(log_path, prom_path)
+    with metrics.stage("write", party="AfD"):
+        time.sleep(0.05)
+        with metrics.stage("sentiment"):
+            time.sleep(0.1)
+    inner, outer = read_log(log_path)
+    assert (inner["stage"], outer["stage"], outer["party"]) == ("sentiment", "write", "AfD")
+    assert inner["wall_s"] >= 0.1
+    assert 0.05 <= outer["wall_s"] < 0.1
+    metrics.flush()
+    with open(prom_path, encoding="utf-8") as f:
+        text = f.read()
+    assert 'btw_stage_calls_total{kind="import",stage="write"} 1' in text
+
+
+def test_iterate_records_one_stage_for_all_items(fresh_metrics):
+    log_path, prom_path = fresh_metrics
+    metrics.enable(log_path, prom_path)
+
+    def slow():
+        for i in range(3):
+            time.sleep(0.02)
+            yield i
+
+    for _ in metrics.iterate("extract", slow()):
+        # Work done by the consumer is not part of the stage
+        time.sleep(0.05)
+    [entry] = read_log(log_path)
+    assert entry["stage"] == "extract"
+    assert 0.06 <= entry["wall_s"] < 0.15
+
+
+def test_query_latencies_fill_the_histogram(fresh_metrics):
+    log_path, prom_path = fresh_metrics
+    metrics.enable(log_path, prom_path)
+    for _ in range(2):
+        with metrics.stage("kwic", kind="query", lemma="Klima"):
+            pass
+    metrics.flush()
+    with open(prom_path, encoding="utf-8") as f:
+        text = f.read()
+    assert 'btw_query_duration_seconds_bucket{query="kwic",le="0.001"} 2' in text
+    assert 'btw_query_duration_seconds_count{query="kwic"} 2' in text
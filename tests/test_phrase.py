@@ -0,0 +1,88 @@
+import re
+
+import numpy as np
+import pytest
+
+import phrase
+
+from conftest import synthetic_rows
+
+LEMMAS = {"sozial": "ADJA", "Gerechtigkeit": "NN", "erneuerbar": "ADJA", "Energie": "NN", "Energiewende": "NN",
+          "neu": "ADJA", "die": "ART", "und": "KON"}
+
+
+@pytest.fixture
+def corpus(make_corpus):
+    rng = np.random.default_rng(1)
+    rows = []
+    for party in ("AfD", "CDU", "SPD"):
+        rows += synthetic_rows(3000, seed=int(rng.integers(1 << 16)), lemmas=LEMMAS, partitions=(("2025", (party,)),),
+                               weights=[0.15, 0.15, 0.15, 0.15, 0.05, 0.1, 0.15, 0.1])
+        # A run longer than the suffix array depth
+        rows += [("die", "ART", "die", party, "2025")] * 12
+    # Half of the adjectives are inflected, so word forms and lemmas differ
+    rows = [(token + "en" if pos == "ADJA" and rng.random() < 0.5 else token, pos, lemma, party, year)
+            for token, pos, lemma, party, year in rows]
+    return make_corpus(rows)
+
+
+def brute_force(corpus, terms, party=None):
+    """Return the start positions of a list of {column: regex} terms by testing every position."""
+    df = corpus.to_dataframe()
+    columns = {column: df[column].tolist() for column in ("token", "pos", "lemma", "party")}
+    starts = []
+    for start in range(len(df) - len(terms) + 1):
+        if party is not None and columns["party"][start] != party:
+            continue
+        if len({columns["party"][start + i] for i in range(len(terms))}) > 1:
+            continue  # crosses a document boundary
+        if all(re.fullmatch(pattern, columns[column][start + i]) for i, term in enumerate(terms) for column, pattern in term.items()):
+            starts.append(start)
+    return starts
+
+
+@pytest.mark.parametrize("query, terms", [
+    ("sozial Gerechtigkeit", [{"lemma": "sozial"}, {"lemma": "Gerechtigkeit"}]),
+    ("erneuerbar Energie*", [{"lemma": "erneuerbar"}, {"lemma": "Energie.*"}]),
+    ('"sozialen" Gerechtigkeit', [{"token": "sozialen"}, {"lemma": "Gerechtigkeit"}]),
+    ('[pos="ADJ.*"] [lemma="Energie"]', [{"pos": "ADJ.*"}, {"lemma": "Energie"}]),
+    ('[pos="ADJA" & lemma="neu"] [] Energie', [{"pos": "ADJA", "lemma": "neu"}, {}, {"lemma": "Energie"}]),
+    ("die sozial Gerechtigkeit und die", [{"lemma": "die"}, {"lemma": "sozial"}, {"lemma": "Gerechtigkeit"}, {"lemma": "und"}, {"lemma": "die"}]),
+    ("die die die die die die die die die", [{"lemma": "die"}] * 9),
+])
+def test_find_matches_brute_force(corpus, query, terms):
+    positions, length = phrase.find(corpus, query)
+    assert length == len(terms)
+    assert positions.tolist() == brute_force(corpus, terms)
+    positions, _ = phrase.find(corpus, query, party="CDU")
+    assert positions.tolist() == brute_force(corpus, terms, party="CDU")
+
+
+def test_matches_do_not_cross_documents(make_corpus):
+    rows = [("sozial", "ADJA", "sozial", "AfD", "2025"), ("Gerechtigkeit", "NN", "Gerechtigkeit", "CDU", "2025")]
+    positions, _ = phrase.find(make_corpus(rows), "sozial Gerechtigkeit")
+    assert len(positions) == 0
+
+
+def test_suffix_array_is_sorted(corpus):
+    suffixes = phrase.build_suffix_array(corpus, save=False).suffixes
+    codes = corpus.codes["lemma"].astype(np.int64)
+    assert sorted(range(len(codes)), key=lambda i: tuple(codes[i:i + phrase.MAX_PHRASE_LENGTH])) == list(suffixes)
+
+
+def test_unknown_lemma_has_no_matches(corpus):
+    positions, _ = phrase.find(corpus, "sozial Klimaschutz")
+    assert len(positions) == 0
+
+
+@pytest.mark.parametrize("query", ["[]", "[]  []", '[foo="x"] Energie', '[lemma=x]'])
+def test_invalid_queries_are_rejected(corpus, query):
+    with pytest.raises(ValueError):
+        phrase.find(corpus, query)
+
+
+def test_frequency_table_counts_matches_per_party(corpus):
+    table = phrase.frequency_table(corpus, "sozial Gerechtigkeit").set_index("party")
+    for party in ("AfD", "CDU", "SPD"):
+        assert table.loc[party, "freq"] == len(brute_force(corpus, [{"lemma": "sozial"}, {"lemma": "Gerechtigkeit"}], party))
+        assert table.loc[party, "count"] == 3012
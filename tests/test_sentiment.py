@@ -0,0 +1,75 @@
+import pytest
+
+import sentiment
+from corpus import Corpus, CorpusWriter
+
+SENTIWS = {
+    "Positive": "Gut|ADJX\t0.5\tgute,guten\nFreiheit|NN\t0.25\n",
+    "Negative": "Krise|NN\t-0.5\tKrisen\nSchlecht|ADJX\t-0.75\n",
+}
+
+
+@pytest.fixture
+def sentiws(tmp_path):
+    files = []
+    for polarity, content in SENTIWS.items():
+        path = tmp_path / f"SentiWS_v2.0_{polarity}.txt"
+        path.write_text(content, encoding="utf-8")
+        files.append(str(path))
+    return files
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Two manifestos with a source layer: AfD on pages 1 and 2, CDU on page 7."""
+    path = str(tmp_path / "sentiment.corpus")
+    with CorpusWriter(path) as writer:
+        for party, lemmas, page_start, pages in (
+            ("AfD", ["Krise", "und", "Krise", "gut", "Freiheit", "schlecht"], [0, 3], [1, 2]),
+            ("CDU", ["gut", "gut", "und", "Krise"], [0], [7]),
+        ):
+            writer.add_rows((lemma, "NN", lemma, party, "2025") for lemma in lemmas)
+            text = " ".join(lemmas)
+            starts = [len(" ".join(lemmas[:i])) + (i > 0) for i in range(len(lemmas))]
+            writer.add_source(text, starts, [start + len(lemma) for start, lemma in zip(starts, lemmas)],
+                              page=pages, page_start=page_start)
+    return Corpus(path)
+
+
+def test_scores_of_a_known_document(corpus, sentiws):
+    sentiments, curves = sentiment.score_corpus(corpus, sentiment.load_sentiws(sentiws), window=4)
+    assert sentiments == [
+        {"Party": "AfD", "Year": "2025", "Positive": 2, "Negative": 3, "Neutral": 1, "PositiveWeight": 0.75,
+         "NegativeWeight": -1.75, "ScorePer1000": pytest.approx(-1 / 6 * 1000), "Election": "BTW"},
+        {"Party": "CDU", "Year": "2025", "Positive": 2, "Negative": 1, "Neutral": 1, "PositiveWeight": 1.0,
+         "NegativeWeight": -0.5, "ScorePer1000": pytest.approx(125), "Election": "BTW"},
+    ]
+    # Windows of 4 tokens restart at every document
+    assert [(row["Party"], row["Window"], row["Start"], row["End"]) for row in curves] == [
+        ("AfD", 0, 0, 4), ("AfD", 1, 4, 6), ("CDU", 0, 6, 10)]
+    assert [(row["Positive"], row["Negative"], row["Score"]) for row in curves] == [
+        (0.5, -1.0, -125), (0.25, -0.75, -250), (1.0, -0.5, 125)]
+
+
+def test_sections_follow_pdf_pages(corpus, sentiws):
+    sections = sentiment.score_sections(corpus, sentiment.load_sentiws(sentiws))
+    assert [(row["Party"], row["Section"], row["Page"], row["Start"], row["End"]) for row in sections] == [
+        ("AfD", 0, 1, 0, 3), ("AfD", 1, 2, 3, 6), ("CDU", 0, 7, 6, 10)]
+    assert [(row["Positive"], row["Negative"]) for row in sections] == [(0, -1.0), (0.75, -0.75), (1.0, -0.5)]
+    assert [row["Score"] for row in sections] == pytest.approx([-1 / 3 * 1000, 0, 0.5 / 4 * 1000])
+
+
+def test_corpus_without_source_layer_has_no_sections(make_corpus, sentiws):
+    corpus = make_corpus([("gut", "ADJD", "gut", "AfD", "2025")])
+    assert sentiment.score_sections(corpus, sentiment.load_sentiws(sentiws)) == []
+
+
+def test_write_sentiments_writes_all_tables(corpus, sentiws, tmp_path):
+    paths = [str(tmp_path / name) for name in ("sent.tsv", "curves.tsv", "sections.tsv")]
+    sentiment.write_sentiments(corpus, *paths, window=4, files=sentiws)
+    with open(paths[1], encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 1 + 2 + 1
+    with open(paths[2], encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0].split("\t") == sentiment.SECTION_FIELDS
+    assert len(lines) == 1 + 3
@@ -0,0 +1,57 @@
+import threading
+
+import numpy as np
+
+import embeddings
+import service
+
+
+def test_lru_cache_evicts_the_least_recently_used_entry():
+    cache = service.LRUCache(maxsize=2)
+    computed = []
+
+    def compute(key):
+        computed.append(key)
+        return key.upper()
+
+    assert cache.get_or_compute("a", lambda: compute("a")) == "A"
+    assert cache.get_or_compute("b", lambda: compute("b")) == "B"
+    # Using "a" makes "b" the least recently used entry
+    assert cache.get_or_compute("a", lambda: compute("a")) == "A"
+    assert cache.get_or_compute("c", lambda: compute("c")) == "C"
+    assert len(cache) == 2
+    assert cache.get_or_compute("a", lambda: compute("a")) == "A"
+    assert cache.get_or_compute("b", lambda: compute("b")) == "B"
+    assert computed == ["a", "b", "c", "b"]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_cached_results_are_copies(synthetic_corpus):
+    corpus_service = service.CorpusService(synthetic_corpus(size=500, seed=7).path, cache_size=4)
+    first = corpus_service.frequencies("Klima")
+    first["freq"] = 0
+    second = corpus_service.frequencies("Klima")
+    assert (second["freq"] > 0).all()
+    assert (corpus_service.cache.hits, corpus_service.cache.misses) == (1, 1)
+    corpus_service.collocations("Klima", "AfD")
+    corpus_service.heatmap("Substantive", 5)
+    assert len(corpus_service.cache) == 3
+
+
+def test_phrase_and_embedding_artifacts_are_loaded_once_on_first_use(make_corpus, monkeypatch):
+    rows = [(lemma, "NN", lemma, party, "2025") for party in ("AfD", "CDU") for lemma in ["Klima", "und", "Steuer", "."] * 50]
+    corpus = make_corpus(rows)
+    calls = []
+    load_embeddings = embeddings.load_embeddings
+    monkeypatch.setattr(embeddings, "load_embeddings", lambda corpus: calls.append("embeddings") or load_embeddings(corpus))
+    corpus_service = service.CorpusService(corpus.path)
+    assert calls == [] and ("suffixes", "lemma") not in corpus_service.corpus.cache
+    threads = [threading.Thread(target=corpus_service.similar, args=("Klima",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["embeddings"]
+    table = corpus_service.phrase_frequencies("Klima und")
+    assert ("suffixes", "lemma") in corpus_service.corpus.cache
+    np.testing.assert_array_equal(table["freq"], [50, 50])
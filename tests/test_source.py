@@ -0,0 +1,87 @@
+import re
+
+import numpy as np
+import pytest
+
+import analysis
+from corpus import COLUMNS, Corpus, CorpusWriter
+from source import context_bounds, load_source, sentence_starts
+
+# Two manifestos, each written like import.py does: text, token rows and source spans
+MANIFESTOS = [
+    ("AfD", "https://example.org/a.pdf", [(1, "Wir fordern mehr Klimaschutz."), (2, "Das Klima ist für uns wichtig.")]),
+    ("CDU", "https://example.org/b.pdf", [(5, "Klima bleibt.")]),
+]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "source.corpus")
+    with CorpusWriter(path) as writer:
+        for party, url, sentences in MANIFESTOS:
+            text = " ".join(sentence for _, sentence in sentences)
+            tokens = list(re.finditer(r"\w+|[^\w\s]", text))
+            starts = [token.start() for token in tokens]
+            sentence_offsets = [text.index(sentence) for _, sentence in sentences]
+            first = [starts.index(offset) for offset in sentence_offsets]
+            rows = [(t.group(), "$." if t.group() == "." else "NN", t.group(), party, "2025") for t in tokens]
+            writer.add_columns({column: [row[i] for row in rows] for i, column in enumerate(COLUMNS)}, url=url)
+            writer.add_source(text, starts, [token.end() for token in tokens], sentence_start=first,
+                              page=[page for page, _ in sentences], page_start=first)
+    return Corpus(path)
+
+
+def position(corpus, token, occurrence=0):
+    return int(np.flatnonzero(corpus.decode("token", corpus.codes["token"]) == token)[occurrence])
+
+
+def test_context_bounds_clip_to_sentence_and_document(corpus):
+    klima = position(corpus, "Klima")
+    lo, hi = context_bounds(corpus, [klima])
+    assert (lo[0], hi[0]) == (position(corpus, "Das"), position(corpus, "Klima", 1))
+    lo, hi = context_bounds(corpus, [klima], within="document")
+    assert (lo[0], hi[0]) == (0, position(corpus, "Klima", 1))
+    # A hit across a sentence end keeps both sentences
+    lo, hi = context_bounds(corpus, [position(corpus, "Klimaschutz")], length=3)
+    assert (lo[0], hi[0]) == (0, position(corpus, "Klima", 1))
+    with pytest.raises(ValueError, match="Unknown context bound"):
+        context_bounds(corpus, [klima], within="page")
+
+
+def test_kwic_line_is_cut_from_the_source_text_and_linked_to_its_page(corpus):
+    lines = analysis.kwic_lines(corpus, [position(corpus, "Klima")], context_size=50)
+    assert lines == ["Das **Klima** ist für uns wichtig. ([S. 2](https://example.org/a.pdf#page=2))"]
+    lines = analysis.kwic_lines(corpus, [position(corpus, "Klima")], context_size=50, within="document")
+    assert lines == ["Wir fordern mehr Klimaschutz. Das **Klima** ist für uns wichtig. ([S. 2](https://example.org/a.pdf#page=2))"]
+    lines = analysis.kwic_lines(corpus, [position(corpus, "Klima", 1)], context_size=50, within="document")
+    assert lines == ["**Klima** bleibt. ([S. 5](https://example.org/b.pdf#page=5))"]
+
+
+def test_context_size_limits_the_window(corpus):
+    [hit] = analysis.kwic_hits(corpus, [position(corpus, "ist")], context_size=1)
+    assert hit["line"] == "Klima **ist** für"
+    assert (hit["page"], hit["url"]) == (2, "https://example.org/a.pdf")
+
+
+def test_source_layer_survives_concatenation(corpus, tmp_path):
+    path = str(tmp_path / "twice.corpus")
+    with CorpusWriter(path) as writer:
+        writer.add_corpus(corpus)
+        writer.add_corpus(corpus)
+    twice = Corpus(path)
+    source = load_source(twice)
+    n = len(corpus)
+    assert source.span(n, n + 4) == "Wir fordern mehr Klimaschutz"
+    assert source.pages([0, n - 1, n, 2 * n - 1]).tolist() == [1, 5, 1, 5]
+    assert list(sentence_starts(twice)) == list(sentence_starts(corpus)) + [n + start for start in sentence_starts(corpus)]
+
+
+def test_corpus_without_source_layer_uses_punctuation(make_corpus):
+    rows = [(token, "$." if token == "." else "NN", token, party, "2025")
+            for party, text in (("AfD", "Wir fordern Klimaschutz . Klima ist wichtig ."), ("CDU", "Klima bleibt ."))
+            for token in text.split()]
+    corpus = make_corpus(rows)
+    assert load_source(corpus) is None
+    assert list(sentence_starts(corpus)) == [0, 4, 8]
+    lines = analysis.kwic_lines(corpus, [4, 8], context_size=10, rng=np.random.default_rng(0))
+    assert sorted(lines) == ["**Klima** bleibt .", "**Klima** ist wichtig ."]
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+import treetagger
+from corpus import Corpus
+
+
+def reattach(rows):
+    """Re-attach the particles of one sentence given as (pos, lemma) pairs."""
+    pos, lemma = zip(*rows)
+    sentence_start = np.zeros(len(rows), dtype=bool)
+    sentence_start[0] = True
+    return treetagger.reattach_particles(pos, lemma, sentence_start)
+
+
+def test_particle_is_prefixed_to_finite_verb():
+    lemma, n = reattach([("VVFIN", "lehnen"), ("PPER", "wir"), ("ART", "die"), ("NN", "Steuer"), ("PTKVZ", "ab"), ("$.", ".")])
+    assert list(lemma) == ["ablehnen", "wir", "die", "Steuer", "ab", "."]
+    assert n == 1
+
+
+def test_particle_skips_non_finite_verbs():
+    # "Wir fordern, dass das Gesetz eingeführt wird, nehmen es aber zurück" style: VVPP and VVINF are no candidates
+    lemma, n = reattach([("VVIMP", "nehmen"), ("PPER", "es"), ("VVPP", "einführen"), ("VVINF", "prüfen"), ("PTKVZ", "zurück")])
+    assert list(lemma[:4]) == ["zurücknehmen", "es", "einführen", "prüfen"]
+    assert n == 1
+
+
+def test_particle_without_finite_verb_is_left_alone():
+    lemma, n = reattach([("PPER", "es"), ("VAFIN", "haben"), ("VVPP", "einführen"), ("PTKVZ", "zurück")])
+    assert list(lemma) == ["es", "haben", "einführen", "zurück"]
+    assert n == 0
+
+
+def test_two_particles_of_one_verb_count_once():
+    lemma, n = reattach([("VVFIN", "stellen"), ("PTKVZ", "fest"), ("KON", "und"), ("PTKVZ", "dar")])
+    assert lemma[0] == "feststellen"
+    assert n == 1
+
+
+def test_particles_stay_in_their_sentence():
+    pos = ["VVFIN", "$.", "PPER", "PTKVZ"]
+    lemma, n = treetagger.reattach_particles(pos, ["lehnen", ".", "wir", "ab"], np.array([True, False, True, False]))
+    assert lemma[0] == "lehnen"
+    assert n == 0
+
+
+def test_resolve_lemmas():
+    lemma = treetagger.resolve_lemmas(["Xylofon", "2025", "Sitzungen", "|"], ["<unknown>", "@card@", "Sitzung|Sitzungen", "|"])
+    assert list(lemma) == ["Xylofon", "2025", "Sitzung", "|"]
+
+
+TAGGED = """<text party="AfD" year="2025">
+Wir\tPPER\twir
+lehnen\tVVFIN\tlehnen
+das\tART\tdie
+ab\tPTKVZ\tab
+.\t$.\t.
+</text>
+<text party="SPD" year="2025" election="LTW-SN">
+Das\tPDS\tdie
+ist\tVAFIN\tsein
+gut\tADJD\tgut
+.\t$.\t.
+Xylofon\tNN\t<unknown>
+</text>
+"""
+
+
+def test_convert_treetagger(tmp_path):
+    path = tmp_path / "tagged.txt"
+    path.write_text(TAGGED, encoding="utf-8")
+    corpus = treetagger.convert_treetagger([str(path)], str(tmp_path / "out.corpus"), programs_path=None)
+    df = corpus.to_dataframe()
+    assert list(df["lemma"]) == ["wir", "ablehnen", "die", "ab", ".", "die", "sein", "gut", ".", "Xylofon"]
+    assert [(doc["party"], doc["year"], doc["election"]) for doc in corpus.documents] == [("AfD", "2025", "BTW"), ("SPD", "2025", "LTW-SN")]
+
+
+def test_convert_does_not_depend_on_chunk_size(tmp_path):
+    path = tmp_path / "tagged.txt"
+    path.write_text(TAGGED * 3, encoding="utf-8")
+    whole = treetagger.convert_treetagger([str(path)], str(tmp_path / "a.corpus"), programs_path=None).to_dataframe()
+    chunked = treetagger.convert_treetagger([str(path)], str(tmp_path / "b.corpus"), programs_path=None, chunk_rows=2).to_dataframe()
+    assert whole.equals(chunked)
+
+
+def test_file_name_and_defaults_give_metadata(tmp_path):
+    path = tmp_path / "CDU.txt"
+    path.write_text("Wir\tPPER\twir\n", encoding="utf-8")
+    corpus = treetagger.convert_treetagger([str(path)], str(tmp_path / "out.corpus"), year=2021, programs_path=None)
+    assert Corpus(str(tmp_path / "out.corpus")).documents[0]["party"] == "CDU"
+    assert corpus.documents[0]["year"] == "2021"
+
+
+@pytest.mark.parametrize("content, message", [
+    ("Wir\tPPER\twir\nab\tFOO\tab\n", "line 2: unknown POS tag"),
+    ("Wir\tPPER\twir\nab\tPTKVZ\n", "line 2: expected token, POS and lemma"),
+    ("Wir\tPPER\twir\tx\n", "line 1: expected token, POS and lemma"),
+    ("nur Text\n", "line 1: expected token, POS and lemma"),
+])
+def test_invalid_rows_are_reported(tmp_path, content, message):
+    path = tmp_path / "bad.txt"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError, match=message):
+        treetagger.convert_treetagger([str(path)], str(tmp_path / "out.corpus"), year=2025, programs_path=None)
+
+
+def test_missing_year_is_reported(tmp_path):
+    path = tmp_path / "CDU.txt"
+    path.write_text("Wir\tPPER\twir\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="no party or year"):
+        treetagger.convert_treetagger([str(path)], str(tmp_path / "out.corpus"), programs_path=None)
@@ -0,0 +1,56 @@
+import fnmatch
+import re
+
+import pytest
+
+import vocabulary
+
+WORDS = ["Klima", "Klimaschutz", "Klimawandel", "Klimaschutzgesetz", "Umweltschutz", "Kinderschutz", "Schutz",
+         "klimaneutral", "Weltklima", "ab", "abab", "aab", "Öko", "Ökostrom"]
+
+
+@pytest.fixture
+def corpus(make_corpus):
+    # 60 numbered words with frequencies 1 to 30, each frequency twice
+    numbered = [(f"Wort{i:02d}", i // 2 + 1) for i in range(60)]
+    lemmas = [(word, 3) for word in WORDS] + numbered
+    rows = [(lemma, "NN", lemma, "AfD", "2025") for lemma, freq in lemmas for _ in range(freq)]
+    return make_corpus(rows)
+
+
+@pytest.mark.parametrize("pattern", [
+    "Klima*", "*schutz", "Kli*schutz", "*klima*", "Klima?chutz", "K*a*z", "ab*ab", "a*b", "?b", "Ö*", "*", "xyz*",
+])
+def test_wildcards_match_like_fnmatch(corpus, pattern):
+    index = vocabulary.load_vocabulary_index(corpus)
+    expected = sorted(lemma for lemma in corpus.vocab["lemma"] if fnmatch.fnmatchcase(lemma, pattern))
+    assert sorted(corpus.decode("lemma", index.match(pattern))) == expected
+
+
+def test_regex_and_exact_queries(corpus):
+    index = vocabulary.load_vocabulary_index(corpus)
+    matches = corpus.decode("lemma", index.match("(Klima|Umwelt)schutz.*", regex=True))
+    assert sorted(matches) == ["Klimaschutz", "Klimaschutzgesetz", "Umweltschutz"]
+    # A regex must match the whole lemma
+    assert list(corpus.decode("lemma", index.match("lima", regex=True))) == []
+    assert list(corpus.decode("lemma", index.match("Klima"))) == ["Klima"]
+    assert len(index.match("Unbekannt")) == 0
+    with pytest.raises(ValueError, match="Invalid regular expression"):
+        index.match("(", regex=True)
+
+
+def test_expansion_keeps_the_most_frequent_matches(corpus):
+    lemmas, n_matches = vocabulary.expand(corpus, "Wort*")
+    assert n_matches == 60
+    assert len(lemmas) == vocabulary.MAX_EXPANSIONS == 50
+    # Most frequent first, ties alphabetically; the 10 rarest words are cut
+    assert lemmas[:4] == ["Wort58", "Wort59", "Wort56", "Wort57"]
+    assert sorted(lemmas) == [f"Wort{i:02d}" for i in range(10, 60)]
+    assert vocabulary.expand(corpus, "Wort*", limit=3) == (["Wort58", "Wort59", "Wort56"], 60)
+    assert vocabulary.expand(corpus, "Klima.*", regex=True) == (["Klima", "Klimaschutz", "Klimaschutzgesetz", "Klimawandel"], 4)
+    assert vocabulary.expand(corpus, "xyz*") == ([], 0)
+
+
+def test_wildcard_regex_escapes_literal_characters():
+    assert re.fullmatch(vocabulary.wildcard_regex("a.b*"), "a.bcd")
+    assert not re.fullmatch(vocabulary.wildcard_regex("a.b*"), "axb")
@@ -0,0 +1,241 @@
+"""Convert TreeTagger output into the corpus format used by the apps.
+
+TreeTagger writes one token per line as ``token<TAB>POS<TAB>lemma``. With
+``-sgml``, markup lines of the input are passed through unchanged, so manifestos
+can be delimited by ``<text party="AfD" year="2025">`` ... ``</text>``. The
+attributes party, year, election and url set the document metadata. Files
+without them take the file name as the party and --year/--election as defaults.
+The URL is looked up in party.json if a program is listed there.
+
+The files are read in chunks of whole sentences and written to a corpus directory
+(btw25_corrected.corpus) and the token TSV (btw25_corrected.tsv):
+
+    python treetagger.py tagged/*.txt --year 2025 --output btw25_corrected.tsv
+    tree-tagger-german -sgml CDU.txt | python treetagger.py - --party CDU --year 2025
+
+Every row must have three fields and an STTS tag. Lemmas TreeTagger could not
+resolve (``<unknown>``, ``@card@``, ``@ord@``) are replaced by the token, and of
+ambiguous lemmas (``a|b``) the first is kept. Separated verb particles (PTKVZ)
+are re-attached to the nearest preceding finite or imperative full verb
+(VVFIN, VVIMP) of their sentence: in "lehnen wir ab" the lemma of "lehnen"
+becomes "ablehnen". This is a searchsorted over the verb positions of a whole
+chunk, not a loop over sentences.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from corpus import DEFAULT_ELECTION, READ_CHUNK_ROWS, Corpus, CorpusWriter, corpus_path_for, write_tsv
+from source import SENTENCE_END_TAGS
+
+FIELDS = ["token", "pos", "lemma"]
+# The STTS tag set as used by the German TreeTagger parameter file (PAV, formerly PROAV)
+STTS_TAGS = frozenset([
+    "ADJA", "ADJD", "ADV", "APPR", "APPRART", "APPO", "APZR", "ART", "CARD", "FM", "ITJ",
+    "KOUI", "KOUS", "KON", "KOKOM", "NN", "NE", "PDS", "PDAT", "PIS", "PIAT", "PIDAT",
+    "PPER", "PPOSS", "PPOSAT", "PRELS", "PRELAT", "PRF", "PWS", "PWAT", "PWAV", "PAV", "PROAV",
+    "PTKZU", "PTKNEG", "PTKVZ", "PTKANT", "PTKA", "TRUNC", "VVFIN", "VVIMP", "VVINF", "VVIZU",
+    "VVPP", "VAFIN", "VAIMP", "VAINF", "VAPP", "VMFIN", "VMINF", "VMPP", "XY", "$,", "$.", "$(",
+])
+PARTICLE_TAG = "PTKVZ"
+# A separated particle belongs to a finite or imperative verb, never to VVINF, VVIZU or VVPP
+PARTICLE_VERB_TAGS = ("VVFIN", "VVIMP")
+UNRESOLVED_LEMMAS = ("<unknown>", "@card@", "@ord@")
+MARKUP_PATTERN = re.compile(r"<(/?)([\w-]+)([^>]*)>")
+ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+def parse_markup(line):
+    """Return (name, closing, attributes) of an SGML tag line, or None if line is no tag."""
+    match = MARKUP_PATTERN.fullmatch(line.strip())
+    if match is None:
+        return None
+    return match.group(2), bool(match.group(1)), dict(ATTRIBUTE_PATTERN.findall(match.group(3)))
+
+
+def read_treetagger(path, party=None, year=None, election=DEFAULT_ELECTION, url=None, chunk_rows=READ_CHUNK_ROWS):
+    """Yield the token rows of a TreeTagger output file in blocks of whole sentences.
+
+    Each block is (columns, sentence_start, document): token, pos and lemma arrays,
+    a flag for every row starting a sentence, and the party, year, election and
+    url of the block. A block never spans two documents. Sentences end at ``$.``
+    and at every markup line. Rows are checked as they are read; a ValueError names
+    the file and line of the first bad row. path "-" reads standard input.
+    """
+    reader = pd.read_csv(
+        sys.stdin if path == "-" else path, sep="\t", header=None, names=[*FIELDS, "extra"], quoting=3,
+        dtype=str, na_filter=False, skip_blank_lines=False, chunksize=chunk_rows, encoding="utf-8",
+    )
+    defaults = {"party": party, "year": None if year is None else str(year), "election": election, "url": url}
+    document = defaults
+    pending = None
+    lines = 0
+    try:
+        for frame in reader:
+            frame.index = np.arange(lines + 1, lines + len(frame) + 1)
+            lines += len(frame)
+            if pending is not None:
+                frame, document = pd.concat([pending[0], frame]), pending[1]
+            blocks, document, pending = _split_chunk(frame, document, defaults, path)
+            yield from blocks
+    except pd.errors.ParserError as e:
+        raise ValueError(f"{path}: expected token, POS and lemma separated by tabs ({str(e).strip()})") from None
+    if pending is not None:
+        blocks, _, _ = _split_chunk(pending[0], pending[1], defaults, path, final=True)
+        yield from blocks
+
+
+def _split_chunk(frame, document, defaults, path, final=False):
+    """Split a chunk into blocks of one document each; the last, possibly unfinished sentence is returned as pending."""
+    token, pos, lemma, extra = (frame[field].to_numpy(dtype=object) for field in (*FIELDS, "extra"))
+    lines = frame.index.to_numpy()
+    blank = (token == "") & (pos == "") & (lemma == "")
+    markup = (pos == "") & (lemma == "") & ~blank
+    bad = ((pos == "") | (lemma == "") | (token == "") | (extra != "")) & ~markup & ~blank
+    if bad.any():
+        raise ValueError(f"{path}, line {lines[np.argmax(bad)]}: expected token, POS and lemma separated by tabs")
+
+    # Walk the markup lines only; every row takes the document of the last <text> tag before it
+    rows = np.flatnonzero(~blank)
+    documents = [document]
+    starts_document = np.zeros(len(rows), dtype=bool)
+    for i in np.flatnonzero(markup[rows]):
+        tag = parse_markup(token[rows[i]])
+        if tag is None:
+            raise ValueError(f"{path}, line {lines[rows[i]]}: expected token, POS and lemma separated by tabs")
+        name, closing, attributes = tag
+        if name == "text" and not closing:
+            documents.append({**defaults, **{key: attributes[key] for key in ("party", "year", "election", "url") if key in attributes}})
+            starts_document[i] = True
+    is_markup = markup[rows]
+    document_of = np.cumsum(starts_document)[~is_markup]
+    after_markup = np.concatenate(([True], is_markup[:-1]))[~is_markup]
+    rows = rows[~is_markup]
+    if len(rows) == 0:
+        return [], documents[-1], None
+
+    token, pos, lemma = token[rows], pos[rows], lemma[rows]
+    unknown = sorted(set(pos) - STTS_TAGS)
+    if unknown:
+        raise ValueError(f"{path}, line {lines[rows][np.isin(pos, unknown)][0]}: unknown POS tag(s) {', '.join(unknown)}")
+    sentence_start = after_markup | np.concatenate(([True], np.isin(pos[:-1], SENTENCE_END_TAGS)))
+
+    # Keep the last sentence for the next chunk, it may continue there
+    pending = None
+    if not final:
+        cut = int(np.flatnonzero(sentence_start)[-1])
+        pending = (frame.loc[lines[rows[cut]]:], documents[document_of[cut]])
+        token, pos, lemma = token[:cut], pos[:cut], lemma[:cut]
+        sentence_start, document_of = sentence_start[:cut], document_of[:cut]
+
+    blocks = []
+    changes = np.flatnonzero(document_of[1:] != document_of[:-1]) + 1
+    for start, end in zip(np.concatenate(([0], changes)), np.concatenate((changes, [len(token)]))):
+        if end > start:
+            meta = documents[document_of[start]]
+            if meta["party"] is None or meta["year"] is None:
+                raise ValueError(f"{path}, line {lines[rows[start]]}: no party or year; add a <text party=... year=...> tag or pass them as defaults")
+            columns = {"token": token[start:end], "pos": pos[start:end], "lemma": lemma[start:end]}
+            blocks.append((columns, sentence_start[start:end], meta))
+    return blocks, documents[-1], pending
+
+
+def resolve_lemmas(token, lemma):
+    """Replace lemmas TreeTagger could not resolve by the token and keep the first of ambiguous lemmas."""
+    lemma = pd.Series(lemma, dtype=object)
+    lemma = lemma.mask(lemma.isin(UNRESOLVED_LEMMAS), pd.Series(token, dtype=object))
+    ambiguous = lemma.str.contains("|", regex=False) & (lemma.str.len() > 1)
+    if ambiguous.any():
+        lemma[ambiguous] = lemma[ambiguous].str.split("|", n=1).str[0]
+    return lemma.to_numpy(dtype=object)
+
+
+def reattach_particles(pos, lemma, sentence_start):
+    """Prefix the lemma of every separated verb particle to the nearest preceding finite or imperative full verb of its sentence.
+
+    Returns the new lemma array and the number of verbs rewritten. The particle
+    row itself is kept; particles without such a verb before them in their sentence
+    are left alone. If several particles follow the same verb, the nearest wins.
+    """
+    lemma = np.array(lemma, dtype=object)
+    codes, tags = pd.factorize(np.asarray(pos, dtype=object))
+    is_verb = np.isin(tags, PARTICLE_VERB_TAGS)
+    is_particle = np.asarray(tags == PARTICLE_TAG)
+    particles = np.flatnonzero(is_particle[codes]) if len(tags) else np.zeros(0, dtype=np.int64)
+    verbs = np.flatnonzero(is_verb[codes]) if len(tags) else np.zeros(0, dtype=np.int64)
+    if len(particles) == 0 or len(verbs) == 0:
+        return lemma, 0
+
+    sentence = np.cumsum(sentence_start)
+    nearest = np.searchsorted(verbs, particles) - 1
+    verb = verbs[np.maximum(nearest, 0)]
+    found = (nearest >= 0) & (sentence[verb] == sentence[particles])
+    particles, verb = particles[found], verb[found]
+    # Particles are in order, so the first one of each verb is the nearest
+    verb, first = np.unique(verb, return_index=True)
+    particles = particles[first]
+    lemma[verb] = lemma[particles] + lemma[verb]
+    return lemma, len(verb)
+
+
+def program_metadata(path):
+    """Return the URL and election of every (party, year) listed in a party.json file."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        programs = json.load(f)
+    return {(program["Party"], str(program["Year"])): (program.get("URL"), program.get("Election")) for program in programs}
+
+
+def convert_treetagger(paths, corpus_path, year=None, election=DEFAULT_ELECTION, party=None, programs_path="party.json", chunk_rows=READ_CHUNK_ROWS):
+    """Convert TreeTagger output files, in order, into a corpus directory and return it."""
+    programs = program_metadata(programs_path)
+    n_verbs = n_unresolved = 0
+    with CorpusWriter(corpus_path, election=election) as writer:
+        for path in paths:
+            print(f"Converting {path}...")
+            default_party = party or (None if path == "-" else os.path.splitext(os.path.basename(path))[0])
+            # The election of a <text> tag wins over party.json, which wins over the default
+            for columns, sentence_start, meta in read_treetagger(path, default_party, year, None, chunk_rows=chunk_rows):
+                n_unresolved += int(np.isin(columns["lemma"], UNRESOLVED_LEMMAS).sum())
+                lemma = resolve_lemmas(columns["token"], columns["lemma"])
+                lemma, attached = reattach_particles(columns["pos"], lemma, sentence_start)
+                n_verbs += attached
+                url, listed_election = programs.get((meta["party"], meta["year"]), (None, None))
+                n = len(lemma)
+                writer.add_columns(
+                    {"token": columns["token"], "pos": columns["pos"], "lemma": lemma, "party": [meta["party"]] * n, "year": [meta["year"]] * n},
+                    election=meta["election"] or listed_election or election,
+                    url=meta["url"] or url,
+                )
+    corpus = Corpus(corpus_path)
+    print(f"Wrote {len(corpus)} tokens to {corpus_path}; {n_verbs} particle verbs rejoined, {n_unresolved} unresolved lemmas replaced by the token.")
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TreeTagger output into a corpus directory and token TSV.")
+    parser.add_argument("inputs", nargs="+", help="TreeTagger output files (token, POS, lemma per line); - reads standard input")
+    parser.add_argument("--output", default="btw25_corrected.tsv", help="token TSV to write; the corpus directory is written next to it")
+    parser.add_argument("--year", help="year of documents without a year attribute")
+    parser.add_argument("--election", default=DEFAULT_ELECTION, help="election of documents without an election attribute")
+    parser.add_argument("--party", help="party of documents without a party attribute (default: the file name)")
+    parser.add_argument("--programs", default="party.json", help="program list with the URL and election of each manifesto")
+    args = parser.parse_args()
+
+    try:
+        corpus = convert_treetagger(args.inputs, corpus_path_for(args.output), args.year, args.election, args.party, args.programs)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    write_tsv(corpus, args.output)
+    print(f"Data saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Wildcard, prefix, suffix and regex search over the vocabulary of a corpus column.
+
+The vocabulary is kept sorted twice: by the strings themselves and by the
+reversed strings. A prefix (``Klima*``) or a suffix (``*schutz``) is then a binary
+search for one contiguous range, and ``Kli*schutz`` is the intersection of both
+ranges. Other patterns (``*klima*``, ``Klima?chutz``) and regular expressions
+are matched against the vocabulary only, never against the corpus, and
+wildcard patterns first narrow their candidates by their literal prefix or suffix.
+The orders are stored as ``sorted.npy`` and ``reversed.npy`` in
+``index/<field>.vocabulary/``, next to the positional index.
+"""
+import bisect
+import os
+import re
+
+import numpy as np
+
+from corpus import load_artifact, save_artifact
+from index import INDEX_DIR, load_index
+
+WILDCARDS = "*?"
+MAX_EXPANSIONS = 50  # matching lemmas analysed per query, most frequent first
+
+
+class VocabularyIndex:
+    """Forward and reverse sorted vocabulary of one corpus column."""
+
+    def __init__(self, corpus, field, order, reverse_order):
+        self.corpus = corpus
+        self.field = field
+        self.order = np.asarray(order, dtype=np.int64)
+        self.reverse_order = np.asarray(reverse_order, dtype=np.int64)
+        self.rank = np.empty_like(self.order)
+        self.rank[self.order] = np.arange(len(self.order))
+        vocab = corpus.vocab[field]
+        self.words = [vocab[i] for i in self.order]
+        self.reversed_words = [vocab[i][::-1] for i in self.reverse_order]
+
+    def prefix(self, prefix):
+        """Return the ids of all strings starting with prefix."""
+        lo, hi = prefix_range(self.words, prefix)
+        return self.order[lo:hi]
+
+    def suffix(self, suffix):
+        """Return the ids of all strings ending with suffix."""
+        lo, hi = prefix_range(self.reversed_words, suffix[::-1])
+        return self.reverse_order[lo:hi]
+
+    def regex(self, pattern, candidates=None):
+        """Return the ids of all strings (or candidate ids) fully matching a regular expression."""
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression {pattern!r}: {e}") from e
+        vocab = self.corpus.vocab[self.field]
+        ids = range(len(vocab)) if candidates is None else candidates
+        return np.array([i for i in ids if compiled.fullmatch(vocab[i])], dtype=np.int64)
+
+    def wildcard(self, pattern):
+        """Return the ids of all strings matching a pattern with * (any characters) and ? (one character)."""
+        parts = re.split(r"[*?]", pattern)
+        head, tail = parts[0], parts[-1]
+        candidates = None
+        if head:
+            candidates = self.prefix(head)
+        if tail:
+            ends = self.suffix(tail)
+            candidates = ends if candidates is None else np.intersect1d(candidates, ends)
+        if candidates is not None and pattern.count("*") == 1 and "?" not in pattern:
+            if not (head and tail):
+                return candidates
+            # head*tail: prefix and suffix must not overlap
+            lengths = np.array([len(self.corpus.vocab[self.field][i]) for i in candidates], dtype=np.int64)
+            return candidates[lengths >= len(head) + len(tail)]
+        return self.regex(wildcard_regex(pattern), candidates)
+
+    def match(self, query, regex=False):
+        """Return the ids matching a regular expression, a wildcard pattern or an exact string."""
+        if regex:
+            return self.regex(query)
+        if is_pattern(query):
+            return self.wildcard(query)
+        value_id = self.corpus.id(self.field, query)
+        return np.array([value_id] if value_id >= 0 else [], dtype=np.int64)
+
+
+def prefix_range(words, prefix):
+    """Return the range of sorted words starting with prefix."""
+    lo = bisect.bisect_left(words, prefix)
+    hi = bisect.bisect_left(words, prefix + "\U0010ffff", lo)
+    return lo, hi
+
+
+def wildcard_regex(pattern):
+    """Translate a wildcard pattern into an equivalent regular expression."""
+    return "".join(".*" if char == "*" else "." if char == "?" else re.escape(char) for char in pattern)
+
+
+def is_pattern(query):
+    """Return whether a query contains wildcards."""
+    return any(char in query for char in WILDCARDS)
+
+
+def vocabulary_arrays(corpus, field):
+    """Return the vocabulary ids of a corpus column sorted forwards and by their reversed strings."""
+    vocab = corpus.vocab[field]
+    order = np.array(sorted(range(len(vocab)), key=vocab.__getitem__), dtype=np.int64)
+    reverse_order = np.array(sorted(range(len(vocab)), key=lambda i: vocab[i][::-1]), dtype=np.int64)
+    return {"sorted": order, "reversed": reverse_order}
+
+
+def build_vocabulary_index(corpus, field, save=True):
+    """Sort the vocabulary of a corpus column forwards and reversed and optionally persist both orders."""
+    arrays = vocabulary_arrays(corpus, field)
+    if save:
+        save_artifact(corpus, os.path.join(INDEX_DIR, f"{field}.vocabulary"), arrays)
+    return VocabularyIndex(corpus, field, arrays["sorted"], arrays["reversed"])
+
+
+def load_vocabulary_index(corpus, field="lemma"):
+    """Return the vocabulary index of a corpus column, loading or building it on first use."""
+    key = ("vocabulary", field)
+    if key not in corpus.cache:
+        arrays = load_artifact(corpus, os.path.join(INDEX_DIR, f"{field}.vocabulary"), lambda: vocabulary_arrays(corpus, field))
+        corpus.cache[key] = VocabularyIndex(corpus, field, arrays["sorted"], arrays["reversed"])
+    return corpus.cache[key]
+
+
+def expand(corpus, query, field="lemma", regex=False, limit=MAX_EXPANSIONS):
+    """Return the most frequent strings matching query (at most limit) and the number of all matches."""
+    vocabulary = load_vocabulary_index(corpus, field)
+    ids = vocabulary.match(query, regex)
+    offsets = load_index(corpus, field).offsets
+    frequencies = offsets[ids + 1] - offsets[ids]
+    # Most frequent first; equally frequent strings in alphabetical order
+    top = ids[np.lexsort((vocabulary.rank[ids], -frequencies))[:limit]]
+    return list(corpus.decode(field, top)), len(ids)